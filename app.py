@@ -1,8 +1,11 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 import json
 import os
-import subprocess
 import db  # Import the database module
+import generation  # Problem generation service
+import problem_pool  # Pre-generated problems per lesson
+import capabilities  # Registry of installed linters, formatters and compilers
+import compile_cache  # Compiled-artifact cache and C++ prelude
 from github_utils import GitHubFetcher  # Import GitHub fetcher
 from dotenv import load_dotenv
 import chatbot  # Import the chatbot module
@@ -17,6 +20,20 @@ PROBLEM_GENERATOR_API_URL = os.getenv('PROBLEM_GENERATOR_API_URL', 'http://47.25
 
 app = Flask(__name__, static_folder='static')
 
+@app.before_request
+def start_background_work():
+    """
+    Starts the app's background threads with the first request a worker serves, so
+    importing the app (scripts, tests, one-off tools) doesn't start them. Each one
+    starts only once per process.
+    """
+    # Probe the installed toolchains once, in the background, instead of on every request
+    capabilities.start()
+    # Precompile the C++ prelude now rather than inside the first C++ submission
+    compile_cache.warm_up()
+    # Keep pre-generated problems ready for the lessons students ask for most
+    problem_pool.start()
+
 @app.route('/')
 def serve_index():
     return send_from_directory(app.static_folder, 'index.html')
@@ -152,106 +169,121 @@ def get_lessons():
 
 @app.route('/generate', methods=['POST'])
 def generate():
-    """ Handles problem generation and extracts test cases """
+    """ Handles problem generation and extracts test cases; ?stream=1 streams progress as Server-Sent Events """
     data = request.get_json()
     course = data.get("course", "learnpython.org")
     lesson = data.get("lesson", "")
-    # Get the language parameter, defaulting to None so request.py can set the appropriate default
+    # Get the language parameter, defaulting to None so the course's language is used
     language = data.get("language", None)
+    stream = request.args.get("stream") in ("1", "true")
     
     if not lesson:
         return jsonify({"error": "Lesson is required."}), 400
 
-    try:
-        # Run the request.py subprocess to generate a problem, passing language as additional argument
-        cmd = ["python3", "request.py", course, lesson]
-        if language:
-            cmd.append(language)
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        # Check if there was an error in the subprocess
-        if result.returncode != 0:
-            print(f"Subprocess error: {result.stderr}")
-            return jsonify({"error": f"Error running request.py: {result.stderr}"}), 500
-            
-        # Check if stdout is empty
-        if not result.stdout.strip():
-            print(f"Empty response from request.py")
-            return jsonify({"error": "No response from API"}), 500
-        try:
-            # Try to clean the output before parsing
-            cleaned_stdout = result.stdout.strip()
-            
-            # Check if the output starts with any non-JSON characters
-            if not cleaned_stdout.startswith('{') and not cleaned_stdout.startswith('['): 
-                # Try to find the start of JSON
-                json_start = cleaned_stdout.find('{')
-                if json_start == -1:
-                    json_start = cleaned_stdout.find('[')
-                
-                if json_start != -1:
-                    cleaned_stdout = cleaned_stdout[json_start:]
-            
-            output = json.loads(cleaned_stdout)
+    # Hand out a pre-generated problem if the lesson's pool has one, and top the pool up
+    pool_language = language or generation.default_language(course)
+    problem_pool.record_demand(course, lesson, pool_language)
+    pooled = problem_pool.take(course, lesson, pool_language)
+    if pooled:
+        problem_pool.request_refill(course, lesson, pool_language)
+    if pooled and stream:
+        return event_stream_response(pooled_problem_events(pooled), sse=True)
+    if pooled:
+        return jsonify(pooled)
 
-            # Extract test cases if they exist
-            raw_testcases = output.get("data", {}).get("outputs", {}).get("Testcases", "").strip()
-            
-            if not raw_testcases:
-                print("No test cases found in API response")
-                return jsonify({"error": "Test cases not found in API response."}), 500
-                
-            # Parse the JSON test cases
-            try:
-                # Remove any markdown code block markers if present
-                clean_testcases = raw_testcases.replace("```json", "").replace("```", "").strip()
-                
-                try:
-                    # Parse the JSON string into a Python object
-                    testcases_json = json.loads(clean_testcases)
-                    
-                    # Ensure we have a list of test cases
-                    if not isinstance(testcases_json, list):
-                        # Try to find a list in the parsed JSON
-                        if isinstance(testcases_json, dict):
-                            for key, value in testcases_json.items():
-                                if isinstance(value, list):
-                                    testcases_json = value
-                                    break
-                    
-                    # Add the parsed test cases to the output
-                    output["testcases"] = testcases_json
-                    
-                    # Store the problem in the database
-                    try:
-                        title = output.get("data", {}).get("outputs", {}).get("Title", "Untitled Problem")
-                        problem_text = output.get("data", {}).get("outputs", {}).get("Problem", "")
-                        problem_id = db.store_problem(title, problem_text, course, lesson, testcases_json)
-                        output["problem_id"] = problem_id
-                    except Exception as e:
-                        print(f"Error storing problem in database: {str(e)}")
-                        # Continue even if database storage fails
-                    
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                    # If we can't parse as JSON, return the raw string (for backward compatibility)
-                    print("Falling back to raw string format")
-                    output["testcases"] = raw_testcases
-            except Exception as e:
-                print(f"Error processing test cases: {str(e)}")
-                # If all else fails, return the raw test cases
-                output["testcases"] = raw_testcases
-            return jsonify(output)
-
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            return jsonify({"error": "Invalid JSON response", "message": str(e)}), 500
+    # On a miss the pool is only topped up once this generation is done, so a cold
+    # lesson never has two generations running for it at once
+    if stream:
+        return event_stream_response(generation_events(course, lesson, language), sse=True)
+
+    try:
+        result = generation.generate_problem(course, lesson, language)
+        output = store_generated_problem(result, course, lesson)
+        problem_pool.request_refill(course, lesson, pool_language)
+        return jsonify(output)
+    except generation.GenerationError as e:
+        print(f"Problem generation failed: {str(e)}")
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
         print(f"Exception in generate endpoint: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": "Failed to generate", "message": str(e)}), 500
 
+def store_generated_problem(result, course, lesson):
+    """
+    Parses the testcases of a generated problem and stores it.
+
+    Args:
+        result (generation.GenerationResult): The workflow's result
+        course (str): Course identifier
+        lesson (str): Lesson identifier
+
+    Returns:
+        dict: The /generate response: the workflow response with testcases and problem_id
+
+    Raises:
+        generation.GenerationError: If the workflow returned no testcases
+    """
+    output = result.response
+    raw_testcases = result.raw_testcases
+
+    if not raw_testcases:
+        print("No test cases found in API response")
+        raise generation.GenerationError("Test cases not found in API response.")
+
+    # Parse the JSON test cases
+    try:
+        testcases_json = generation.parse_testcases(raw_testcases)
+
+        # Add the parsed test cases to the output
+        output["testcases"] = testcases_json
+
+        # Store the problem in the database
+        try:
+            problem_id = db.store_problem(result.title, result.problem, course, lesson, testcases_json)
+            output["problem_id"] = problem_id
+        except Exception as e:
+            print(f"Error storing problem in database: {str(e)}")
+            # Continue even if database storage fails
+
+    except json.JSONDecodeError as e:
+        print(f"JSON decode error: {e}")
+        # If we can't parse as JSON, return the raw string (for backward compatibility)
+        print("Falling back to raw string format")
+        output["testcases"] = raw_testcases
+    except Exception as e:
+        print(f"Error processing test cases: {str(e)}")
+        # If all else fails, return the raw test cases
+        output["testcases"] = raw_testcases
+    return output
+
+def generation_events(course, lesson, language):
+    """ Relays the progress of a streaming generation, then stores the problem and sends the full response """
+    try:
+        for event in generation.generate_problem_events(course, lesson, language):
+            if event["event"] != "finished":
+                yield event
+                continue
+            output = store_generated_problem(event["result"], course, lesson)
+            problem_pool.request_refill(course, lesson, language or generation.default_language(course))
+            yield {"event": "testcases", "testcases": output["testcases"]}
+            yield {"event": "done", "result": output}
+    except generation.GenerationError as e:
+        print(f"Problem generation failed: {str(e)}")
+        yield {"event": "error", "error": str(e)}
+    except Exception as e:
+        print(f"Exception in generate stream: {str(e)}")
+        yield {"event": "error", "error": "Failed to generate", "message": str(e)}
+
+def pooled_problem_events(pooled):
+    """ Sends a pre-generated problem as the events of a streaming generation """
+    outputs = pooled["data"]["outputs"]
+    yield {"event": "title", "title": outputs["Title"]}
+    yield {"event": "problem_chunk", "text": outputs["Problem"]}
+    yield {"event": "testcases", "testcases": pooled["testcases"]}
+    yield {"event": "done", "result": pooled}
+
 @app.route('/run_code', methods=['POST'])
 def run_code_endpoint():
     """ Endpoint that runs user-submitted code in the specified language """
@@ -266,15 +298,32 @@ def run_code_endpoint():
 
 # The old parsing functions have been removed as they're no longer needed with JSON test cases
 
-@app.route("/check_code", methods=["POST"])
-def check_code_endpoint():
-    """ Endpoint that checks user code against test cases """
-    data = request.get_json()
-    user_code = data.get("code", "").strip()
-    client_language = data.get("language", "python")  # Language from the client (editor)
-    testcases = data.get("testcases", [])
-    problem_id = data.get("problem_id", None)
+def event_stream_response(events, sse=False):
+    """ Streams event dicts to the client as Server-Sent Events or newline-delimited JSON """
+    def generate():
+        for event in events:
+            if sse:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
     
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        # Keep proxies from buffering the stream until it ends
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def store_check_result(problem_id, language, user_code, passed, total, mode="full"):
+    """ Stores a checked solution, logging instead of failing the request on errors """
+    try:
+        db.store_solution(problem_id, language, user_code, passed, total, mode)
+        print(f"Stored solution for problem {problem_id}")
+    except Exception as e:
+        print(f"Error storing solution in database: {str(e)}")
+
+def problem_language(problem_id, client_language):
+    """ Returns the language of the problem being solved, or the editor's language without one """
     # When problem_id is provided, we should use the language from the problem
     language = client_language  # Default to language from client
     if problem_id:
@@ -285,27 +334,206 @@ def check_code_endpoint():
                 print(f"Using language '{language}' from problem instead of '{client_language}' from editor")
         except Exception as e:
             print(f"Error fetching problem language: {str(e)}")
+    return language
+
+@app.route("/check_code", methods=["POST"])
+def check_code_endpoint():
+    """
+    Endpoint that checks user code against test cases.
+    
+    With "stream": "ndjson" (or true) in the body the results are streamed as
+    newline-delimited JSON events while testcases finish; "stream": "sse" or an
+    Accept: text/event-stream header streams them as Server-Sent Events instead.
+    
+    "mode" picks how testcases run: "full" (default) runs all of them,
+    "fail_fast" stops at the first failure and "sample" runs a few first and the
+    rest only if those pass. "compare" picks how outputs are compared: "lines"
+    (default), "whitespace", "tokens" or "float".
+    """
+    data = request.get_json()
+    user_code = data.get("code", "").strip()
+    client_language = data.get("language", "python")  # Language from the client (editor)
+    testcases = data.get("testcases", [])
+    problem_id = data.get("problem_id", None)
+    mode = data.get("mode") or "full"
+    compare = data.get("compare") or "lines"
+    
+    stream = data.get("stream")
+    if request.accept_mimetypes.best == "text/event-stream":
+        stream = "sse"
+    
+    language = problem_language(problem_id, client_language)
+    
+    if stream:
+        from check import prepare_check, check_events
+        inputs, expected_outputs, language, error = prepare_check(user_code, testcases, language, mode, compare)
+        if error is not None:
+            return jsonify({"error": error}), 400
+        
+        def events():
+            failed = False
+            for event in check_events(user_code, inputs, expected_outputs, language, mode, compare):
+                # A submission the server couldn't prepare wasn't really checked
+                if event["event"] == "compile" and event["status"] == "failed":
+                    failed = True
+                # The solution is stored once the final summary is known, unless
+                # it is a cached replay of a check that was already stored
+                if event["event"] == "summary" and problem_id and not event.get("cached") and not failed:
+                    store_check_result(problem_id, language, user_code, event["passed"], event["total"], mode)
+                yield event
+        
+        return event_stream_response(events(), sse=stream == "sse")
     
     # Import the check_code function from check.py
     from check import check_code
-    result = check_code(user_code, testcases, language)
+    result = check_code(user_code, testcases, language, mode, compare)
     
-    # Store the solution in the database if problem_id is provided
-    if problem_id:
+    # Store the solution in the database if problem_id is provided and the check ran
+    if problem_id and getattr(result, "status_code", None) == 200:
         try:
             # Parse the result to get passed/total testcases
             result_data = json.loads(result.get_data(as_text=True))
             passed = result_data.get("passed", 0)
             total = result_data.get("total", len(testcases))
             
-            # Store the solution
-            db.store_solution(problem_id, language, user_code, passed, total)
-            print(f"Stored solution for problem {problem_id}")
+            # Store the solution, unless the result is a cached repeat of a stored check
+            if not result_data.get("cached"):
+                store_check_result(problem_id, language, user_code, passed, total, mode)
         except Exception as e:
             print(f"Error storing solution in database: {str(e)}")
     
     return result
 
+def queue_full_response(error):
+    """ Refuses a job while its language's queue is full, telling the client when to retry """
+    response = jsonify({"error": str(error), "retry_after": error.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def job_accepted_response(job_id):
+    """ Acknowledges a queued job with the URL to poll for its result """
+    status_url = f"/jobs/{job_id}"
+    response = jsonify({"job_id": job_id, "status": "queued", "status_url": status_url})
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+@app.route("/jobs/check", methods=["POST"])
+def submit_check_job():
+    """
+    Queues a check of user code against test cases and returns its job ID at once.
+    
+    Takes the same body as /check_code. Answers 202 with the job ID, or 429 with a
+    Retry-After header when too many jobs of the language are already queued.
+    """
+    import jobs
+    from check import prepare_check
+    
+    data = request.get_json()
+    user_code = data.get("code", "").strip()
+    testcases = data.get("testcases", [])
+    problem_id = data.get("problem_id", None)
+    mode = data.get("mode") or "full"
+    compare = data.get("compare") or "lines"
+    language = problem_language(problem_id, data.get("language", "python"))
+    
+    inputs, expected_outputs, language, error = prepare_check(user_code, testcases, language, mode, compare)
+    if error is not None:
+        return jsonify({"error": error}), 400
+    
+    def on_summary(summary):
+        # The solution is stored once the final summary is known
+        if problem_id and not summary.get("cached"):
+            store_check_result(problem_id, language, user_code, summary["passed"], summary["total"], mode)
+    
+    try:
+        job_id = jobs.submit_check(user_code, inputs, expected_outputs, language, mode=mode, compare=compare, on_summary=on_summary)
+    except jobs.QueueFullError as e:
+        return queue_full_response(e)
+    return job_accepted_response(job_id)
+
+@app.route("/jobs/run", methods=["POST"])
+def submit_run_job():
+    """
+    Queues a run of user code and returns its job ID at once.
+    
+    Takes the same body as /run_code. Answers 202 with the job ID, or 429 with a
+    Retry-After header when too many jobs of the language are already queued.
+    """
+    import executor
+    import jobs
+    
+    data = request.get_json()
+    code = data.get("code", "")
+    stdin = data.get("stdin", "")
+    language = data.get("language", "python") or "python"
+    
+    if not code.strip():
+        return jsonify({"error": "No code provided"}), 400
+    if language not in executor.supported_languages():
+        return jsonify({"error": f"Unsupported language: {language}"}), 400
+    
+    try:
+        job_id = jobs.submit_run(code, stdin, language)
+    except jobs.QueueFullError as e:
+        return queue_full_response(e)
+    return job_accepted_response(job_id)
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Reports a job's status, events and result.
+    
+    With ?stream=ndjson, ?stream=sse or an Accept: text/event-stream header the
+    job's events are streamed instead as they happen, ending with a "job" event
+    that carries the final status.
+    """
+    import jobs
+    
+    job = db.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    stream = request.args.get("stream")
+    if request.accept_mimetypes.best == "text/event-stream":
+        stream = "sse"
+    if stream:
+        return event_stream_response(jobs.job_events(job_id), sse=stream == "sse")
+    
+    job["events"] = [event for _, event in db.get_job_events(job_id)]
+    return jsonify(job)
+
+@app.route("/compile_cache/stats", methods=["GET"])
+def compile_cache_stats_endpoint():
+    """ Report compiled-artifact cache usage so the cache can be sized """
+    import compile_cache
+    try:
+        return jsonify(compile_cache.get_stats())
+    except Exception as e:
+        print(f"Error reading compile cache stats: {str(e)}")
+        return jsonify({"error": "Failed to read compile cache stats", "message": str(e)}), 500
+
+@app.route("/problem_pool", methods=["GET"])
+def problem_pool_endpoint():
+    """ Report how many pre-generated problems each lesson has ready, and how many it aims for """
+    try:
+        return jsonify(problem_pool.get_depths())
+    except Exception as e:
+        print(f"Error reading problem pool: {str(e)}")
+        return jsonify({"error": "Failed to read problem pool", "message": str(e)}), 500
+
+@app.route("/capabilities", methods=["GET"])
+def capabilities_endpoint():
+    """ Report the installed toolchains and their versions; ?refresh=1 probes them again first """
+    try:
+        if request.args.get("refresh") in ("1", "true"):
+            capabilities.probe_all()
+        return jsonify(capabilities.get_capabilities())
+    except Exception as e:
+        print(f"Error reading capabilities: {str(e)}")
+        return jsonify({"error": "Failed to read capabilities", "message": str(e)}), 500
+
 @app.route("/problems", methods=["GET"])
 def get_problems_endpoint():
     """ Get all problems or filter by course/lesson """
@@ -0,0 +1,172 @@
+"""
+Registry of the toolchains installed on this host.
+
+Style checks, formatting and code execution depend on external tools (PMD,
+clang-tidy, clang-format, compilers and runtimes) and on the Python linting modules
+(pycodestyle, pyflakes). Each one is probed once per
+process, with all of them probed together in the background at startup, and the
+result is kept here, so requests no longer spawn a process (for PMD, a whole JVM)
+just to learn whether a tool exists. Set CAPABILITIES_REFRESH_SECONDS to probe again
+periodically, e.g. to notice a tool installed while the app is running.
+"""
+
+import os
+import time
+import shutil
+import importlib.util
+import importlib.metadata
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds between re-probes of every tool; 0 probes only once
+CAPABILITIES_REFRESH_SECONDS = int(os.getenv('CAPABILITIES_REFRESH_SECONDS', '0'))
+
+# A tool that doesn't answer its version flag in time counts as missing
+PROBE_TIMEOUT = 15
+
+# Command printing each tool's version (or, for a Python module linted with in-process,
+# the module to import), and what the tool is for
+TOOLS = {
+    "python3": {"command": ["python3", "--version"], "kind": "runtime"},
+    "javac": {"command": ["javac", "-version"], "kind": "compiler"},
+    "java": {"command": ["java", "-version"], "kind": "runtime"},
+    "g++": {"command": ["g++", "--version"], "kind": "compiler"},
+    "flake8": {"command": ["flake8", "--version"], "kind": "linter"},
+    "pycodestyle": {"module": "pycodestyle", "kind": "linter"},
+    "pyflakes": {"module": "pyflakes", "kind": "linter"},
+    "pmd": {"command": ["pmd", "--version"], "kind": "linter"},
+    "clang-tidy": {"command": ["clang-tidy", "--version"], "kind": "linter"},
+    "clang-format": {"command": ["clang-format", "--version"], "kind": "formatter"},
+}
+
+# Tools each language feature needs; Java is formatted and Python linted in-process
+LANGUAGE_TOOLS = {
+    "python": {"run": ["python3"], "style_check": ["pycodestyle", "pyflakes"]},
+    "java": {"run": ["javac", "java"], "style_check": ["pmd"], "format": []},
+    "cpp": {"run": ["g++"], "style_check": ["clang-tidy"], "format": ["clang-format"]},
+}
+
+_tools = {}
+_probed_at = None
+_lock = threading.Lock()
+_started = False
+
+def probe(name):
+    """
+    Check whether a tool is installed and which version it is.
+
+    Args:
+        name (str): A key of TOOLS
+
+    Returns:
+        dict: available, version (first line of the version output, or the module's
+        package version), path and kind
+    """
+    if "module" in TOOLS[name]:
+        return _probe_module(name)
+    command = TOOLS[name]["command"]
+    capability = {"available": False, "version": None, "path": shutil.which(command[0]), "kind": TOOLS[name]["kind"]}
+    if capability["path"] is None:
+        return capability
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"[CAPABILITIES] Probing {name} failed: {str(e)}")
+        return capability
+    # javac and java print their version to stderr
+    output = (result.stdout.strip() or result.stderr.strip()).splitlines()
+    capability["available"] = result.returncode == 0
+    capability["version"] = output[0] if output else None
+    return capability
+
+def _probe_module(name):
+    """Check whether a Python module can be imported, without importing it."""
+    module = TOOLS[name]["module"]
+    capability = {"available": False, "version": None, "path": None, "kind": TOOLS[name]["kind"]}
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None:
+        return capability
+    capability["available"] = True
+    capability["path"] = spec.origin
+    try:
+        capability["version"] = importlib.metadata.version(module)
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    return capability
+
+def probe_all():
+    """Probe every tool at once and replace the registry with the results."""
+    global _probed_at
+    with ThreadPoolExecutor(max_workers=len(TOOLS)) as executor:
+        results = dict(zip(TOOLS, executor.map(probe, TOOLS)))
+    with _lock:
+        _tools.update(results)
+        _probed_at = time.time()
+    missing = [name for name, capability in results.items() if not capability["available"]]
+    if missing:
+        print(f"[CAPABILITIES] Not available: {', '.join(missing)}")
+
+def _refresher():
+    try:
+        probe_all()
+    except Exception as e:
+        print(f"[CAPABILITIES] Probing failed: {str(e)}")
+    while CAPABILITIES_REFRESH_SECONDS > 0:
+        time.sleep(CAPABILITIES_REFRESH_SECONDS)
+        try:
+            probe_all()
+        except Exception as e:
+            print(f"[CAPABILITIES] Refresh failed: {str(e)}")
+
+def start():
+    """Probe every tool in the background, and keep re-probing if a refresh interval is set."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_refresher, name="capabilities", daemon=True).start()
+
+def get_tool(name):
+    """
+    Return what is known about a tool, probing it now if it hasn't been yet.
+
+    Args:
+        name (str): A key of TOOLS
+
+    Returns:
+        dict: See probe()
+    """
+    with _lock:
+        capability = _tools.get(name)
+    if capability is None:
+        capability = probe(name)
+        with _lock:
+            capability = _tools.setdefault(name, capability)
+    return capability
+
+def is_available(name):
+    """Return whether a tool is installed and working."""
+    return get_tool(name)["available"]
+
+def get_capabilities():
+    """
+    Report every tool and which language features they make available.
+
+    Returns:
+        dict: tools (see probe()), languages (per language, whether run,
+        style_check and format have their tools) and probed_at
+    """
+    tools = {name: get_tool(name) for name in TOOLS}
+    languages = {
+        language: {
+            feature: all(tools[name]["available"] for name in needed)
+            for feature, needed in features.items()
+        }
+        for language, features in LANGUAGE_TOOLS.items()
+    }
+    return {"tools": tools, "languages": languages, "probed_at": _probed_at}
@@ -5,7 +5,7 @@ This module handles the Dify API integration for the AI assistant.
 
 import os
 import json
-import requests
+import http_client
 import tempfile
 from flask import jsonify, request
 from dotenv import load_dotenv
@@ -66,7 +66,7 @@ def upload_file(file_path, filename=None, user="end_user"):
             logging.info(f"File: {display_name}, MIME type: {mime_type}")
             
             # Make the multipart/form-data request
-            response = requests.post(upload_url, headers=headers, files=files, data=data)
+            response = http_client.post(upload_url, headers=headers, files=files, data=data)
             
             logging.info(f"File upload response status: {response.status_code}")
             if response.status_code == 201:
@@ -226,10 +226,11 @@ def handle_chatbot_request():
                 payload['inputs']['code'] = code
             
             # Send the request with JSON content
-            response = requests.post(
+            response = http_client.post(
                 api_url,
                 headers=headers,
-                json=payload
+                json=payload,
+                timeout=http_client.HTTP_LONG_READ_TIMEOUT
             )
             
             logging.info(f"Request sent with Content-Type: {headers.get('Content-Type')}")
@@ -1,32 +1,223 @@
 import subprocess
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from flask import jsonify
+import comparator
+import compile_cache
+import executor
+import process_runner
+import result_cache
 
-def check_code(code, testcases, language):
+# Maximum number of testcases of one submission that run at the same time
+CHECK_PARALLELISM = int(os.getenv('CHECK_PARALLELISM', '4'))
+
+# Seconds each testcase may run for
+CHECK_TIMEOUT = 2
+
+# How a check runs its testcases: all of them, until the first failure, or a
+# sample first and the rest only if the sample passes
+CHECK_MODES = ("full", "fail_fast", "sample")
+
+# Testcases run first in sample mode
+CHECK_SAMPLE_SIZE = int(os.getenv('CHECK_SAMPLE_SIZE', '3'))
+
+def compilation_error_result(error_output):
+    """ Builds the single result reported when a submission fails to compile, with the first error's line and column when known. """
+    line, column = compile_cache.error_location(error_output)
+    return {
+        "input": "N/A",
+        "expected_output": "N/A",
+        "user_output": error_output,
+        "status": "❌",
+        "error": f"Compilation error: {error_output}",
+        "verdict": "Compilation Error",
+        "line": line,
+        "column": column
+    }
+
+def skipped_result(testcase, expected_output):
+    """ Builds the result of a testcase that wasn't run because an earlier one failed. """
+    return {
+        "input": testcase,
+        "expected_output": expected_output,
+        "user_output": "Not run",
+        "status": "⏭️",
+        "verdict": "Skipped",
+        "cpu_ms": None,
+        "wall_ms": None,
+        "max_rss_kb": None
+    }
+
+def internal_error_result(testcase, expected_output, error):
+    """ Builds the result of a testcase the server failed to run, through no fault of the submission. """
+    return {
+        "input": testcase,
+        "expected_output": expected_output,
+        "user_output": f"Error: {str(error)}",
+        "status": "❗",
+        "error": str(error),
+        "verdict": "Internal Error",
+        "cpu_ms": None,
+        "wall_ms": None,
+        "max_rss_kb": None
+    }
+
+def make_runner(program):
     """
-    Checks user code against test cases and returns the results.
+    Builds a callable that runs the prepared submission with the given stdin.
+    
+    Args:
+        program (executor.Program): The prepared submission
+        
+    Returns:
+        callable: runner(stdin) returning a process_runner.RunResult
+    """
+    def runner(stdin):
+        # input() prompts would end up in the output that is compared
+        return program.run(stdin, timeout=CHECK_TIMEOUT, silence_prompts=True)
+    
+    return runner
+
+def replay(outcome):
+    """ Wraps an already-collected run outcome in the runner interface used by run_testcase(). """
+    def runner(stdin):
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    
+    return runner
+
+def run_testcase(runner, testcase, expected_output, compare="lines"):
+    """
+    Runs a prepared submission against a single testcase.
+    
+    Args:
+        runner (callable): Runs the prepared submission, see make_runner()
+        testcase (str): Input fed to the program's stdin
+        expected_output (str): Output the program should produce
+        compare (str): How outputs are compared, one of comparator.COMPARE_MODES
+        
+    Returns:
+        dict: The testcase result
+    """
+    try:
+        # Execute the prepared code with the test case input
+        result = runner(testcase)
+        # Outputs are compared as printed; the comparator decides which whitespace
+        # matters, so stripping here would cut the leading spaces of the first line
+        user_output = result.stdout
+        error_output = result.stderr.strip()
+        usage = process_runner.usage_of(result)
+        
+        # Outputs are compared in full but only shown up to the display limit
+        shown_output = process_runner.truncate_output(user_output.strip())
+        shown_error = process_runner.truncate_output(error_output)
+        
+        # Determine status
+        limit_verdict = process_runner.limit_verdict(result)
+        if limit_verdict == process_runner.OUTPUT_LIMIT_EXCEEDED:
+            return {
+                "input": testcase, 
+                "expected_output": expected_output, 
+                "user_output": shown_output, 
+                "status": "❌",
+                "error": f"Output limit exceeded (limit: {process_runner.OUTPUT_LIMIT_BYTES // 1024} KB)",
+                "verdict": limit_verdict,
+                **usage
+            }
+        elif limit_verdict == process_runner.TIME_LIMIT_EXCEEDED:
+            # Killed for using up its CPU time rather than by the wall-clock timeout
+            raise subprocess.TimeoutExpired(result.args, CHECK_TIMEOUT)
+        elif limit_verdict == process_runner.MEMORY_LIMIT_EXCEEDED:
+            return {
+                "input": testcase, 
+                "expected_output": expected_output, 
+                "user_output": shown_error or "Memory limit exceeded", 
+                "status": "❌",
+                "error": f"Memory limit exceeded (limit: {process_runner.MEMORY_LIMIT_MB} MB)",
+                "verdict": limit_verdict,
+                **usage
+            }
+        elif error_output:
+            return {
+                "input": testcase, 
+                "expected_output": expected_output, 
+                "user_output": shown_error, 
+                "status": "❌",
+                "error": shown_error,
+                "verdict": "Runtime Error",
+                **usage
+            }
+        
+        mismatch = comparator.first_mismatch(expected_output, user_output, compare)
+        if mismatch is None:
+            return {
+                "input": testcase, 
+                "expected_output": expected_output, 
+                "user_output": shown_output, 
+                "status": "✅",
+                "verdict": "Accepted",
+                **usage
+            }
+        else:
+            return {
+                "input": testcase, 
+                "expected_output": expected_output, 
+                "user_output": shown_output, 
+                "status": "❌",
+                "diff": comparator.diff(expected_output, user_output, mismatch),
+                "verdict": "Wrong Answer",
+                **usage
+            }
+            
+    except subprocess.TimeoutExpired as e:
+        return {
+            "input": testcase, 
+            "expected_output": expected_output, 
+            "user_output": "Execution timed out", 
+            "status": "⌛",
+            "error": f"Code execution timed out (limit: {CHECK_TIMEOUT} seconds)",
+            "verdict": process_runner.TIME_LIMIT_EXCEEDED,
+            **process_runner.usage_of(e)
+        }
+    except Exception as e:
+        return internal_error_result(testcase, expected_output, e)
+
+def prepare_check(code, testcases, language, mode="full", compare="lines"):
+    """
+    Validates a check request and splits its testcases into inputs and expected outputs.
     
     Args:
         code (str): The user's code to check
         testcases (list): List of test case objects with 'input' and 'output' fields
         language (str): Programming language (python, java, cpp)
+        mode (str): How the testcases will be run, one of CHECK_MODES
+        compare (str): How outputs will be compared, one of comparator.COMPARE_MODES
         
     Returns:
-        Flask response with test results
+        tuple: (inputs, expected_outputs, language, error). error is a message for a
+        400 response when the request is invalid.
     """
     if not code.strip():
-        return jsonify({"error": "No code provided"}), 400
+        return None, None, language, "No code provided"
+    
+    if mode not in CHECK_MODES:
+        return None, None, language, f"Unsupported mode: {mode}"
+    
+    if compare not in comparator.COMPARE_MODES:
+        return None, None, language, f"Unsupported comparison: {compare}"
     
     # Validate testcases format
     if not isinstance(testcases, list) or not testcases:
-        return jsonify({"error": "No valid testcases found."}), 400
+        return None, None, language, "No valid testcases found."
     
     # Convert testcases to list format if it's a JSON string
     if isinstance(testcases, str):
         try:
             testcases = json.loads(testcases)
         except json.JSONDecodeError:
-            return jsonify({"error": "Invalid JSON format for testcases"}), 400
+            return None, None, language, "Invalid JSON format for testcases"
             
     # Ensure language is set
     if not language:
@@ -58,261 +249,237 @@ def check_code(code, testcases, language):
                 inputs.append("")
                 expected_outputs.append("")
     
-    results = []
-    for i, testcase in enumerate(inputs):
-        expected_output = expected_outputs[i] if i < len(expected_outputs) else "MISSING"
-
-        # Run user's code based on language
-        try:
-            if language == "python":
-                # Create a wrapper script that redirects input() prompts to stderr
-                import tempfile
-                import os
-                
-                # Create a temporary file for the wrapper code
-                wrapper_fd, wrapper_path = tempfile.mkstemp(suffix='.py')
-                
-                try:
-                    # Build the wrapper code as separate strings to avoid any escaping issues
-                    wrapper_parts = [
-                        "import builtins",
-                        "import sys",
-                        "original_input = builtins.input",
-                        "",
-                        "# Completely silence the input function - ignore all prompts",
-                        "def input_wrapper(prompt=''):",
-                        "    # Completely ignore the prompt - no printing at all",
-                        "    # This ensures nothing interferes with the stdout that we check",
-                        "    line = sys.stdin.readline()",
-                        "    # Remove trailing newline if present",
-                        "    if line and line[-1] == chr(10):",
-                        "        line = line[:-1]", 
-                        "    return line",
-                        "",
-                        "builtins.input = input_wrapper",
-                        "",
-                        "# User code begins here",
-                        code
-                    ]
-                    
-                    # Join with newlines and write to file
-                    wrapper_code = "\n".join(wrapper_parts)
-                    with os.fdopen(wrapper_fd, 'w') as f:
-                        f.write(wrapper_code)
-                    
-                    # Run the code with the wrapper
-                    result = subprocess.run(
-                        ["python3", wrapper_path],
-                        input=testcase,
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    user_output = result.stdout.strip()
-                    error_output = result.stderr.strip()
-                finally:
-                    # Always clean up the temporary file
-                    if os.path.exists(wrapper_path):
-                        os.unlink(wrapper_path)
-            elif language == "java":
-                # Create a temporary Java file from the user code
-                import tempfile
-                import os
-                temp_dir = tempfile.mkdtemp()
-                
-                # Extract the class name from the code
-                import re
-                class_match = re.search(r'public\s+class\s+(\w+)', code)
-                
-                # Default class name if not found
-                if not class_match:
-                    class_name = "Main"
-                else:
-                    class_name = class_match.group(1)
-                
-                # Write the code to a temporary file
-                file_path = os.path.join(temp_dir, f"{class_name}.java")
-                with open(file_path, 'w') as f:
-                    f.write(code)
-                
-                try:
-                    # Compile the code
-                    compile_result = subprocess.run(
-                        ["javac", file_path],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
-                    )
-                    
-                    if compile_result.returncode != 0:
-                        # Compilation error
-                        error_output = compile_result.stderr.strip()
-                        return jsonify({
-                            "results": [{
-                                "input": "N/A",
-                                "expected_output": "N/A",
-                                "user_output": error_output,
-                                "status": "❌",
-                                "error": f"Compilation error: {error_output}"
-                            }],
-                            "passed": 0,
-                            "total": 1,
-                            "success_rate": "0/1"
-                        })
-                    
-                    # Execute the compiled code with the test case input
-                    result = subprocess.run(
-                        ["java", "-cp", temp_dir, class_name],
-                        input=testcase,
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    user_output = result.stdout.strip()
-                    error_output = result.stderr.strip()
-                    
-                    # Clean up the temporary directory
-                    import shutil
-                    shutil.rmtree(temp_dir)
-                    
-                except Exception as e:
-                    user_output = ""
-                    error_output = str(e)
-            
-            elif language == "cpp":
-                # Create a temporary C++ file from the user code
-                import tempfile
-                import os
-                temp_dir = tempfile.mkdtemp()
-                file_path = os.path.join(temp_dir, "solution.cpp")
-                executable_path = os.path.join(temp_dir, "solution")
-                
-                # Write the code to a temporary file
-                with open(file_path, 'w') as f:
-                    f.write(code)
-                
-                try:
-                    # Compile the code with C++17 standard
-                    compile_result = subprocess.run(
-                        ["g++", "-std=c++17", file_path, "-o", executable_path],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
-                    )
-                    
-                    if compile_result.returncode != 0:
-                        # Compilation error
-                        error_output = compile_result.stderr.strip()
-                        return jsonify({
-                            "results": [{
-                                "input": "N/A",
-                                "expected_output": "N/A",
-                                "user_output": error_output,
-                                "status": "❌",
-                                "error": f"Compilation error: {error_output}"
-                            }],
-                            "passed": 0,
-                            "total": 1,
-                            "success_rate": "0/1"
-                        })
-                    
-                    # Execute the compiled code with the test case input
-                    result = subprocess.run(
-                        [executable_path],
-                        input=testcase,
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    user_output = result.stdout.strip()
-                    error_output = result.stderr.strip()
-                    
-                    # Clean up the temporary directory
-                    import shutil
-                    shutil.rmtree(temp_dir)
-                    
-                except Exception as e:
-                    user_output = ""
-                    error_output = str(e)
-            else:
-                return jsonify({"error": f"Unsupported language: {language}"}), 400
-
-            # Normalize expected and user output for comparison
-            def normalize_output(output):
-                if output is None:
-                    return ""
-                # Standardize line endings and remove trailing whitespace from each line
-                lines = [line.rstrip() for line in output.strip().splitlines()]
-                # Remove empty lines at start and end
-                while lines and not lines[0]:
-                    lines.pop(0)
-                while lines and not lines[-1]:
-                    lines.pop()
-                return "\n".join(lines)
-                
-            normalized_expected = normalize_output(expected_output)
-            normalized_user = normalize_output(user_output)
-            
-            # Determine status
-            if error_output:
-                status = "Runtime Error"
-                results.append({
-                    "input": testcase, 
-                    "expected_output": expected_output, 
-                    "user_output": error_output, 
-                    "status": "❌",
-                    "error": error_output
-                })
-            elif normalized_user == normalized_expected:
-                status = "Correct"
-                results.append({
-                    "input": testcase, 
-                    "expected_output": expected_output, 
-                    "user_output": user_output, 
-                    "status": "✅"
-                })
-            else:
-                status = "Incorrect"
-                results.append({
-                    "input": testcase, 
-                    "expected_output": expected_output, 
-                    "user_output": user_output, 
-                    "status": "❌",
-                    "diff": f"Expected:\n{normalized_expected}\n\nGot:\n{normalized_user}"
-                })
-                
-        except subprocess.TimeoutExpired:
-            results.append({
-                "input": testcase, 
-                "expected_output": expected_output, 
-                "user_output": "Execution timed out", 
-                "status": "⌛",
-                "error": "Code execution timed out (limit: 2 seconds)"
-            })
-        except Exception as e:
-            results.append({
-                "input": testcase, 
-                "expected_output": expected_output, 
-                "user_output": f"Error: {str(e)}", 
-                "status": "❗",
-                "error": str(e)
-            })
+    if executor.get_language(language) is None:
+        return None, None, language, f"Unsupported language: {language}"
     
+    expected_outputs = [
+        expected_outputs[i] if i < len(expected_outputs) else "MISSING"
+        for i in range(len(inputs))
+    ]
+    return inputs, expected_outputs, language, None
+
+def summarize(results):
+    """ Builds the pass/fail summary of a finished check. """
     # Count passed testcases
     passed_count = sum(1 for r in results if r.get("status") == "✅")
     total_count = len(results)
     
-    response_data = {
-        "results": results,
+    return {
         "passed": passed_count,
         "total": total_count,
-        "success_rate": f"{passed_count}/{total_count}"
+        "success_rate": f"{passed_count}/{total_count}",
+        # Success flag for easier frontend handling
+        "success": passed_count == total_count and total_count > 0
     }
+
+def check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+    """
+    Checks a prepared submission, yielding progress events as they happen.
+    
+    Events are dicts with an "event" key:
+    - compile: {"status": "ok" | "error" | "skipped" | "failed"}, plus "error"
+      when the code doesn't compile ("error") or the server couldn't compile it,
+      e.g. because it is busy ("failed")
+    - testcase: {"index": i, "result": {...}} as each testcase finishes, in any order
+    - summary: passed, total, success_rate and success, always last
+    
+    In "fail_fast" mode no new testcase starts once one has failed, and in
+    "sample" mode the first CHECK_SAMPLE_SIZE testcases run before the rest, which
+    only run if they all pass. Testcases that weren't run are reported with a
+    "Skipped" verdict, so every mode reports every testcase.
+    
+    Outputs are compared as the comparator's compare mode says: line by line
+    by default, or ignoring whitespace, token by token, or with numbers only
+    needing to be close.
+    
+    A check of unchanged code against unchanged testcases in the same modes is
+    answered from the result cache: its events come back at once, in testcase
+    order, each with "cached": true.
     
-    # Add success flag for easier frontend handling
-    if passed_count == total_count and total_count > 0:
-        response_data["success"] = True
+    Args:
+        code (str): The user's code to check
+        inputs (list): stdin of each testcase, see prepare_check()
+        expected_outputs (list): Expected output of each testcase
+        language (str): Programming language (python, java, cpp)
+        mode (str): How the testcases are run, one of CHECK_MODES
+        compare (str): How outputs are compared, one of comparator.COMPARE_MODES
+        
+    Yields:
+        dict: The next event
+    """
+    key = result_cache.cache_key(code, language, inputs, expected_outputs, mode, compare)
+    cached = result_cache.get(key)
+    if cached is not None:
+        for event in cached:
+            yield {**event, "cached": True}
+        return
+    
+    events = []
+    for event in run_check_events(code, inputs, expected_outputs, language, mode, compare):
+        events.append(event)
+        yield event
+    
+    # Replays list the testcases in order, whatever order they finished in
+    testcases = sorted((event for event in events if event["event"] == "testcase"), key=lambda event: event["index"])
+    others = [event for event in events if event["event"] != "testcase"]
+    result_cache.put(key, others[:-1] + testcases + others[-1:])
+
+def run_check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+    """ Runs a prepared submission's testcases, yielding the events described in check_events(). """
+    # Prepare the submission once; every testcase reuses the same compiled program
+    try:
+        program, compile_error = executor.prepare(code, language, profile="check")
+    except executor.SubmissionError as e:
+        program, compile_error = None, str(e)
+    except Exception as e:
+        # Not the submission's fault (a busy host, a failed PCH build), so it is
+        # reported as an Internal Error, which is never cached
+        print(f"[CHECK] Preparing the submission failed: {str(e)}")
+        result = internal_error_result("N/A", "N/A", e)
+        yield {"event": "compile", "status": "failed", "error": str(e)}
+        yield {"event": "testcase", "index": 0, "result": result}
+        yield {"event": "summary", **summarize([result])}
+        return
+    
+    if compile_error is not None:
+        result = compilation_error_result(compile_error)
+        yield {"event": "compile", "status": "error", "error": compile_error}
+        yield {"event": "testcase", "index": 0, "result": result}
+        yield {"event": "summary", **summarize([result])}
+        return
+    yield {"event": "compile", "status": "ok" if program.language.compiled else "skipped"}
+    
+    indices = list(range(len(inputs)))
+    if mode == "sample":
+        phases = [indices[:CHECK_SAMPLE_SIZE], indices[CHECK_SAMPLE_SIZE:]]
     else:
-        response_data["success"] = False
+        phases = [indices]
+    
+    results = [None] * len(inputs)
+    failed = False
+    for phase in phases:
+        if failed or not phase:
+            break
+        for index, result in run_testcases(program, phase, inputs, expected_outputs, compare, stop_on_failure=mode == "fail_fast"):
+            results[index] = result
+            failed = failed or result["status"] != "✅"
+            yield {"event": "testcase", "index": index, "result": result}
+    
+    # Testcases an earlier failure made pointless to run
+    for index in indices:
+        if results[index] is None:
+            results[index] = skipped_result(inputs[index], expected_outputs[index])
+            yield {"event": "testcase", "index": index, "result": results[index]}
+    
+    yield {"event": "summary", **summarize(results)}
+
+def run_testcases(program, indices, inputs, expected_outputs, compare="lines", stop_on_failure=False):
+    """
+    Runs some of a prepared submission's testcases.
+    
+    Args:
+        program (executor.Program): The prepared submission
+        indices (list): Indices of the testcases to run
+        inputs (list): stdin of every testcase
+        expected_outputs (list): Expected output of every testcase
+        compare (str): How outputs are compared, one of comparator.COMPARE_MODES
+        stop_on_failure (bool): Start no more testcases once one has failed
+        
+    Yields:
+        tuple: (index, result) as each testcase finishes. With stop_on_failure,
+        testcases that never started, or that a batch ran after a failure, are
+        left out.
+    """
+    # Languages with a batch mode run every testcase at once; whatever it hands
+    # back (state it couldn't reset, a crash) runs one testcase at a time below
+    outcomes = program.run_batch([inputs[index] for index in indices], timeout=CHECK_TIMEOUT, silence_prompts=True)
+    
+    remaining = []
+    failed = False
+    for index, outcome in zip(indices, outcomes):
+        if outcome is None:
+            remaining.append(index)
+            continue
+        result = run_testcase(replay(outcome), inputs[index], expected_outputs[index], compare)
+        failed = failed or result["status"] != "✅"
+        yield index, result
+        if stop_on_failure and failed:
+            # The batch ran them all anyway, but fail_fast reports the rest as skipped
+            return
+    if not remaining:
+        return
+    
+    # Run the remaining testcases concurrently and report each one as it finishes.
+    # A new testcase starts only when one finishes, so a failure can stop the rest
+    runner = make_runner(program)
+    pending = iter(remaining)
+    running = {}
+    workers = max(1, min(CHECK_PARALLELISM, len(remaining)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    
+    def start_next():
+        index = next(pending, None)
+        if index is not None:
+            running[pool.submit(run_testcase, runner, inputs[index], expected_outputs[index], compare)] = index
+    
+    try:
+        for _ in range(workers):
+            start_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                yield running.pop(future), result
+                failed = failed or result["status"] != "✅"
+                # Testcases already running still report; no new ones start
+                if not (stop_on_failure and failed):
+                    start_next()
+    finally:
+        # A client that stops listening shouldn't leave queued testcases behind
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def collect_results(events):
+    """
+    Builds the response body of a check from its events.
+    
+    Args:
+        events: Events as yielded by check_events()
+        
+    Returns:
+        dict: results in testcase order plus the summary fields
+    """
+    results = {}
+    summary = None
+    for event in events:
+        if event["event"] == "testcase":
+            results[event["index"]] = event["result"]
+        elif event["event"] == "summary":
+            summary = {key: value for key, value in event.items() if key != "event"}
+    
+    # Results are reported in testcase order, whatever order they finished in
+    return {"results": [results[index] for index in sorted(results)], **summary}
+
+def check_code(code, testcases, language, mode="full", compare="lines"):
+    """
+    Checks user code against test cases and returns the results.
+    
+    Args:
+        code (str): The user's code to check
+        testcases (list): List of test case objects with 'input' and 'output' fields
+        language (str): Programming language (python, java, cpp)
+        mode (str): How the testcases are run, see check_events()
+        compare (str): How outputs are compared, see check_events()
         
-    return jsonify(response_data)
+    Returns:
+        Flask response with test results, with status 503 if the server couldn't
+        prepare the submission
+    """
+    inputs, expected_outputs, language, error = prepare_check(code, testcases, language, mode, compare)
+    if error is not None:
+        return jsonify({"error": error}), 400
+    
+    events = list(check_events(code, inputs, expected_outputs, language, mode, compare))
+    response = jsonify(collect_results(events))
+    if any(event["event"] == "compile" and event["status"] == "failed" for event in events):
+        response.status_code = 503
+    return response
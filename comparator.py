@@ -0,0 +1,151 @@
+"""
+Comparison of a program's output with the expected output.
+
+Both outputs are read line by line straight from the strings, without splitting
+them into lists first, and the comparison stops at the first difference, so
+grading a large output costs one pass over it and no copies. A mismatch is
+reported with a small window of lines around it rather than both outputs in full.
+
+Modes:
+- lines: lines must match after trailing whitespace is stripped (the default)
+- whitespace: lines must have the same whitespace-separated tokens
+- tokens: the outputs must have the same tokens, however they are split into lines
+- float: like tokens, but numbers only have to agree within a tolerance
+"""
+
+import os
+import re
+import math
+from itertools import zip_longest
+
+COMPARE_MODES = ("lines", "whitespace", "tokens", "float")
+
+# Tolerances of the float mode: numbers match if either is met
+COMPARE_ABS_TOL = float(os.getenv('COMPARE_ABS_TOL', '1e-6'))
+COMPARE_REL_TOL = float(os.getenv('COMPARE_REL_TOL', '1e-6'))
+
+# Lines shown on each side of the first difference, and the characters kept of each
+DIFF_CONTEXT_LINES = 2
+DIFF_LINE_CHARS = 200
+
+NUMBER_PATTERN = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+def _lines(text):
+    """Yield (line_number, line) with trailing whitespace stripped, one line at a time."""
+    start = 0
+    number = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        number += 1
+        yield number, text[start:end].rstrip()
+        start = end + 1
+
+def _content_lines(text):
+    """Like _lines(), but without the blank lines at the start and end of the output."""
+    first_blank = None
+    blanks = 0
+    seen_content = False
+    for number, line in _lines(text):
+        if not line:
+            if seen_content:
+                if not blanks:
+                    first_blank = number
+                blanks += 1
+            continue
+        # Blank lines only count once there is content after them
+        for offset in range(blanks):
+            yield first_blank + offset, ""
+        blanks = 0
+        seen_content = True
+        yield number, line
+
+def _items(text, mode):
+    """Yield (line_number, item) of the units a mode compares."""
+    for number, line in _content_lines(text):
+        if mode == "lines":
+            yield number, line
+        elif mode == "whitespace":
+            yield number, line.split()
+        else:
+            for token in line.split():
+                yield number, token
+
+def _numbers_match(expected, actual, abs_tol, rel_tol):
+    if expected == actual:
+        return True
+    if not (NUMBER_PATTERN.fullmatch(expected) and NUMBER_PATTERN.fullmatch(actual)):
+        return False
+    return math.isclose(float(expected), float(actual), rel_tol=rel_tol, abs_tol=abs_tol)
+
+def first_mismatch(expected, actual, mode="lines", abs_tol=None, rel_tol=None):
+    """
+    Find where a program's output first differs from the expected output.
+
+    Args:
+        expected (str): The expected output
+        actual (str): The program's output
+        mode (str): One of COMPARE_MODES
+        abs_tol (float, optional): Absolute tolerance of the float mode
+        rel_tol (float, optional): Relative tolerance of the float mode
+
+    Returns:
+        tuple: (expected_line, actual_line), the 1-based line numbers of the first
+        difference on each side (None where that output had already ended), or
+        None if the outputs match
+    """
+    abs_tol = COMPARE_ABS_TOL if abs_tol is None else abs_tol
+    rel_tol = COMPARE_REL_TOL if rel_tol is None else rel_tol
+    for expected_item, actual_item in zip_longest(_items(expected or "", mode), _items(actual or "", mode)):
+        if expected_item is None or actual_item is None:
+            matched = False
+        elif mode == "float":
+            matched = _numbers_match(expected_item[1], actual_item[1], abs_tol, rel_tol)
+        else:
+            matched = expected_item[1] == actual_item[1]
+        if not matched:
+            return (expected_item[0] if expected_item else None, actual_item[0] if actual_item else None)
+    return None
+
+def _window(text, line, context):
+    """The lines around a line number, each cut to DIFF_LINE_CHARS, with the line itself marked."""
+    if line is None:
+        return "(no more output)"
+    rows = []
+    for number, content in _lines(text or ""):
+        if number < line - context:
+            continue
+        if number > line + context:
+            break
+        if len(content) > DIFF_LINE_CHARS:
+            content = content[:DIFF_LINE_CHARS] + "..."
+        rows.append(f"{'>' if number == line else ' '} {number:>4} | {content}")
+    return "\n".join(rows)
+
+def diff(expected, actual, mismatch, context=DIFF_CONTEXT_LINES):
+    """
+    Describe the first difference between two outputs.
+
+    Args:
+        expected (str): The expected output
+        actual (str): The program's output
+        mismatch (tuple): What first_mismatch() returned
+        context (int): Lines shown before and after the differing line
+
+    Returns:
+        str: The differing line of each side with a few lines around it; its size
+        doesn't depend on the size of the outputs
+    """
+    expected_line, actual_line = mismatch
+    if expected_line is None:
+        header = f"Unexpected output from line {actual_line}"
+    elif actual_line is None:
+        header = f"Output ended before line {expected_line}"
+    else:
+        header = f"First difference at line {expected_line}"
+    return (
+        f"{header}\n\n"
+        f"Expected:\n{_window(expected, expected_line, context)}\n\n"
+        f"Got:\n{_window(actual, actual_line, context)}"
+    )
@@ -0,0 +1,529 @@
+"""
+Content-addressed cache of compiled Java classes and C++ binaries.
+
+Both run.py and check.py compile through this module, so pressing "Run" and then
+"Check" on the same source only pays for one compiler invocation. Entries are keyed
+by a hash of the source, language, compiler version and compiler flags, and live in
+a directory shared by every gunicorn worker on the host.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import fcntl
+import hashlib
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from functools import lru_cache
+import host_limits
+import javac_server
+
+# Cache configuration
+CACHE_DIR = os.getenv('COMPILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'problem_generator_compile_cache'))
+CACHE_MAX_BYTES = int(os.getenv('COMPILE_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+# Entries used within this window are never evicted, so a worker that just got a
+# cache hit can still load classes from the directory while it runs
+EVICTION_GRACE_SECONDS = 60
+
+COMPILE_TIMEOUT = 5
+
+# Compiler flags are part of the cache key
+JAVAC_FLAGS = []
+CPP_FLAGS = ["-std=c++17"]
+
+# Per-endpoint C++ profiles: Run wants the fastest compile, Check also runs every testcase
+CPP_PROFILES = {
+    "run": ["-O0"],
+    "check": ["-O1"],
+}
+
+# Standard headers precompiled into the C++ prelude. A submission whose includes
+# are all in this list is compiled with the prelude's precompiled header force-included.
+CPP_PRELUDE_HEADERS = [
+    "algorithm", "array", "bitset", "cassert", "cctype", "climits", "cmath", "cstdio",
+    "cstdlib", "cstring", "deque", "functional", "iomanip", "iostream", "iterator",
+    "limits", "list", "map", "memory", "numeric", "queue", "set", "sstream", "stack",
+    "string", "tuple", "unordered_map", "unordered_set", "utility", "vector",
+]
+# Whether warm_up() precompiles the C++ prelude; without it submissions compile plainly
+CPP_PRELUDE_WARM_UP = os.getenv('CPP_PRELUDE_WARM_UP', 'true').lower() not in ('0', 'false', 'no')
+
+# Seconds the prelude may take to precompile in the background
+PRELUDE_BUILD_TIMEOUT = 120
+
+PREPROCESSOR_PATTERN = re.compile(r'^\s*#\s*(\w+)\s*(.*)$')
+INCLUDE_PATTERN = re.compile(r'^<([^>]+)>')
+
+# First error position in compiler output, e.g. "solution.cpp:3:5: error:" or "Main.java:3: error:"
+ERROR_LOCATION_PATTERN = re.compile(r'^[\w.-]+\.(?:py|java|cpp):(\d+)(?::(\d+))?: (?:fatal )?error', re.MULTILINE)
+
+ENTRIES_DIR = os.path.join(CACHE_DIR, 'entries')
+BUILD_DIR = os.path.join(CACHE_DIR, 'build')
+LOCK_PATH = os.path.join(CACHE_DIR, 'cache.lock')
+STATS_PATH = os.path.join(CACHE_DIR, 'stats.json')
+PCH_DIR = os.path.join(CACHE_DIR, 'pch')
+META_FILE = 'meta.json'
+
+class CompileError(str):
+    """
+    Compiler output for a submission that failed to compile.
+
+    It is the report text wherever a string is expected, and also keeps the first
+    error's line and column when the compiler gave them as data rather than text.
+    """
+
+    def __new__(cls, text, line=None, column=None):
+        error = super().__new__(cls, text)
+        error.line = line
+        error.column = column
+        return error
+
+def error_location(error_output):
+    """
+    Find where the first error in a compile error is.
+
+    Args:
+        error_output (str): Compiler output, or a CompileError
+
+    Returns:
+        tuple: (line, column), each None when unknown
+    """
+    if isinstance(error_output, CompileError):
+        return error_output.line, error_output.column
+    location = ERROR_LOCATION_PATTERN.search(error_output)
+    if location is None:
+        return None, None
+    return int(location.group(1)), int(location.group(2)) if location.group(2) else None
+
+@contextmanager
+def _cache_lock():
+    """Hold an exclusive lock on the cache across all worker processes."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(LOCK_PATH, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@lru_cache(maxsize=None)
+def compiler_version(compiler):
+    """
+    Get the version banner of a compiler, probed once per process.
+
+    Args:
+        compiler (str): Compiler executable (javac, g++)
+
+    Returns:
+        str: The first line of the version output, or "unknown" if it can't be probed
+    """
+    version_flag = "-version" if compiler == "javac" else "--version"
+    try:
+        result = subprocess.run([compiler, version_flag], capture_output=True, text=True, timeout=COMPILE_TIMEOUT)
+        # Older javac releases print the version to stderr
+        output = (result.stdout or result.stderr).strip()
+        return output.splitlines()[0] if output else "unknown"
+    except (subprocess.SubprocessError, FileNotFoundError, OSError):
+        return "unknown"
+
+def cache_key(language, code, compiler, flags):
+    """
+    Build the content address for a compiled artifact.
+
+    Args:
+        language (str): Programming language (java, cpp)
+        code (str): Source code being compiled
+        compiler (str): Compiler executable
+        flags (list): Compiler flags that affect the artifact
+
+    Returns:
+        str: Hex digest identifying the artifact
+    """
+    digest = hashlib.sha256()
+    for part in (language, compiler, compiler_version(compiler), " ".join(flags), code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _read_stats():
+    try:
+        with open(STATS_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"hits": 0, "misses": 0, "evictions": 0}
+
+def _record(**deltas):
+    """Add to the shared hit/miss/eviction counters. Must be called under the cache lock."""
+    stats = _read_stats()
+    for name, delta in deltas.items():
+        stats[name] = stats.get(name, 0) + delta
+    tmp_path = f"{STATS_PATH}.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, STATS_PATH)
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _list_entries():
+    """Return (mtime, size, path) for every cached entry."""
+    entries = []
+    if not os.path.isdir(ENTRIES_DIR):
+        return entries
+    for name in os.listdir(ENTRIES_DIR):
+        path = os.path.join(ENTRIES_DIR, name)
+        try:
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+        except OSError:
+            continue
+    return entries
+
+def _evict():
+    """Remove least recently used entries until the cache fits. Must be called under the cache lock."""
+    entries = _list_entries()
+    total = sum(size for _, size, _ in entries)
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    now = time.time()
+    evicted = 0
+    for mtime, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if now - mtime < EVICTION_GRACE_SECONDS:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted += 1
+
+    if evicted:
+        _record(evictions=evicted)
+
+def get_or_compile(language, code, compiler, flags, build):
+    """
+    Return a cached artifact for the source, compiling it on a miss.
+
+    Args:
+        language (str): Programming language (java, cpp)
+        code (str): Source code being compiled
+        compiler (str): Compiler executable
+        flags (list): Compiler flags that affect the artifact
+        build (callable): Called as build(build_dir) on a miss. It compiles the
+            source into build_dir and returns (meta, error) where meta is a dict
+            stored alongside the artifact and error is the compiler output on failure.
+
+    Returns:
+        tuple: (artifact_dir, meta, error). On a compile error artifact_dir and
+        meta are None and nothing is cached.
+    """
+    key = cache_key(language, code, compiler, flags)
+    entry_dir = os.path.join(ENTRIES_DIR, key)
+    meta_path = os.path.join(entry_dir, META_FILE)
+
+    # Cache hits skip compilation entirely
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        # Refresh the entry's position in the LRU order
+        os.utime(entry_dir)
+        with _cache_lock():
+            _record(hits=1)
+        return entry_dir, meta, None
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(ENTRIES_DIR, exist_ok=True)
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f"{key[:16]}-", dir=BUILD_DIR)
+    try:
+        meta, error = build(build_dir)
+        with _cache_lock():
+            _record(misses=1)
+        if error is not None:
+            return None, None, error
+
+        with open(os.path.join(build_dir, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        # Publish atomically; if another worker won the race, keep its copy
+        try:
+            os.rename(build_dir, entry_dir)
+        except OSError:
+            os.utime(entry_dir)
+
+        with _cache_lock():
+            _evict()
+        return entry_dir, meta, None
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+def compile_java(code, class_name):
+    """
+    Compile a Java submission through the cache.
+
+    Args:
+        code (str): The user's Java code
+        class_name (str): Name of the public class holding main()
+
+    Returns:
+        tuple: (run_command, error). run_command runs the compiled class; error is
+        the compiler output if compilation failed.
+    """
+    def build(build_dir):
+        file_path = os.path.join(build_dir, f"{class_name}.java")
+        with open(file_path, 'w') as f:
+            f.write(code)
+
+        with host_limits.process_slot():
+            # The resident compiler skips javac's JVM startup; the command is the fallback
+            try:
+                success, diagnostics = javac_server.compile_java(
+                    class_name, code, JAVAC_FLAGS, COMPILE_TIMEOUT, build_dir
+                )
+            except subprocess.TimeoutExpired:
+                raise
+            except Exception as e:
+                if javac_server.JAVAC_SERVER_ENABLED:
+                    print(f"[COMPILE CACHE] Compile server unavailable, using javac: {str(e)}")
+            else:
+                if not success:
+                    report = javac_server.format_diagnostics(f"{class_name}.java", code, diagnostics)
+                    first = next((d for d in diagnostics if d["kind"] == "ERROR"), {})
+                    return None, CompileError(report, first.get("line"), first.get("column"))
+                return {"class_name": class_name}, None
+
+            result = subprocess.run(
+                ["javac", *JAVAC_FLAGS, file_path],
+                capture_output=True,
+                text=True,
+                timeout=COMPILE_TIMEOUT
+            )
+        if result.returncode != 0:
+            # Don't leak the shared build path into the student's error message
+            return None, result.stderr.replace(build_dir + os.sep, "").strip()
+        return {"class_name": class_name}, None
+
+    artifact_dir, meta, error = get_or_compile("java", code, "javac", JAVAC_FLAGS, build)
+    if error is not None:
+        return None, error
+    return ["java", "-cp", artifact_dir, meta["class_name"]], None
+
+def prelude_covers(code):
+    """
+    Check whether the precompiled prelude can stand in for a C++ submission's includes.
+
+    Args:
+        code (str): The user's C++ code
+
+    Returns:
+        bool: True if the code includes at least one header, every include is a
+        standard header in the prelude and no other directive comes before them
+    """
+    directives = []
+    for line in code.splitlines():
+        match = PREPROCESSOR_PATTERN.match(line)
+        if match:
+            directives.append((match.group(1), match.group(2).strip()))
+
+    include_count = sum(1 for name, _ in directives if name == "include")
+    seen = 0
+    for name, argument in directives:
+        if name == "include":
+            header = INCLUDE_PATTERN.match(argument)
+            if header is None or header.group(1).strip() not in CPP_PRELUDE_HEADERS:
+                return False
+            seen += 1
+        elif seen < include_count:
+            # A #define or #if before the includes could change what the headers declare
+            return False
+    return include_count > 0
+
+# Prelude header path per flag set, or None if its precompiled header failed to build
+_preludes = {}
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+def _prelude_source():
+    return "".join(f"#include <{header}>\n" for header in CPP_PRELUDE_HEADERS)
+
+def _prelude_dir(flags):
+    """Directory of the precompiled prelude for a set of g++ flags, named after the compiler, flags and headers."""
+    digest = hashlib.sha256()
+    for part in (compiler_version("g++"), " ".join(flags), _prelude_source()):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return os.path.join(PCH_DIR, digest.hexdigest()[:16])
+
+def cpp_prelude(flags):
+    """
+    Get the prelude header for a set of g++ flags, if it has been precompiled.
+
+    Never builds it: that takes far longer than a submission's compile budget, so
+    it happens in warm_up() and submissions compile without the prelude until then.
+
+    Args:
+        flags (list): g++ flags the submission is compiled with
+
+    Returns:
+        str: Path of the prelude header to pass to -include, or None if it isn't ready
+    """
+    key = " ".join(flags)
+    if key in _preludes:
+        return _preludes[key]
+
+    header_path = os.path.join(_prelude_dir(flags), "prelude.h")
+    if not os.path.exists(header_path + ".gch"):
+        return None
+    _preludes[key] = header_path
+    return header_path
+
+def build_cpp_prelude(flags):
+    """
+    Precompile the prelude header for a set of g++ flags, unless it already is.
+
+    A precompiled header is only valid for the flags it was built with, so each
+    profile gets its own. They live outside the LRU entries and are built once per
+    host: workers that start together take turns, and all but the first find it built.
+
+    Args:
+        flags (list): g++ flags the submission is compiled with
+
+    Returns:
+        str: Path of the prelude header, or None if it can't be built
+    """
+    key = " ".join(flags)
+    prelude_dir = _prelude_dir(flags)
+    header_path = os.path.join(prelude_dir, "prelude.h")
+
+    os.makedirs(PCH_DIR, exist_ok=True)
+    with open(os.path.join(PCH_DIR, 'build.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(header_path + ".gch"):
+                build_dir = tempfile.mkdtemp(dir=PCH_DIR)
+                try:
+                    build_header = os.path.join(build_dir, "prelude.h")
+                    with open(build_header, 'w') as f:
+                        f.write(_prelude_source())
+                    result = subprocess.run(
+                        ["g++", *flags, "-x", "c++-header", build_header, "-o", build_header + ".gch"],
+                        capture_output=True,
+                        text=True,
+                        timeout=PRELUDE_BUILD_TIMEOUT
+                    )
+                    if result.returncode != 0:
+                        print(f"[COMPILE CACHE] Failed to precompile the C++ prelude: {result.stderr.strip()}")
+                        _preludes[key] = None
+                        return None
+                    os.rename(build_dir, prelude_dir)
+                except (subprocess.SubprocessError, OSError) as e:
+                    print(f"[COMPILE CACHE] Failed to precompile the C++ prelude: {str(e)}")
+                    _preludes[key] = None
+                    return None
+                finally:
+                    shutil.rmtree(build_dir, ignore_errors=True)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    _preludes[key] = header_path
+    return header_path
+
+def _warm_up():
+    for profile_flags in CPP_PROFILES.values():
+        try:
+            build_cpp_prelude(CPP_FLAGS + profile_flags)
+        except Exception as e:
+            print(f"[COMPILE CACHE] Prelude warm-up failed: {str(e)}")
+
+def warm_up():
+    """Precompile the C++ prelude of every profile in the background, once per process."""
+    global _warm_up_started
+    if not CPP_PRELUDE_WARM_UP or shutil.which("g++") is None:
+        return
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name="cpp-prelude", daemon=True).start()
+
+def compile_cpp(code, profile="check"):
+    """
+    Compile a C++ submission through the cache.
+
+    Args:
+        code (str): The user's C++ code
+        profile (str): Compile profile from CPP_PROFILES ("run" or "check")
+
+    Returns:
+        tuple: (run_command, error). run_command runs the compiled binary; error is
+        the compiler output if compilation failed.
+    """
+    flags = CPP_FLAGS + CPP_PROFILES[profile]
+
+    def build(build_dir):
+        file_path = os.path.join(build_dir, "solution.cpp")
+        with open(file_path, 'w') as f:
+            f.write(code)
+        command = ["g++", *flags, file_path, "-o", os.path.join(build_dir, "solution")]
+
+        with host_limits.process_slot():
+            prelude = cpp_prelude(flags) if prelude_covers(code) else None
+            result = None
+            if prelude is not None:
+                result = subprocess.run(
+                    command[:1] + ["-include", prelude] + command[1:],
+                    capture_output=True,
+                    text=True,
+                    timeout=COMPILE_TIMEOUT
+                )
+            if result is None or (result.returncode != 0 and "prelude.h:" in result.stderr):
+                # The prelude declares more than the submission asked for, and those
+                # extra names can clash with its own. Errors that involve its headers
+                # are therefore checked with a plain compile; the rest are the
+                # submission's own and stand as they are
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    timeout=COMPILE_TIMEOUT
+                )
+        if result.returncode != 0:
+            return None, result.stderr.replace(build_dir + os.sep, "").strip()
+        return {"executable": "solution"}, None
+
+    artifact_dir, meta, error = get_or_compile("cpp", code, "g++", flags, build)
+    if error is not None:
+        return None, error
+    return [os.path.join(artifact_dir, meta["executable"])], None
+
+def get_stats():
+    """
+    Get cache usage counters shared by all workers on this host.
+
+    Returns:
+        dict: Hit/miss/eviction counts plus the current entry count and size
+    """
+    with _cache_lock():
+        stats = _read_stats()
+        entries = _list_entries()
+
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats.update({
+        "entries": len(entries),
+        "size_bytes": sum(size for _, size, _ in entries),
+        "max_bytes": CACHE_MAX_BYTES,
+        "hit_rate": round(stats.get("hits", 0) / lookups, 3) if lookups else 0.0
+    })
+    return stats
@@ -1,4 +1,5 @@
 import os
+import time
 import sqlite3
 import json
 import logging
@@ -74,6 +75,13 @@ def init_db():
         if 'language' not in columns:
             logger.info("Adding 'language' column to problems table")
             cursor.execute('ALTER TABLE problems ADD COLUMN language TEXT')
+        
+        # pool_status is 'unserved' for pre-generated problems waiting in the pool,
+        # 'served' once handed out and NULL for problems generated on request
+        if 'pool_status' not in columns:
+            logger.info("Adding 'pool_status' column to problems table")
+            cursor.execute('ALTER TABLE problems ADD COLUMN pool_status TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_problems_pool ON problems (course, lesson, language, pool_status)')
 
         # Create testcases table
         cursor.execute('''
@@ -96,9 +104,84 @@ def init_db():
             passed_testcases INTEGER NOT NULL,
             total_testcases INTEGER NOT NULL,
             submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            mode TEXT NOT NULL DEFAULT 'full',
             FOREIGN KEY (problem_id) REFERENCES problems(id)
         )
         ''')
+        
+        # Check if the mode column exists, and add it if not
+        cursor.execute("PRAGMA table_info(solutions)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'mode' not in columns:
+            logger.info("Adding 'mode' column to solutions table")
+            cursor.execute("ALTER TABLE solutions ADD COLUMN mode TEXT NOT NULL DEFAULT 'full'")
+
+        # Create jobs table for asynchronous check/run requests
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            language TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+        ''')
+
+        # Create job_events table holding the progress events of each job in order
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, id)')
+
+        # Create check_results table caching the results of recent checks
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS check_results (
+            cache_key TEXT PRIMARY KEY,
+            events TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_results_last_used ON check_results (last_used_at)')
+
+        # Create generation_requests table recording recent demand for problems per lesson
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course TEXT NOT NULL,
+            lesson TEXT NOT NULL,
+            language TEXT NOT NULL,
+            requested_at REAL NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_generation_requests_time ON generation_requests (requested_at)')
+
+        # Create problem_pool_leases table so only one worker refills a pool at a time
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS problem_pool_leases (
+            pool_key TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        )
+        ''')
+
+        # Create uploaded_files table remembering files already uploaded to the workflow API
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS uploaded_files (
+            content_hash TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            uploaded_at REAL NOT NULL
+        )
+        ''')
 
         # Enable foreign keys
         cursor.execute('PRAGMA foreign_keys = ON')
@@ -113,7 +196,7 @@ def init_db():
         if 'conn' in locals():
             conn.close()
 
-def store_problem(title, problem_text, course, lesson, testcases, language=None):
+def store_problem(title, problem_text, course, lesson, testcases, language=None, pool_status=None):
     """
     Store a newly generated problem and its testcases.
     
@@ -124,6 +207,7 @@ def store_problem(title, problem_text, course, lesson, testcases, language=None)
         lesson (str): Lesson identifier
         testcases (list): List of testcase objects with input/expected_output fields
         language (str, optional): Programming language for the problem. If None, determined from course.
+        pool_status (str, optional): 'unserved' to keep the problem in the pre-generated pool
         
     Returns:
         int: ID of the inserted problem
@@ -151,8 +235,8 @@ def store_problem(title, problem_text, course, lesson, testcases, language=None)
         
         # Insert the problem
         cursor.execute(
-            'INSERT INTO problems (title, problem_text, course, lesson, language) VALUES (?, ?, ?, ?, ?)',
-            (title, problem_text, course, lesson, language)
+            'INSERT INTO problems (title, problem_text, course, lesson, language, pool_status) VALUES (?, ?, ?, ?, ?, ?)',
+            (title, problem_text, course, lesson, language, pool_status)
         )
         problem_id = cursor.lastrowid
         logger.info(f"Inserted problem with ID: {problem_id}")
@@ -188,7 +272,7 @@ def store_problem(title, problem_text, course, lesson, testcases, language=None)
         logger.error(traceback.format_exc())
         return None
 
-def store_solution(problem_id, language, code, passed_testcases, total_testcases):
+def store_solution(problem_id, language, code, passed_testcases, total_testcases, mode="full"):
     """
     Store a solution attempt.
     
@@ -198,6 +282,8 @@ def store_solution(problem_id, language, code, passed_testcases, total_testcases
         code (str): Source code of the solution
         passed_testcases (int): Number of testcases passed
         total_testcases (int): Total number of testcases
+        mode (str): Check mode ('full', 'fail_fast', 'sample'); outside 'full',
+            testcases skipped after a failure count as not passed
         
     Returns:
         int: ID of the inserted solution
@@ -206,8 +292,8 @@ def store_solution(problem_id, language, code, passed_testcases, total_testcases
     cursor = conn.cursor()
     
     cursor.execute(
-        'INSERT INTO solutions (problem_id, language, code, passed_testcases, total_testcases) VALUES (?, ?, ?, ?, ?)',
-        (problem_id, language, code, passed_testcases, total_testcases)
+        'INSERT INTO solutions (problem_id, language, code, passed_testcases, total_testcases, mode) VALUES (?, ?, ?, ?, ?, ?)',
+        (problem_id, language, code, passed_testcases, total_testcases, mode)
     )
     solution_id = cursor.lastrowid
     
@@ -262,7 +348,8 @@ def get_problems(limit=50):
     cursor = conn.cursor()
     
     cursor.execute(
-        'SELECT id, title, course, lesson, language, created_at FROM problems ORDER BY created_at DESC LIMIT ?',
+        "SELECT id, title, course, lesson, language, created_at FROM problems WHERE pool_status IS NOT 'unserved' "
+        'ORDER BY created_at DESC LIMIT ?',
         (limit,)
     )
     problems = [dict(p) for p in cursor.fetchall()]
@@ -285,7 +372,8 @@ def get_problems_by_lesson(course, lesson):
     cursor = conn.cursor()
     
     cursor.execute(
-        'SELECT id, title, created_at FROM problems WHERE course = ? AND lesson = ? ORDER BY created_at DESC',
+        "SELECT id, title, created_at FROM problems WHERE course = ? AND lesson = ? AND pool_status IS NOT 'unserved' "
+        'ORDER BY created_at DESC',
         (course, lesson)
     )
     problems = [dict(p) for p in cursor.fetchall()]
@@ -372,6 +460,459 @@ def delete_problem(problem_id):
             conn.close()
         return False
 
+def create_job(job_id, kind, language):
+    """
+    Record a newly queued job.
+    
+    Args:
+        job_id (str): Unique ID of the job
+        kind (str): What the job does ('check' or 'run')
+        language (str): Programming language of the submission
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT INTO jobs (id, kind, language, status, created_at) VALUES (?, ?, ?, ?, ?)',
+        (job_id, kind, language, 'queued', time.time())
+    )
+    
+    conn.commit()
+    conn.close()
+
+def start_job(job_id):
+    """
+    Mark a queued job as running.
+    
+    Args:
+        job_id (str): ID of the job
+        
+    Returns:
+        bool: False if the job is no longer queued, e.g. because it was given up on as stale
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?',
+        ('running', time.time(), job_id, 'queued')
+    )
+    started = cursor.rowcount == 1
+    
+    conn.commit()
+    conn.close()
+    return started
+
+def finish_job(job_id, status, result=None, error=None):
+    """
+    Record the outcome of a job, unless it already has one.
+    
+    Args:
+        job_id (str): ID of the job
+        status (str): Final status ('done' or 'failed')
+        result (dict, optional): The job's result, stored as JSON
+        error (str, optional): Why the job failed
+        
+    Returns:
+        bool: False if the job had already finished, e.g. because it was given up on as stale
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status NOT IN ('done', 'failed')",
+        (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+    )
+    finished = cursor.rowcount == 1
+    
+    conn.commit()
+    conn.close()
+    return finished
+
+def fail_stale_job(job_id, error, conn=None):
+    """
+    Fail a job that is still queued or running, recording an error event with it.
+    
+    The status and the event are written together, so anyone who sees the job
+    failed also sees why.
+    
+    Args:
+        job_id (str): ID of the job
+        error (str): Why the job was given up on
+        conn (sqlite3.Connection, optional): Connection to use instead of a new one
+        
+    Returns:
+        bool: False if the job had finished in the meantime
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+        (error, time.time(), job_id)
+    )
+    failed = cursor.rowcount == 1
+    if failed:
+        cursor.execute(
+            'INSERT INTO job_events (job_id, event) VALUES (?, ?)',
+            (job_id, json.dumps({"event": "error", "error": error}))
+        )
+    
+    conn.commit()
+    if own_conn:
+        conn.close()
+    return failed
+
+def append_job_event(job_id, event):
+    """
+    Append a progress event to a job.
+    
+    Args:
+        job_id (str): ID of the job
+        event (dict): The event, stored as JSON
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT INTO job_events (job_id, event) VALUES (?, ?)',
+        (job_id, json.dumps(event))
+    )
+    
+    conn.commit()
+    conn.close()
+
+def get_job(job_id, conn=None):
+    """
+    Retrieve a job by its ID.
+    
+    Args:
+        job_id (str): ID of the job
+        conn (sqlite3.Connection, optional): Connection to use instead of a new one,
+            e.g. one kept open while following a job
+        
+    Returns:
+        dict: Job data with its result decoded, or None if not found
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+    job = cursor.fetchone()
+    if own_conn:
+        conn.close()
+    
+    if not job:
+        return None
+    
+    job_dict = dict(job)
+    job_dict['job_id'] = job_dict.pop('id')
+    if job_dict['result'] is not None:
+        job_dict['result'] = json.loads(job_dict['result'])
+    return job_dict
+
+def get_job_events(job_id, after_id=0, conn=None):
+    """
+    Get the progress events of a job.
+    
+    Args:
+        job_id (str): ID of the job
+        after_id (int): Only return events stored after this event ID
+        conn (sqlite3.Connection, optional): Connection to use instead of a new one
+        
+    Returns:
+        list: (event_id, event) tuples in the order they were stored
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT id, event FROM job_events WHERE job_id = ? AND id > ? ORDER BY id',
+        (job_id, after_id)
+    )
+    events = [(row['id'], json.loads(row['event'])) for row in cursor.fetchall()]
+    
+    if own_conn:
+        conn.close()
+    return events
+
+def delete_finished_jobs(older_than):
+    """
+    Delete finished jobs and their events.
+    
+    Args:
+        older_than (float): Delete jobs that finished before this Unix timestamp
+        
+    Returns:
+        int: Number of jobs deleted
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)',
+        (older_than,)
+    )
+    cursor.execute('DELETE FROM jobs WHERE finished_at < ?', (older_than,))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    return deleted
+
+def get_cached_check(cache_key, created_after):
+    """
+    Look up the cached events of a check and mark them as recently used.
+    
+    Args:
+        cache_key (str): Key of the check, see result_cache.cache_key()
+        created_after (float): Ignore entries stored before this Unix timestamp
+        
+    Returns:
+        list: The check's events, or None on a miss
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT events FROM check_results WHERE cache_key = ? AND created_at > ?',
+        (cache_key, created_after)
+    )
+    row = cursor.fetchone()
+    if row:
+        cursor.execute(
+            'UPDATE check_results SET last_used_at = ? WHERE cache_key = ?',
+            (time.time(), cache_key)
+        )
+        conn.commit()
+    
+    conn.close()
+    return json.loads(row['events']) if row else None
+
+def put_cached_check(cache_key, events, created_after, max_entries):
+    """
+    Cache the events of a finished check, evicting expired and least recently used entries.
+    
+    Args:
+        cache_key (str): Key of the check, see result_cache.cache_key()
+        events (list): The check's events, stored as JSON
+        created_after (float): Entries stored before this Unix timestamp are deleted
+        max_entries (int): Number of entries to keep
+    """
+    now = time.time()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT OR REPLACE INTO check_results (cache_key, events, created_at, last_used_at) VALUES (?, ?, ?, ?)',
+        (cache_key, json.dumps(events), now, now)
+    )
+    cursor.execute('DELETE FROM check_results WHERE created_at <= ?', (created_after,))
+    cursor.execute(
+        'DELETE FROM check_results WHERE cache_key NOT IN '
+        '(SELECT cache_key FROM check_results ORDER BY last_used_at DESC LIMIT ?)',
+        (max_entries,)
+    )
+    
+    conn.commit()
+    conn.close()
+
+def claim_pooled_problem(course, lesson, language):
+    """
+    Take the oldest unserved problem of a lesson out of the pool.
+    
+    Args:
+        course (str): Course identifier
+        lesson (str): Lesson identifier
+        language (str): Programming language
+        
+    Returns:
+        int: ID of the claimed problem, now marked 'served', or None if the pool is empty
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    problem_id = None
+    
+    while problem_id is None:
+        cursor.execute(
+            "SELECT id FROM problems WHERE course = ? AND lesson = ? AND language = ? AND pool_status = 'unserved' "
+            'ORDER BY id LIMIT 1',
+            (course, lesson, language)
+        )
+        row = cursor.fetchone()
+        if not row:
+            break
+        # Another worker may claim the same row first; then try the next one
+        cursor.execute(
+            "UPDATE problems SET pool_status = 'served' WHERE id = ? AND pool_status = 'unserved'",
+            (row['id'],)
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            problem_id = row['id']
+    
+    conn.close()
+    return problem_id
+
+def get_pool_depths():
+    """
+    Count the unserved problems in the pool of every lesson.
+    
+    Returns:
+        list: Dictionaries with course, lesson, language and unserved
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "SELECT course, lesson, language, COUNT(*) AS unserved FROM problems WHERE pool_status = 'unserved' "
+        'GROUP BY course, lesson, language'
+    )
+    depths = [dict(row) for row in cursor.fetchall()]
+    
+    conn.close()
+    return depths
+
+def record_generation_request(course, lesson, language, requested_after):
+    """
+    Record a request for a problem of a lesson, deleting records too old to count.
+    
+    Args:
+        course (str): Course identifier
+        lesson (str): Lesson identifier
+        language (str): Programming language
+        requested_after (float): Records older than this Unix timestamp are deleted
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT INTO generation_requests (course, lesson, language, requested_at) VALUES (?, ?, ?, ?)',
+        (course, lesson, language, time.time())
+    )
+    cursor.execute('DELETE FROM generation_requests WHERE requested_at <= ?', (requested_after,))
+    
+    conn.commit()
+    conn.close()
+
+def get_generation_demand(requested_after):
+    """
+    Count the requests for problems of each lesson since a point in time.
+    
+    Args:
+        requested_after (float): Only count requests made after this Unix timestamp
+        
+    Returns:
+        list: Dictionaries with course, lesson, language and requests
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT course, lesson, language, COUNT(*) AS requests FROM generation_requests '
+        'WHERE requested_at > ? GROUP BY course, lesson, language',
+        (requested_after,)
+    )
+    demand = [dict(row) for row in cursor.fetchall()]
+    
+    conn.close()
+    return demand
+
+def acquire_pool_lease(pool_key, expires_at):
+    """
+    Take the lease on refilling a pool, unless another worker holds it.
+    
+    Args:
+        pool_key (str): The pool's key
+        expires_at (float): Unix timestamp after which the lease lapses if not released
+        
+    Returns:
+        bool: Whether the lease was taken
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM problem_pool_leases WHERE pool_key = ? AND expires_at <= ?', (pool_key, time.time()))
+    cursor.execute(
+        'INSERT OR IGNORE INTO problem_pool_leases (pool_key, expires_at) VALUES (?, ?)',
+        (pool_key, expires_at)
+    )
+    acquired = cursor.rowcount == 1
+    
+    conn.commit()
+    conn.close()
+    return acquired
+
+def release_pool_lease(pool_key):
+    """Release the lease on refilling a pool."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM problem_pool_leases WHERE pool_key = ?', (pool_key,))
+    
+    conn.commit()
+    conn.close()
+
+def get_uploaded_file(content_hash, uploaded_after):
+    """
+    Look up the workflow API's ID of an uploaded file.
+    
+    Args:
+        content_hash (str): Key of the file, see upload_cache.cache_key()
+        uploaded_after (float): Ignore uploads made before this Unix timestamp
+        
+    Returns:
+        str: The file ID, or None on a miss
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT file_id FROM uploaded_files WHERE content_hash = ? AND uploaded_at > ?',
+        (content_hash, uploaded_after)
+    )
+    row = cursor.fetchone()
+    
+    conn.close()
+    return row['file_id'] if row else None
+
+def put_uploaded_file(content_hash, file_id, uploaded_after):
+    """
+    Remember the ID of an uploaded file, deleting expired entries.
+    
+    Args:
+        content_hash (str): Key of the file, see upload_cache.cache_key()
+        file_id (str): ID the workflow API gave the upload
+        uploaded_after (float): Entries uploaded before this Unix timestamp are deleted
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT OR REPLACE INTO uploaded_files (content_hash, file_id, uploaded_at) VALUES (?, ?, ?)',
+        (content_hash, file_id, time.time())
+    )
+    cursor.execute('DELETE FROM uploaded_files WHERE uploaded_at <= ?', (uploaded_after,))
+    
+    conn.commit()
+    conn.close()
+
+def delete_uploaded_file(content_hash):
+    """Forget the ID of an uploaded file, e.g. after the workflow API rejected it."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM uploaded_files WHERE content_hash = ?', (content_hash,))
+    
+    conn.commit()
+    conn.close()
+
 def populate_language_column():
     """
     One-time function to populate the language column in the problems table
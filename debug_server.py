@@ -63,6 +63,7 @@ def check_file_access():
     critical_files = [
         'app.py',
         'request.py',
+        'generation.py',
         'run.py',
         'check.py',
         'wsgi.py',
@@ -95,7 +96,7 @@ def check_api_connection():
     # Load from dotenv instead of importing from request
     try:
         sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-        from request import BASE_URL
+        from generation import BASE_URL
         
         # Ensure .env is loaded
         load_dotenv()
@@ -120,7 +121,7 @@ def check_api_connection():
             print(f"Error connecting to API: {str(e)}")
             
     except Exception as e:
-        print(f"Error importing request.py: {str(e)}")
+        print(f"Error importing generation.py: {str(e)}")
 
 def check_compilers():
     """Check if required compilers are installed"""
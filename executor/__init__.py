@@ -0,0 +1,33 @@
+"""
+Execution engine shared by Run, Check and background jobs.
+
+Each supported language is a plugin (see executor.base.Language) that knows how to
+validate, compile and run a submission, and optionally how to run many testcases
+at once. Endpoints only deal with the Program that prepare() returns, so host-wide
+slots, run workspaces and other cross-cutting behaviour live in one place.
+"""
+
+from executor.base import (
+    COMPILE_TIMEOUT_MESSAGE,
+    Language,
+    Program,
+    SubmissionError,
+    get_language,
+    prepare,
+    register,
+    supported_languages,
+)
+
+__all__ = [
+    "COMPILE_TIMEOUT_MESSAGE",
+    "Language",
+    "Program",
+    "SubmissionError",
+    "get_language",
+    "prepare",
+    "register",
+    "supported_languages",
+]
+
+# Importing the plugins registers them
+from executor import cpp, java, python  # noqa: E402,F401
@@ -0,0 +1,181 @@
+"""
+Language plugin interface and the Program handle endpoints run submissions through.
+"""
+
+import subprocess
+import compile_cache
+import host_limits
+import workspaces
+
+COMPILE_TIMEOUT_MESSAGE = f"Compilation timed out (limit: {compile_cache.COMPILE_TIMEOUT} seconds)"
+
+class SubmissionError(Exception):
+    """Raised when a submission can't be run at all, e.g. Java code without a class to start."""
+
+class Language:
+    """
+    A supported programming language.
+
+    Plugins override the hooks below and call register() on an instance.
+    """
+
+    name = None
+    compiled = False
+
+    def prepare(self, code):
+        """
+        Validate a submission and work out what compile() and run() need.
+
+        Returns:
+            dict: Details of the submission, passed to compile() and run()
+
+        Raises:
+            SubmissionError: If the submission can't be run
+        """
+        return {}
+
+    def syntax_check(self, code):
+        """
+        Check a submission for errors that would stop every run, without compiling it.
+
+        Meant for interpreted languages, whose errors would otherwise show up in
+        every testcase instead of once.
+
+        Returns:
+            str: The error in compiler style, or None if there is nothing to report
+        """
+        return None
+
+    def compile(self, code, details, profile):
+        """
+        Compile a submission.
+
+        Args:
+            code (str): The user's code
+            details (dict): What prepare() returned
+            profile (str): Which endpoint is compiling ("run" or "check")
+
+        Returns:
+            tuple: (run_command, error). run_command runs the compiled program;
+            error is the compiler output on failure.
+
+        Raises:
+            subprocess.TimeoutExpired: If compilation ran past its timeout
+        """
+        return None, None
+
+    def run(self, program, stdin, timeout, cwd, silence_prompts):
+        """
+        Run a prepared program once. The caller holds a host slot and the workspace.
+
+        Returns:
+            process_runner.RunResult
+
+        Raises:
+            subprocess.TimeoutExpired: If the program ran past the timeout
+        """
+        raise NotImplementedError
+
+    def run_batch(self, program, stdins, timeout, cwd, silence_prompts):
+        """
+        Run a prepared program against several inputs at once.
+
+        Returns:
+            list: Per input, a RunResult, a subprocess.TimeoutExpired, or None when
+            that input has to be run with run() instead. None means the language has
+            no batch mode at all.
+        """
+        return None
+
+class Program:
+    """A submission ready to run: validated and, if needed, compiled once for every run."""
+
+    def __init__(self, language, code, details, run_command=None):
+        self.language = language
+        self.code = code
+        self.details = details
+        self.run_command = run_command
+
+    def run(self, stdin, timeout, silence_prompts=False):
+        """
+        Run the program once in a host-wide execution slot and its own workspace.
+
+        Args:
+            stdin (str): Data fed to the program's stdin
+            timeout (float): Seconds before the program is killed
+            silence_prompts (bool): Keep input() prompts out of stdout where the language has them
+
+        Returns:
+            process_runner.RunResult with text stdout/stderr and resource usage
+
+        Raises:
+            subprocess.TimeoutExpired: If the program ran past the timeout
+        """
+        with host_limits.process_slot(), workspaces.workspace() as cwd:
+            return self.language.run(self, stdin, timeout, cwd, silence_prompts)
+
+    def run_batch(self, stdins, timeout, silence_prompts=False):
+        """
+        Run the program against several inputs in one slot and workspace.
+
+        Returns:
+            list: Per input, a RunResult, a subprocess.TimeoutExpired, or None when
+            that input still has to be run on its own with run()
+        """
+        if type(self.language).run_batch is Language.run_batch:
+            return [None] * len(stdins)
+        with host_limits.process_slot(), workspaces.workspace() as cwd:
+            outcomes = self.language.run_batch(self, stdins, timeout, cwd, silence_prompts)
+        return outcomes if outcomes is not None else [None] * len(stdins)
+
+_languages = {}
+
+def register(language):
+    """Make a language plugin available under its name."""
+    _languages[language.name] = language
+    return language
+
+def get_language(name):
+    """Return the plugin for a language name, or None if it isn't supported."""
+    return _languages.get(name)
+
+def supported_languages():
+    """Return the names of every registered language."""
+    return list(_languages)
+
+def prepare(code, language, profile):
+    """
+    Validate and compile a submission.
+
+    Args:
+        code (str): The user's code
+        language (str): Programming language (python, java, cpp)
+        profile (str): Which endpoint is preparing it ("run" or "check"), which
+            picks the compiler flags
+
+    Returns:
+        tuple: (program, compile_error). program is None when compilation (or the
+        syntax check) failed and compile_error holds the compiler output (or a
+        timeout message).
+
+    Raises:
+        SubmissionError: If the language is unsupported or the submission can't be run
+    """
+    plugin = get_language(language)
+    if plugin is None:
+        raise SubmissionError(f"Unsupported language: {language}")
+
+    details = plugin.prepare(code)
+    syntax_error = plugin.syntax_check(code)
+    if syntax_error is not None:
+        return None, syntax_error
+    if not plugin.compiled:
+        return Program(plugin, code, details), None
+
+    try:
+        run_command, compile_error = plugin.compile(code, details, profile)
+    except subprocess.TimeoutExpired:
+        return None, COMPILE_TIMEOUT_MESSAGE
+    if compile_error is not None:
+        return None, compile_error
+    return Program(plugin, code, details, run_command), None
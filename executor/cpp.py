@@ -0,0 +1,19 @@
+"""
+C++ plugin: compiled through the compile cache with the endpoint's profile and run directly.
+"""
+
+import compile_cache
+import process_runner
+from executor.base import Language, register
+
+class Cpp(Language):
+    name = "cpp"
+    compiled = True
+
+    def compile(self, code, details, profile):
+        return compile_cache.compile_cpp(code, profile=profile)
+
+    def run(self, program, stdin, timeout, cwd, silence_prompts):
+        return process_runner.run_process(program.run_command, stdin, timeout=timeout, cwd=cwd)
+
+register(Cpp())
@@ -0,0 +1,32 @@
+"""
+Java plugin: compiled through the compile cache and run in the warm JVM pool.
+"""
+
+import re
+import compile_cache
+import jvm_runner
+from executor.base import Language, SubmissionError, register
+
+PUBLIC_CLASS_PATTERN = re.compile(r'public\s+class\s+(\w+)')
+MAIN_CLASS_PATTERN = re.compile(r'\bclass\s+Main\b')
+
+class Java(Language):
+    name = "java"
+    compiled = True
+
+    def prepare(self, code):
+        # The public class names the source file and is the one that is run
+        class_match = PUBLIC_CLASS_PATTERN.search(code)
+        if class_match:
+            return {"class_name": class_match.group(1)}
+        if MAIN_CLASS_PATTERN.search(code):
+            return {"class_name": "Main"}
+        raise SubmissionError("Could not find a public class in your Java code.")
+
+    def compile(self, code, details, profile):
+        return compile_cache.compile_java(code, details["class_name"])
+
+    def run(self, program, stdin, timeout, cwd, silence_prompts):
+        return jvm_runner.run_java(program.code, program.run_command, stdin, timeout=timeout, cwd=cwd)
+
+register(Java())
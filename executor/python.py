@@ -0,0 +1,60 @@
+"""
+Python plugin: syntax-checked in-process, then run in forked children of the warm interpreter pool.
+"""
+
+import os
+import compile_cache
+import python_pool
+from executor.base import Language, register
+
+# Run all of a Python submission's testcases in one warm child instead of one child each
+BATCH_ENABLED = os.getenv('CHECK_PYTHON_BATCH', 'true').lower() not in ('0', 'false', 'no')
+
+# Name syntax errors are reported against, like the source files of Java and C++
+SOURCE_NAME = "solution.py"
+
+def syntax_error(code):
+    """
+    Compile Python source to bytecode without running it.
+
+    Args:
+        code (str): The user's code
+
+    Returns:
+        compile_cache.CompileError: The error in compiler style ("solution.py:LINE:COL:
+        error: ..." followed by the offending line and a caret), or None if the code compiles
+    """
+    try:
+        compile(code, SOURCE_NAME, "exec", dont_inherit=True)
+    except SyntaxError as e:
+        message = f"{SOURCE_NAME}:{e.lineno or 1}:{e.offset or 1}: error: {e.msg}"
+        if e.text:
+            text = e.text.rstrip("\n")
+            indent = len(text) - len(text.lstrip())
+            caret = " " * max(0, (e.offset or 1) - 1 - indent)
+            message += f"\n    {text.strip()}\n    {caret}^"
+        return compile_cache.CompileError(message, e.lineno or 1, e.offset or 1)
+    except ValueError as e:
+        # Null bytes in the source
+        return f"{SOURCE_NAME}: error: {str(e)}"
+    except Exception:
+        # The interpreter that runs the code will report anything else
+        return None
+    return None
+
+class Python(Language):
+    name = "python"
+
+    def syntax_check(self, code):
+        return syntax_error(code)
+
+    def run(self, program, stdin, timeout, cwd, silence_prompts):
+        return python_pool.run_python(program.code, stdin, timeout=timeout, silence_prompts=silence_prompts, cwd=cwd)
+
+    def run_batch(self, program, stdins, timeout, cwd, silence_prompts):
+        # A single testcase gains nothing from a batch child
+        if not BATCH_ENABLED or len(stdins) < 2:
+            return None
+        return python_pool.run_python_batch(program.code, stdins, timeout=timeout, silence_prompts=silence_prompts, cwd=cwd)
+
+register(Python())
@@ -0,0 +1,393 @@
+"""
+Problem generation service.
+
+Builds a syllabus of the lessons up to the requested one, uploads it to the Dify
+workflow API (unless the same syllabus was uploaded recently, see upload_cache.py)
+and runs the problem generator workflow on it. /generate calls
+generate_problem() directly; request.py is a command-line wrapper around it.
+"""
+
+import os
+import re
+import json
+import tempfile
+import http_client
+import upload_cache
+from dotenv import load_dotenv
+from github_utils import GitHubFetcher
+
+# Load the .env file
+load_dotenv()
+
+# Keep the original BASE_URL - this is critical for the generate functionality
+BASE_URL = "http://47.251.117.165/v1"
+
+# User the workflow API attributes uploads and runs to
+DEFAULT_USER = "testuser"
+
+# Workflow errors meaning an uploaded file ID is no longer accepted
+STALE_UPLOAD_PATTERN = re.compile(r'\bfile\b.*\b(?:not found|not exist|expired|invalid)\b|\binvalid\b.*\bfile\b', re.IGNORECASE | re.DOTALL)
+
+class GenerationError(Exception):
+    """Raised when a problem can't be generated."""
+
+class GenerationResult:
+    """A generated problem, as returned by the workflow."""
+
+    def __init__(self, response):
+        self.response = response
+        outputs = response.get("data", {}).get("outputs", {}) or {}
+        self.title = outputs.get("Title", "Untitled Problem")
+        self.problem = outputs.get("Problem", "")
+        # JSON list of testcases, possibly wrapped in a markdown code block
+        self.raw_testcases = (outputs.get("Testcases") or "").strip()
+
+def api_key():
+    """
+    Return the workflow API key.
+
+    Raises:
+        GenerationError: If PROBLEM_GENERATOR_API_KEY isn't set
+    """
+    key = os.getenv("PROBLEM_GENERATOR_API_KEY")
+    if not key:
+        raise GenerationError("Missing PROBLEM_GENERATOR_API_KEY. Set it in the .env file.")
+    return key
+
+def default_language(course):
+    """ Picks the programming language of a course when the request doesn't name one. """
+    if course == "csa":
+        # AP Computer Science A uses Java
+        return "java"
+    elif "python" in course.lower():
+        return "python"
+    elif "java" in course.lower():
+        return "java"
+    elif "cpp" in course.lower() or "c++" in course.lower():
+        return "cpp"
+    # Default to Python if course doesn't match any known language
+    return "python"
+
+_fetcher = None
+
+def get_fetcher():
+    """Return this process's GitHub fetcher, so its lesson cache stays warm between generations."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = GitHubFetcher()
+    return _fetcher
+
+def upload_file(file_path, user):
+    """ Uploads a file to the API and returns the file ID. """
+    upload_url = f"{BASE_URL}/files/upload"
+    headers = { "Authorization": f"Bearer {api_key()}" }
+
+    try:
+        print(f"[GENERATION] Uploading file: {file_path}")
+        if not os.path.exists(file_path):
+            print(f"[GENERATION] Error: File not found: {file_path}")
+            return None
+
+        with open(file_path, 'rb') as file:
+            files = { 'file': (os.path.basename(file_path), file, 'text/plain') }
+            data = { "user": user, "type": "document" }
+
+            response = http_client.post(upload_url, headers=headers, files=files, data=data)
+
+            print(f"[GENERATION] Upload response status: {response.status_code}")
+            if response.status_code == 201:
+                file_id = response.json().get("id")
+                print(f"[GENERATION] File uploaded successfully, ID: {file_id}")
+                return file_id
+            else:
+                print(f"[GENERATION] File upload failed: {response.text}")
+                return None
+    except Exception as e:
+        print(f"[GENERATION] Error during file upload: {str(e)}")
+        return None
+
+def run_workflow(inputs, response_mode, user):
+    """ Calls the workflow API. """
+    # Use the full workflow URL from environment or fall back to constructed URL
+    workflow_url = os.getenv("PROBLEM_GENERATOR_API_URL", f"{BASE_URL}/workflows/run")
+    headers = {
+        "Authorization": f"Bearer {api_key()}",
+        "Content-Type": "application/json"
+    }
+
+    data = {
+        "inputs": inputs,
+        "response_mode": response_mode,
+        "user": user
+    }
+
+    try:
+        print(f"[GENERATION] Making workflow API request to: {workflow_url}")
+        print(f"[GENERATION] Request data: {json.dumps(data, indent=2)}")
+
+        response = http_client.post(workflow_url, headers=headers, json=data,
+                                     timeout=http_client.HTTP_LONG_READ_TIMEOUT)
+
+        print(f"[GENERATION] Workflow response status: {response.status_code}")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            print(f"[GENERATION] Workflow API error: {response.text}")
+            return {"error": response.text}
+    except Exception as e:
+        error_msg = f"Exception during workflow API call: {str(e)}"
+        print(f"[GENERATION] {error_msg}")
+        return {"error": error_msg}
+
+def upload_syllabus(file_path, user):
+    """
+    Uploads a syllabus unless the same content was uploaded recently.
+
+    Returns:
+        tuple: (file_id, cache_key, cached), with file_id None if the upload failed
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    key = upload_cache.cache_key(content, user, f"{BASE_URL}/files/upload")
+    file_id = upload_cache.get(key)
+    if file_id:
+        print(f"[GENERATION] Reusing uploaded syllabus, ID: {file_id}")
+        return file_id, key, True
+
+    file_id = upload_file(file_path, user)
+    if file_id:
+        upload_cache.put(key, file_id)
+    return file_id, key, False
+
+def is_stale_upload(error):
+    """ Returns whether a workflow error says an uploaded file ID isn't valid (any more). """
+    return bool(STALE_UPLOAD_PATTERN.search(str(error)))
+
+def workflow_inputs(course, lesson, language, file_id):
+    """ Builds the inputs of the problem generator workflow. """
+    return {
+        "Course": course,
+        "CurrentLesson": lesson,
+        "Language": language,
+        "syllabus": {
+            "transfer_method": "local_file",
+            "upload_file_id": file_id,
+            "type": "document"
+        }
+    }
+
+def parse_testcases(raw_testcases):
+    """
+    Parses the testcases the workflow returned.
+
+    Args:
+        raw_testcases (str): JSON testcases, possibly wrapped in a markdown code block
+
+    Returns:
+        list: The testcases; if the JSON is an object, its first list value
+
+    Raises:
+        json.JSONDecodeError: If the testcases aren't JSON
+    """
+    # Remove any markdown code block markers if present
+    testcases = json.loads(raw_testcases.replace("```json", "").replace("```", "").strip())
+    if isinstance(testcases, dict):
+        for value in testcases.values():
+            if isinstance(value, list):
+                return value
+    return testcases
+
+def write_minimal_syllabus(lesson):
+    """ Writes a syllabus naming only the lesson, for when GitHub can't provide one. """
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as f:
+        f.write(f"# Syllabus for {lesson}\n\n")
+        f.write(f"This is a minimal syllabus for the '{lesson}' lesson.\n\n")
+        f.write(f"Please complete the coding challenge for {lesson}.\n")
+        return f.name
+
+def build_syllabus(lesson, language="learnpython.org", lang="en"):
+    """ Builds a syllabus from GitHub markdown files up to and including the current lesson. """
+    print(f"[GENERATION] Fetching syllabus from GitHub for lesson: {lesson} ({language}, {lang})")
+    try:
+        syllabus_path = get_fetcher().build_syllabus(lesson, language, lang)
+    except Exception as e:
+        print(f"[GENERATION] Error in GitHub syllabus building: {str(e)}")
+        syllabus_path = None
+
+    if not syllabus_path:
+        # If GitHub fetch fails, create a minimal syllabus with just the lesson name
+        print("[GENERATION] GitHub fetcher failed to build syllabus, falling back to local generation")
+        syllabus_path = write_minimal_syllabus(lesson)
+    return syllabus_path
+
+def open_workflow_stream(inputs, user):
+    """
+    Starts a streaming workflow run.
+
+    Returns:
+        tuple: (response, error): the open streaming response, or None and the
+        upstream's error text if the run was refused
+    """
+    workflow_url = os.getenv("PROBLEM_GENERATOR_API_URL", f"{BASE_URL}/workflows/run")
+    headers = {
+        "Authorization": f"Bearer {api_key()}",
+        "Content-Type": "application/json"
+    }
+    data = {"inputs": inputs, "response_mode": "streaming", "user": user}
+
+    try:
+        print(f"[GENERATION] Making streaming workflow API request to: {workflow_url}")
+        response = http_client.post(workflow_url, headers=headers, json=data, stream=True,
+                                    timeout=http_client.HTTP_LONG_READ_TIMEOUT)
+    except Exception as e:
+        error_msg = f"Exception during workflow API call: {str(e)}"
+        print(f"[GENERATION] {error_msg}")
+        return None, error_msg
+
+    print(f"[GENERATION] Workflow response status: {response.status_code}")
+    if response.status_code != 200:
+        error = response.text
+        response.close()
+        print(f"[GENERATION] Workflow API error: {error}")
+        return None, error
+    return response, None
+
+def workflow_events(response):
+    """ Yields the events of a streaming workflow response, skipping keep-alive pings. """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        try:
+            event = json.loads(line[len("data:"):])
+        except json.JSONDecodeError:
+            print(f"[GENERATION] Skipping malformed workflow event: {line[:200]}")
+            continue
+        if event.get("event") != "ping":
+            yield event
+
+def _run_with_syllabus(course, lesson, language, user, start):
+    """
+    Builds and uploads the syllabus, then starts the workflow on it.
+
+    Args:
+        start (callable): Called with the workflow inputs, returns (outcome, error)
+            with error None on success
+
+    Returns:
+        The outcome of the successful start
+
+    Raises:
+        GenerationError: If the syllabus can't be built or uploaded, or start fails
+    """
+    print(f"[GENERATION] Course: {course}, Lesson: {lesson}, Programming Language: {language}")
+    try:
+        file_path = build_syllabus(lesson, language=course)
+    except Exception as e:
+        raise GenerationError(f"Failed to build syllabus: {str(e)}")
+
+    try:
+        file_id, key, cached = upload_syllabus(file_path, user)
+        if not file_id:
+            raise GenerationError("File upload failed")
+
+        outcome, error = start(workflow_inputs(course, lesson, language, file_id))
+        if error and cached and is_stale_upload(error):
+            # The upstream dropped the file before our cache entry expired; upload it once more
+            print("[GENERATION] Cached syllabus upload was rejected, uploading it again")
+            upload_cache.invalidate(key)
+            file_id = upload_file(file_path, user)
+            if not file_id:
+                raise GenerationError("File upload failed")
+            upload_cache.put(key, file_id)
+            outcome, error = start(workflow_inputs(course, lesson, language, file_id))
+        if error:
+            raise GenerationError(f"Workflow API error: {error}")
+        return outcome
+    finally:
+        # Clean up the syllabus file
+        try:
+            os.unlink(file_path)
+        except OSError as e:
+            print(f"[GENERATION] Failed to delete syllabus file: {str(e)}")
+
+def generate_problem(course, lesson, language=None, user=DEFAULT_USER):
+    """
+    Generates a programming problem for a lesson.
+
+    Args:
+        course (str): Course the lesson belongs to, e.g. learnpython.org
+        lesson (str): Lesson the problem practises
+        language (str, optional): Programming language; picked from the course if not given
+        user (str): User the workflow API attributes the request to
+
+    Returns:
+        GenerationResult: The workflow's response
+
+    Raises:
+        GenerationError: If the syllabus can't be built or uploaded, or the workflow fails
+    """
+    api_key()
+    language = language or default_language(course)
+
+    def start(inputs):
+        response = run_workflow(inputs, "blocking", user)
+        return response, response.get("error")
+
+    return GenerationResult(_run_with_syllabus(course, lesson, language, user, start))
+
+def generate_problem_events(course, lesson, language=None, user=DEFAULT_USER):
+    """
+    Generates a programming problem for a lesson, yielding progress as the workflow runs.
+
+    Events are dicts with an "event" key:
+        started: the workflow run began (workflow_run_id)
+        progress: a workflow step started or finished (node, status)
+        title: the problem's title is known (title)
+        problem_chunk: the next piece of the problem text (text)
+        finished: the last event, holding the GenerationResult (result)
+
+    Args:
+        See generate_problem()
+
+    Raises:
+        GenerationError: If the syllabus can't be built or uploaded, or the workflow
+            fails or its stream ends before it finishes
+    """
+    api_key()
+    language = language or default_language(course)
+    response = _run_with_syllabus(course, lesson, language, user, lambda inputs: open_workflow_stream(inputs, user))
+
+    title_sent = False
+    try:
+        for event in workflow_events(response):
+            kind = event.get("event")
+            data = event.get("data") or {}
+            if kind == "workflow_started":
+                yield {"event": "started", "workflow_run_id": event.get("workflow_run_id")}
+            elif kind in ("node_started", "node_finished"):
+                yield {"event": "progress", "node": data.get("title"),
+                       "status": "started" if kind == "node_started" else data.get("status")}
+                outputs = data.get("outputs") or {}
+                if kind == "node_finished" and outputs.get("Title") and not title_sent:
+                    title_sent = True
+                    yield {"event": "title", "title": outputs["Title"]}
+            elif kind == "text_chunk":
+                yield {"event": "problem_chunk", "text": data.get("text", "")}
+            elif kind == "workflow_finished":
+                if data.get("status") != "succeeded":
+                    raise GenerationError(f"Workflow API error: {data.get('error') or data.get('status')}")
+                # Shaped like a blocking response, so both modes give the same result
+                result = GenerationResult({
+                    "workflow_run_id": event.get("workflow_run_id"),
+                    "task_id": event.get("task_id"),
+                    "data": data,
+                })
+                if not title_sent:
+                    yield {"event": "title", "title": result.title}
+                yield {"event": "finished", "result": result}
+                return
+            elif kind == "error":
+                raise GenerationError(f"Workflow API error: {event.get('message')}")
+    finally:
+        response.close()
+    raise GenerationError("Workflow stream ended before the workflow finished")
@@ -1,4 +1,5 @@
 import requests
+import http_client
 import json
 import os
 import time
@@ -164,7 +165,7 @@ class GitHubFetcher:
                 'User-Agent': 'Problem-Generator-App/1.0',
             }
             
-            response = requests.get(url, headers=headers)
+            response = http_client.get(url, headers=headers)
             
             # Check for rate limit error
             if response.status_code == 403:
@@ -225,7 +226,7 @@ class GitHubFetcher:
         print(f"GitHub API URL: {url}")
         
         try:
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10)
             
             if response.status_code != 200:
                 print(f"GitHub API error: Status {response.status_code}, Response: {response.text}")
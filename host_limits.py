@@ -0,0 +1,71 @@
+"""
+Host-wide limit on concurrently running user programs.
+
+Gunicorn workers are separate processes, so an in-process semaphore can't bound
+the total number of children on the box. Instead the budget is a directory of
+slot files: holding an exclusive flock on one of them is holding one slot. The
+kernel drops the lock if the holder dies, so a crashed worker never leaks slots.
+"""
+
+import os
+import time
+import fcntl
+import random
+import tempfile
+from contextlib import contextmanager
+
+# Total number of user programs (and compilers) allowed to run at once on this host
+MAX_PROCESSES = int(os.getenv('EXECUTION_MAX_PROCESSES', str(os.cpu_count() or 4)))
+SLOT_DIR = os.getenv('EXECUTION_SLOT_DIR', os.path.join(tempfile.gettempdir(), 'problem_generator_slots'))
+
+# How long a caller waits for a free slot before giving up
+ACQUIRE_TIMEOUT = 30
+
+class HostBusyError(Exception):
+    """Raised when no execution slot frees up in time."""
+
+def _try_slot(index):
+    """Try to take one slot without blocking. Returns the open lock file or None."""
+    path = os.path.join(SLOT_DIR, f"slot-{index}.lock")
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except BlockingIOError:
+        lock_file.close()
+        return None
+
+@contextmanager
+def process_slot(timeout=ACQUIRE_TIMEOUT):
+    """
+    Hold one host-wide execution slot while running a child process.
+
+    Args:
+        timeout (float): Seconds to wait for a slot
+
+    Raises:
+        HostBusyError: If every slot stays taken for the whole timeout
+    """
+    os.makedirs(SLOT_DIR, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+    lock_file = None
+
+    while lock_file is None:
+        # Start at a random slot so waiters don't all contend for slot 0
+        start = random.randrange(MAX_PROCESSES)
+        for offset in range(MAX_PROCESSES):
+            lock_file = _try_slot((start + offset) % MAX_PROCESSES)
+            if lock_file is not None:
+                break
+        else:
+            if time.monotonic() >= deadline:
+                raise HostBusyError("Server is busy running other submissions, please try again")
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 0.1)
+
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
@@ -0,0 +1,188 @@
+"""
+Shared HTTP client for the upstream APIs (Dify and GitHub).
+
+Every outbound call goes through one requests.Session per process, whose
+connection pools keep connections to each host alive between calls. Calls get a
+connect and a read timeout so a hung upstream can't pin a worker until gunicorn
+kills it, idempotent calls are retried a few times with jittered backoff, and each
+host has a circuit breaker: after repeated failures calls to it fail at once for a
+while instead of each waiting out its timeouts.
+"""
+
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for a connection, and for the response once connected
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+
+# Read timeout for calls that wait on a model (workflow runs, chat messages);
+# kept under gunicorn's 120 second worker timeout
+HTTP_LONG_READ_TIMEOUT = float(os.getenv('HTTP_LONG_READ_TIMEOUT', '100'))
+
+# Extra attempts for idempotent calls, and the base of the exponential backoff between them
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HTTP_BACKOFF_SECONDS = 0.5
+
+# Connections kept alive per host
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_FAILURES = int(os.getenv('HTTP_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('HTTP_BREAKER_RESET_SECONDS', '30'))
+
+# Methods that are safe to send twice
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Responses worth retrying: the upstream is overloaded or briefly unreachable
+RETRY_STATUSES = (429, 502, 503, 504)
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host whose circuit is open."""
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of one host.
+
+    Closed, calls go through. After BREAKER_FAILURES failures in a row it opens and
+    calls are refused for BREAKER_RESET_SECONDS; then a single trial call is let
+    through, which closes it again on success or reopens it on failure.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return whether a call may go out now."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running or time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.trial_running or self.consecutive_failures >= self.failures:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def state(self):
+        """Return "closed", "open" or "half-open"."""
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.trial_running or time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+_session = None
+_session_pid = None
+_breakers = {}
+_lock = threading.Lock()
+
+def get_session():
+    """Return this process's session, creating it after a fork so workers never share sockets."""
+    global _session, _session_pid
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+def get_breaker(url):
+    """Return the circuit breaker of a URL's host."""
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff, so retrying workers don't hit the upstream in step."""
+    time.sleep(random.uniform(0, HTTP_BACKOFF_SECONDS * 2 ** attempt))
+
+def request(method, url, timeout=None, retry=None, **kwargs):
+    """
+    Send an HTTP request to an upstream API.
+
+    Args:
+        method (str): HTTP method
+        url (str): Full URL
+        timeout (float or tuple, optional): Read timeout, or (connect, read); defaults
+            to HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT
+        retry (bool, optional): Whether to retry connection errors, timeouts and
+            RETRY_STATUSES; defaults to True for idempotent methods only
+        **kwargs: Passed on to requests (headers, json, data, files, ...)
+
+    Returns:
+        requests.Response: The last response, whatever its status
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open
+        requests.RequestException: If the last attempt failed without a response
+    """
+    method = method.upper()
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    elif not isinstance(timeout, tuple):
+        timeout = (HTTP_CONNECT_TIMEOUT, timeout)
+    if retry is None:
+        retry = method in IDEMPOTENT_METHODS
+    attempts = 1 + (HTTP_RETRIES if retry else 0)
+    breaker = get_breaker(url)
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{urlsplit(url).netloc} is unavailable after repeated failures")
+        try:
+            response = get_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+            print(f"[HTTP] {method} {url} failed ({str(e)}), retrying")
+        except Exception:
+            # Not worth retrying, but it still settles a half-open trial; otherwise the
+            # breaker would wait for that trial forever
+            breaker.record_failure()
+            raise
+        else:
+            # 4xx answers come from a working upstream; only 5xx count against it
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            print(f"[HTTP] {method} {url} returned {response.status_code}, retrying")
+        _backoff(attempt)
+
+def get(url, **kwargs):
+    """Send a GET request; see request()."""
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    """Send a POST request; see request(). Not retried unless retry=True."""
+    return request("POST", url, **kwargs)
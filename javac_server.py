@@ -0,0 +1,236 @@
+"""
+Client for the resident Java compile server.
+
+`javac` is itself a JVM program, so every compile used to pay for JVM startup before
+compiling even a short class. Instead each worker keeps one long-lived JVM running
+jvm/CompileServer.java, which compiles sources in memory through the javax.tools API
+and answers over a Unix socket with either the class files or the compiler's
+diagnostics. compile_cache falls back to the `javac` command whenever the server
+is unavailable, for example when only a JRE is installed.
+"""
+
+import os
+import time
+import atexit
+import socket
+import struct
+import threading
+import subprocess
+import jvm_runner
+from jvm_runner import _pack, _read_exact, _read_blob
+
+# Server configuration
+JAVAC_SERVER_ENABLED = os.getenv('JAVAC_SERVER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+JAVAC_SERVER_MAX_COMPILES = int(os.getenv('JAVAC_SERVER_MAX_COMPILES', '1000'))
+JAVAC_SERVER_HEAP_MB = int(os.getenv('JAVAC_SERVER_HEAP_MB', '512'))
+
+REPLY_GRACE_SECONDS = 2
+
+# After the server fails to start, use the javac command for a while before trying again
+STARTUP_RETRY_SECONDS = 60
+
+# A compile waits this long for the server to finish another one before it uses the
+# javac command instead, whose JVM startup costs about as much
+LOCK_WAIT_SECONDS = 1
+
+def request_compile(socket_path, class_name, code, options, timeout):
+    """
+    Send one source file to a compile server and wait for the result.
+
+    Args:
+        socket_path (str): The server's Unix socket
+        class_name (str): Public class the source declares; names the source file
+        code (str): Java source to compile
+        options (list): javac options
+        timeout (float): Seconds to wait for the compiler
+
+    Returns:
+        dict: success, classes ({binary name: class bytes}), diagnostics (list of
+        dicts with kind, line, column and message; positions are None when unknown)
+        and recycle (server is exiting)
+    """
+    request = _pack(class_name.encode('utf-8')) + _pack(code.encode('utf-8'))
+    request += struct.pack(">i", len(options))
+    for option in options:
+        request += _pack(option.encode('utf-8'))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout + REPLY_GRACE_SECONDS)
+        sock.connect(socket_path)
+        sock.sendall(request)
+        with sock.makefile('rb') as reply:
+            success = _read_exact(reply, 1) != b"\0"
+
+            classes = {}
+            (class_count,) = struct.unpack(">i", _read_exact(reply, 4))
+            for _ in range(class_count):
+                binary_name = _read_blob(reply).decode('utf-8')
+                classes[binary_name] = _read_blob(reply)
+
+            diagnostics = []
+            (diagnostic_count,) = struct.unpack(">i", _read_exact(reply, 4))
+            for _ in range(diagnostic_count):
+                kind = _read_blob(reply).decode('utf-8')
+                line, column = struct.unpack(">ii", _read_exact(reply, 8))
+                message = _read_blob(reply).decode('utf-8', errors='replace')
+                diagnostics.append({
+                    "kind": kind,
+                    "line": line if line > 0 else None,
+                    "column": column if column > 0 else None,
+                    "message": message
+                })
+
+            recycle = _read_exact(reply, 1) != b"\0"
+
+    return {"success": success, "classes": classes, "diagnostics": diagnostics, "recycle": recycle}
+
+def format_diagnostics(file_name, code, diagnostics):
+    """
+    Render diagnostics the way the javac command prints them.
+
+    Args:
+        file_name (str): Source file name shown in each message, e.g. Main.java
+        code (str): The compiled source, used to quote the offending line
+        diagnostics (list): Diagnostics as returned by request_compile()
+
+    Returns:
+        str: javac-style report with a caret under each error position
+    """
+    lines = code.splitlines()
+    report = []
+    errors = warnings = 0
+    for diagnostic in diagnostics:
+        if diagnostic["kind"] == "ERROR":
+            label = "error"
+            errors += 1
+        elif diagnostic["kind"] in ("WARNING", "MANDATORY_WARNING"):
+            label = "warning"
+            warnings += 1
+        else:
+            label = "note"
+
+        message_lines = diagnostic["message"].splitlines() or [""]
+        line = diagnostic["line"]
+        if line is None:
+            report.append(f"{label}: {message_lines[0]}")
+            report.extend(message_lines[1:])
+            continue
+
+        report.append(f"{file_name}:{line}: {label}: {message_lines[0]}")
+        if line <= len(lines):
+            report.append(lines[line - 1])
+            if diagnostic["column"] is not None:
+                report.append(" " * (diagnostic["column"] - 1) + "^")
+        report.extend(message_lines[1:])
+
+    if errors:
+        report.append(f"{errors} error{'s' if errors != 1 else ''}")
+    if warnings:
+        report.append(f"{warnings} warning{'s' if warnings != 1 else ''}")
+    return "\n".join(report)
+
+class CompileServer:
+    """One compile server JVM, started lazily and replaced when it exits."""
+
+    def __init__(self):
+        self._daemon = None
+        self._lock = threading.Lock()
+        self._unavailable_until = 0
+
+    def compile(self, class_name, code, options, timeout):
+        """
+        Compile a source file in the resident compiler.
+
+        Returns:
+            dict: The reply from request_compile()
+
+        Raises:
+            subprocess.TimeoutExpired: If compilation ran past the timeout
+            RuntimeError: If the server is unavailable, or still busy with another
+                compile after LOCK_WAIT_SECONDS
+        """
+        # The server compiles one source at a time, so callers take turns, but a
+        # slow or stuck compile mustn't hold up everyone behind it
+        if not self._lock.acquire(timeout=LOCK_WAIT_SECONDS):
+            raise RuntimeError("Compile server is busy")
+        try:
+            if time.monotonic() < self._unavailable_until:
+                raise RuntimeError("Compile server is unavailable")
+
+            if self._daemon is not None and not self._daemon.alive():
+                self._daemon.close()
+                self._daemon = None
+            if self._daemon is None:
+                try:
+                    self._daemon = jvm_runner._JvmDaemon(
+                        "CompileServer", [str(JAVAC_SERVER_MAX_COMPILES)], heap_mb=JAVAC_SERVER_HEAP_MB
+                    )
+                except Exception:
+                    self._unavailable_until = time.monotonic() + STARTUP_RETRY_SECONDS
+                    raise
+
+            try:
+                reply = request_compile(self._daemon.socket_path, class_name, code, options, timeout)
+            except socket.timeout:
+                # The compiler can't be interrupted, so the whole server goes
+                self._daemon.close()
+                self._daemon = None
+                raise subprocess.TimeoutExpired(["javac"], timeout)
+            except Exception:
+                self._daemon.close()
+                self._daemon = None
+                raise
+
+            if reply["recycle"]:
+                # The server exits on its own after answering
+                self._daemon.retired = True
+            return reply
+        finally:
+            self._lock.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._daemon is not None:
+                self._daemon.close()
+                self._daemon = None
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_server():
+    """Return this process's compile server, creating it on first use."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = CompileServer()
+            atexit.register(_server.shutdown)
+        return _server
+
+def compile_java(class_name, code, options, timeout, output_dir):
+    """
+    Compile a Java submission in the resident compiler and write its class files.
+
+    Args:
+        class_name (str): Public class the source declares
+        code (str): Java source to compile
+        options (list): javac options
+        timeout (float): Seconds before compilation is abandoned
+        output_dir (str): Directory that receives the .class files
+
+    Returns:
+        tuple: (success, diagnostics). diagnostics is the structured compiler output.
+
+    Raises:
+        subprocess.TimeoutExpired: If compilation ran past the timeout
+        RuntimeError: If the server is disabled or unavailable; use the javac command instead
+    """
+    if not JAVAC_SERVER_ENABLED:
+        raise RuntimeError("Compile server is disabled")
+
+    reply = get_server().compile(class_name, code, options, timeout)
+    for binary_name, class_bytes in reply["classes"].items():
+        class_path = os.path.join(output_dir, *binary_name.split(".")) + ".class"
+        os.makedirs(os.path.dirname(class_path), exist_ok=True)
+        with open(class_path, 'wb') as f:
+            f.write(class_bytes)
+    return reply["success"], reply["diagnostics"]
@@ -0,0 +1,300 @@
+"""
+Asynchronous check and run jobs with per-language admission control.
+
+A synchronous /check_code or /run_code request holds a gunicorn worker until the
+submission has finished, so a handful of slow submissions can stall every other
+endpoint. A job request returns an ID straight away instead; the work happens on a
+per-language thread pool in the background, and its progress events and result are
+kept in the jobs tables so that any worker can answer GET /jobs/<id>.
+
+Each language runs at most a fixed number of jobs at once and lets a bounded number
+wait behind them. Past that the submission is refused with QueueFullError, which
+carries an estimate of when a slot will free up, rather than queueing without limit.
+"""
+
+import os
+import math
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import db
+
+# Jobs of one language that run at the same time in this worker
+JOB_CONCURRENCY = {
+    "python": int(os.getenv('JOBS_PYTHON_CONCURRENCY', '4')),
+    "java": int(os.getenv('JOBS_JAVA_CONCURRENCY', '2')),
+    "cpp": int(os.getenv('JOBS_CPP_CONCURRENCY', '2')),
+}
+
+# Jobs of one language allowed to wait for a free slot before submissions are refused
+JOB_QUEUE_DEPTH = int(os.getenv('JOBS_QUEUE_DEPTH', '16'))
+
+# Finished jobs are kept this long so clients can still collect their results
+JOB_RETENTION_SECONDS = int(os.getenv('JOBS_RETENTION_SECONDS', '3600'))
+
+# Longest a job may take from when it starts running (or was queued, until it starts).
+# Every testcase has its own timeout, so only a job lost with its worker takes longer
+JOB_TIMEOUT_SECONDS = int(os.getenv('JOBS_TIMEOUT_SECONDS', '300'))
+
+# Extra time a job gets past its timeout before a client following it gives up on it
+JOB_STALE_MARGIN_SECONDS = 30
+
+# Assumed job duration until a language has finished its first job
+DEFAULT_JOB_SECONDS = 2.0
+
+# Weight of the latest job in the running average of job durations
+DURATION_SMOOTHING = 0.2
+
+FINISHED_STATUSES = ("done", "failed")
+
+class QueueFullError(Exception):
+    """Raised when a language already has as many jobs waiting as it may queue."""
+
+    def __init__(self, language, retry_after):
+        super().__init__(f"Too many {language} jobs are queued, retry in {retry_after} seconds")
+        self.language = language
+        self.retry_after = retry_after
+
+class JobFailedError(Exception):
+    """Raised by a job's work to fail the job while still recording a result."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+class JobQueue:
+    """Per-language thread pools that run jobs in the background of this worker."""
+
+    def __init__(self, concurrency=None, queue_depth=JOB_QUEUE_DEPTH):
+        self.concurrency = dict(concurrency or JOB_CONCURRENCY)
+        self.queue_depth = queue_depth
+        self._executors = {}
+        self._in_flight = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, language):
+        return max(1, self.concurrency.get(language, 1))
+
+    def retry_after(self, language):
+        """Estimate in whole seconds how long until a queued job of a language could start."""
+        with self._lock:
+            return self._retry_after(language)
+
+    def _retry_after(self, language):
+        limit = self._limit(language)
+        waiting = max(0, self._in_flight.get(language, 0) - limit + 1)
+        duration = self._durations.get(language, DEFAULT_JOB_SECONDS)
+        return max(1, math.ceil(duration * waiting / limit))
+
+    def depth(self, language):
+        """Return the number of jobs of a language that are queued or running."""
+        with self._lock:
+            return self._in_flight.get(language, 0)
+
+    def submit(self, kind, language, work):
+        """
+        Queue a job.
+
+        Args:
+            kind (str): What the job does ('check' or 'run')
+            language (str): Programming language, which picks the pool the job runs in
+            work (callable): Called as work(emit) in the background; emit(event) records
+                a progress event and the return value becomes the job's result
+
+        Returns:
+            str: ID of the new job
+
+        Raises:
+            QueueFullError: If the language's queue is full
+        """
+        limit = self._limit(language)
+        with self._lock:
+            in_flight = self._in_flight.get(language, 0)
+            if in_flight >= limit + self.queue_depth:
+                raise QueueFullError(language, self._retry_after(language))
+            self._in_flight[language] = in_flight + 1
+            executor = self._executors.get(language)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"job-{language}")
+                self._executors[language] = executor
+
+        job_id = uuid.uuid4().hex
+        try:
+            db.create_job(job_id, kind, language)
+            executor.submit(self._run, job_id, language, work)
+        except Exception:
+            self._release(language, None)
+            raise
+        return job_id
+
+    def _run(self, job_id, language, work):
+        started = time.monotonic()
+        try:
+            if not db.start_job(job_id):
+                # Given up on as stale while it waited; nobody is waiting for it any more
+                print(f"[JOBS] Job {job_id} is no longer queued, not running it")
+                return
+            result = work(lambda event: db.append_job_event(job_id, event))
+            db.finish_job(job_id, "done", result=result)
+        except Exception as e:
+            print(f"[JOBS] Job {job_id} failed: {str(e)}")
+            try:
+                db.append_job_event(job_id, {"event": "error", "error": str(e)})
+                db.finish_job(job_id, "failed", result=getattr(e, "result", None), error=str(e))
+            except Exception as db_error:
+                print(f"[JOBS] Could not record the failure of job {job_id}: {str(db_error)}")
+        finally:
+            self._release(language, time.monotonic() - started)
+
+    def _release(self, language, duration):
+        with self._lock:
+            self._in_flight[language] -= 1
+            if duration is not None:
+                previous = self._durations.get(language, duration)
+                self._durations[language] = previous + DURATION_SMOOTHING * (duration - previous)
+
+    def shutdown(self):
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    """Return this process's job queue, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+def submit_check(code, inputs, expected_outputs, language, mode="full", compare="lines", on_summary=None):
+    """
+    Queue a check of a prepared submission (see check.prepare_check()).
+
+    The job's events are those of check.check_events() and its result is the body
+    /check_code would have returned. A check the server couldn't prepare, which
+    /check_code answers with 503, finishes as a failed job that still carries that body.
+
+    Args:
+        code (str): The user's code to check
+        inputs (list): stdin of each testcase
+        expected_outputs (list): Expected output of each testcase
+        language (str): Programming language (python, java, cpp)
+        mode (str): How the testcases are run, see check.check_events()
+        compare (str): How outputs are compared, see check.check_events()
+        on_summary (callable, optional): Called with the summary event once it is
+            known, unless the server couldn't prepare the submission
+
+    Returns:
+        str: ID of the new job
+
+    Raises:
+        QueueFullError: If the language's queue is full
+    """
+    from check import check_events, collect_results
+
+    def work(emit):
+        failure = []
+
+        def events():
+            for event in check_events(code, inputs, expected_outputs, language, mode, compare):
+                emit(event)
+                # A submission the server couldn't prepare wasn't really checked
+                if event["event"] == "compile" and event["status"] == "failed":
+                    failure.append(event["error"])
+                if event["event"] == "summary" and on_summary is not None and not failure:
+                    on_summary(event)
+                yield event
+
+        result = collect_results(events())
+        if failure:
+            raise JobFailedError(failure[0], result=result)
+        return result
+
+    _expire_finished_jobs()
+    return get_queue().submit("check", language, work)
+
+def submit_run(code, stdin, language):
+    """
+    Queue a run of user code.
+
+    The job emits a single "result" event and its result is the body /run_code
+    would have returned. Runs that /run_code would answer with an error status,
+    such as a timeout, finish as failed jobs that still carry that body.
+
+    Returns:
+        str: ID of the new job
+
+    Raises:
+        QueueFullError: If the language's queue is full
+    """
+    from run import execute_run
+
+    def work(emit):
+        payload, status_code = execute_run(code, stdin, language)
+        emit({"event": "result", **payload})
+        if status_code != 200:
+            raise JobFailedError(payload.get("error", "Run failed"), result=payload)
+        return payload
+
+    _expire_finished_jobs()
+    return get_queue().submit("run", language, work)
+
+def _expire_finished_jobs():
+    """Drop jobs whose results have been kept long enough."""
+    try:
+        db.delete_finished_jobs(time.time() - JOB_RETENTION_SECONDS)
+    except Exception as e:
+        print(f"[JOBS] Could not delete expired jobs: {str(e)}")
+
+def job_events(job_id, poll_interval=0.1, timeout=None):
+    """
+    Follow a job's progress events until it finishes.
+
+    Events are read back from the database, so this works whichever worker runs
+    the job. One connection is kept open for the whole stream.
+
+    A job still unfinished JOB_STALE_MARGIN_SECONDS past its timeout is taken to
+    have been lost with the worker that ran it: it is marked failed with an
+    "error" event, which ends the stream like any other failure.
+
+    Args:
+        job_id (str): ID of the job
+        poll_interval (float): Seconds between checks for new events
+        timeout (float, optional): Seconds the job may take, JOB_TIMEOUT_SECONDS by default
+
+    Yields:
+        dict: Every event of the job in order, followed by a final
+        {"event": "job", "status": ...} once it has finished
+    """
+    timeout = JOB_TIMEOUT_SECONDS if timeout is None else timeout
+    conn = db.get_db_connection()
+    try:
+        last_id = 0
+        while True:
+            # Read the status first: once it is final, every event is already stored
+            job = db.get_job(job_id, conn=conn)
+            if job is None:
+                return
+            for last_id, event in db.get_job_events(job_id, last_id, conn=conn):
+                yield event
+            if job["status"] in FINISHED_STATUSES:
+                yield {"event": "job", "job_id": job_id, "status": job["status"], "error": job["error"]}
+                return
+            
+            since = job["started_at"] or job["created_at"]
+            if time.time() > since + timeout + JOB_STALE_MARGIN_SECONDS:
+                error = f"Job did not finish within {timeout} seconds"
+                if db.fail_stale_job(job_id, error, conn=conn):
+                    print(f"[JOBS] Job {job_id} is stale, marked it failed")
+                # The failure, or the result that beat it, is read back on the next pass
+                continue
+            time.sleep(poll_interval)
+    finally:
+        conn.close()
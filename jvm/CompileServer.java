@@ -0,0 +1,191 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.net.StandardProtocolFamily;
+import java.net.URI;
+import java.net.UnixDomainSocketAddress;
+import java.nio.channels.Channels;
+import java.nio.channels.ServerSocketChannel;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileManager;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+/**
+ * Long-lived JVM that compiles Java submissions in memory for the Flask app.
+ *
+ * Usage: java CompileServer SOCKET_PATH MAX_COMPILES
+ *
+ * Requests arrive one at a time over a Unix domain socket. Sources are compiled
+ * through the javax.tools API without touching the disk, so a compile costs no JVM
+ * startup. All integers are big-endian and every byte blob is length-prefixed.
+ *
+ * Request:  className (blob), source (blob), optionCount (int), options (blob each)
+ * Response: success (byte),
+ *           classCount (int), then binaryName (blob) and classBytes (blob) per class,
+ *           diagnosticCount (int), then kind (blob), line (int), column (int) and
+ *           message (blob) per diagnostic, with -1 for an unknown position,
+ *           recycle (byte)
+ *
+ * The server exits after MAX_COMPILES compiles so compiler caches can't grow
+ * without bound; the client starts a replacement whenever the recycle flag is set.
+ */
+public final class CompileServer {
+    private record Message(String kind, int line, int column, String text) {
+    }
+
+    private record Result(boolean success, Map<String, byte[]> classes, List<Message> diagnostics) {
+    }
+
+    private CompileServer() {
+    }
+
+    public static void main(String[] args) throws IOException {
+        Path socketPath = Paths.get(args[0]);
+        int maxCompiles = Integer.parseInt(args[1]);
+
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            // A JRE has no javac; exiting before binding tells the client to use the command
+            System.err.println("CompileServer: no system Java compiler available");
+            System.exit(1);
+        }
+        StandardJavaFileManager standardManager = compiler.getStandardFileManager(null, Locale.ROOT, StandardCharsets.UTF_8);
+
+        Files.deleteIfExists(socketPath);
+        try (ServerSocketChannel server = ServerSocketChannel.open(StandardProtocolFamily.UNIX)) {
+            server.bind(UnixDomainSocketAddress.of(socketPath));
+
+            boolean recycle = false;
+            for (int compiles = 1; !recycle; compiles++) {
+                try (SocketChannel client = server.accept()) {
+                    DataInputStream request = new DataInputStream(new BufferedInputStream(Channels.newInputStream(client)));
+                    DataOutputStream response = new DataOutputStream(new BufferedOutputStream(Channels.newOutputStream(client)));
+
+                    String className = new String(readBlob(request), StandardCharsets.UTF_8);
+                    String source = new String(readBlob(request), StandardCharsets.UTF_8);
+                    int optionCount = request.readInt();
+                    List<String> options = new ArrayList<>();
+                    for (int i = 0; i < optionCount; i++) {
+                        options.add(new String(readBlob(request), StandardCharsets.UTF_8));
+                    }
+
+                    Result result = compile(compiler, standardManager, className, source, options);
+
+                    recycle = compiles >= maxCompiles;
+                    response.writeBoolean(result.success());
+                    response.writeInt(result.classes().size());
+                    for (Map.Entry<String, byte[]> entry : result.classes().entrySet()) {
+                        writeBlob(response, entry.getKey().getBytes(StandardCharsets.UTF_8));
+                        writeBlob(response, entry.getValue());
+                    }
+                    response.writeInt(result.diagnostics().size());
+                    for (Message message : result.diagnostics()) {
+                        writeBlob(response, message.kind().getBytes(StandardCharsets.UTF_8));
+                        response.writeInt(message.line());
+                        response.writeInt(message.column());
+                        writeBlob(response, message.text().getBytes(StandardCharsets.UTF_8));
+                    }
+                    response.writeBoolean(recycle);
+                    response.flush();
+                } catch (IOException e) {
+                    // A broken connection only affects that one compile
+                    System.err.println("CompileServer: " + e);
+                }
+            }
+        } finally {
+            Files.deleteIfExists(socketPath);
+        }
+    }
+
+    private static Result compile(JavaCompiler compiler, StandardJavaFileManager standardManager,
+                                  String className, String source, List<String> options) {
+        Map<String, ByteArrayOutputStream> outputs = new LinkedHashMap<>();
+        JavaFileManager memoryManager = new ForwardingJavaFileManager<StandardJavaFileManager>(standardManager) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(Location location, String binaryName,
+                                                       JavaFileObject.Kind kind, FileObject sibling) {
+                ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+                outputs.put(binaryName, buffer);
+                URI uri = URI.create("mem:///" + binaryName.replace('.', '/') + kind.extension);
+                return new SimpleJavaFileObject(uri, kind) {
+                    @Override
+                    public OutputStream openOutputStream() {
+                        return buffer;
+                    }
+                };
+            }
+        };
+
+        // The file name must match the public class, just like on disk
+        JavaFileObject sourceFile = new SimpleJavaFileObject(
+                URI.create("string:///" + className + JavaFileObject.Kind.SOURCE.extension), JavaFileObject.Kind.SOURCE) {
+            @Override
+            public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+                return source;
+            }
+        };
+
+        DiagnosticCollector<JavaFileObject> collector = new DiagnosticCollector<>();
+        boolean success;
+        try {
+            success = compiler.getTask(null, memoryManager, collector, options, null, List.of(sourceFile)).call();
+        } catch (RuntimeException e) {
+            // Invalid options and compiler crashes are reported like any other error
+            List<Message> crash = List.of(new Message(Diagnostic.Kind.ERROR.name(), -1, -1, String.valueOf(e)));
+            return new Result(false, Map.of(), crash);
+        }
+
+        List<Message> diagnostics = new ArrayList<>();
+        for (Diagnostic<? extends JavaFileObject> diagnostic : collector.getDiagnostics()) {
+            diagnostics.add(new Message(
+                    diagnostic.getKind().name(),
+                    (int) diagnostic.getLineNumber(),
+                    (int) diagnostic.getColumnNumber(),
+                    diagnostic.getMessage(Locale.ROOT)));
+        }
+
+        Map<String, byte[]> classes = new LinkedHashMap<>();
+        if (success) {
+            for (Map.Entry<String, ByteArrayOutputStream> entry : outputs.entrySet()) {
+                classes.put(entry.getKey(), entry.getValue().toByteArray());
+            }
+        }
+        return new Result(success, classes, diagnostics);
+    }
+
+    private static byte[] readBlob(DataInputStream in) throws IOException {
+        int length = in.readInt();
+        if (length < 0) {
+            throw new IOException("Negative blob length " + length);
+        }
+        byte[] data = new byte[length];
+        in.readFully(data);
+        return data;
+    }
+
+    private static void writeBlob(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+}
@@ -0,0 +1,321 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.PrintStream;
+import java.lang.management.ManagementFactory;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.StandardProtocolFamily;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.net.UnixDomainSocketAddress;
+import java.nio.channels.Channels;
+import java.nio.channels.ServerSocketChannel;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Long-lived JVM that runs compiled Java submissions for the Flask app.
+ *
+ * Usage: java JvmRunner SOCKET_PATH MAX_JOBS MAX_HEAP_FRACTION
+ *
+ * Jobs arrive one at a time over a Unix domain socket. Each job loads the submission
+ * from its class directory in a throwaway class loader, so static state never leaks
+ * between jobs, and runs main() with System.in/out/err redirected to in-memory
+ * streams. All integers are big-endian and every byte blob is length-prefixed.
+ *
+ * Request:  classDir (blob), className (blob), stdin (blob), timeoutMs (int),
+ *           outputLimit (int)
+ * Response: status (int), exitCode (int), cpuNanos (long), stdout (blob), stderr (blob),
+ *           recycle (byte)
+ *
+ * cpuNanos is the CPU time of the submission's main thread, or -1 if it is unknown.
+ * Each of stdout and stderr keeps at most outputLimit bytes; a write past that stops
+ * the job with status STATUS_OUTPUT_LIMIT.
+ *
+ * A timed-out or stopped submission can't be cleaned up safely, so the runner answers
+ * and then exits. So does one that leaves daemon threads running after main() returns,
+ * since they would keep running (and writing) into the following jobs. The runner also
+ * exits after MAX_JOBS jobs or when heap use passes MAX_HEAP_FRACTION.
+ * The client starts a replacement whenever the recycle flag is set.
+ */
+public final class JvmRunner {
+    private static final int STATUS_FINISHED = 0;
+    private static final int STATUS_TIMED_OUT = 1;
+    private static final int STATUS_OUTPUT_LIMIT = 2;
+
+    /** How often a running job is checked for having hit the output limit. */
+    private static final long OUTPUT_POLL_MILLIS = 10;
+
+    private record Result(int status, int exitCode, long cpuNanos, byte[] stdout, byte[] stderr,
+                          boolean threadsLeft) {
+    }
+
+    /** Thrown into the writing thread once its stream is full; carries no stack trace. */
+    private static final class OutputLimitExceeded extends Error {
+        OutputLimitExceeded() {
+            super("Output limit exceeded", null, false, false);
+        }
+    }
+
+    /** In-memory stream that keeps at most limit bytes and refuses anything past that. */
+    private static final class CappedOutputStream extends ByteArrayOutputStream {
+        private final int limit;
+        private volatile boolean exceeded;
+
+        CappedOutputStream(int limit) {
+            this.limit = limit;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[] {(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            int room = limit - count;
+            if (len > room) {
+                super.write(b, off, Math.max(0, room));
+                exceeded = true;
+                throw new OutputLimitExceeded();
+            }
+            super.write(b, off, len);
+        }
+
+        boolean exceeded() {
+            return exceeded;
+        }
+    }
+
+    private static final ThreadMXBean THREADS = ManagementFactory.getThreadMXBean();
+
+    private JvmRunner() {
+    }
+
+    public static void main(String[] args) throws IOException {
+        Path socketPath = Paths.get(args[0]);
+        int maxJobs = Integer.parseInt(args[1]);
+        double maxHeapFraction = Double.parseDouble(args[2]);
+
+        InputStream realIn = System.in;
+        PrintStream realOut = System.out;
+        PrintStream realErr = System.err;
+
+        Files.deleteIfExists(socketPath);
+        try (ServerSocketChannel server = ServerSocketChannel.open(StandardProtocolFamily.UNIX)) {
+            server.bind(UnixDomainSocketAddress.of(socketPath));
+
+            boolean recycle = false;
+            for (int jobs = 1; !recycle; jobs++) {
+                try (SocketChannel client = server.accept()) {
+                    DataInputStream request = new DataInputStream(new BufferedInputStream(Channels.newInputStream(client)));
+                    DataOutputStream response = new DataOutputStream(new BufferedOutputStream(Channels.newOutputStream(client)));
+
+                    String classDir = new String(readBlob(request), StandardCharsets.UTF_8);
+                    String className = new String(readBlob(request), StandardCharsets.UTF_8);
+                    byte[] stdin = readBlob(request);
+                    int timeoutMs = request.readInt();
+                    int outputLimit = request.readInt();
+
+                    Result result;
+                    try {
+                        result = runJob(classDir, className, stdin, timeoutMs, outputLimit);
+                    } finally {
+                        System.setIn(realIn);
+                        System.setOut(realOut);
+                        System.setErr(realErr);
+                    }
+
+                    recycle = result.status() != STATUS_FINISHED || result.threadsLeft() || jobs >= maxJobs
+                            || underMemoryPressure(maxHeapFraction);
+                    response.writeInt(result.status());
+                    response.writeInt(result.exitCode());
+                    response.writeLong(result.cpuNanos());
+                    writeBlob(response, result.stdout());
+                    writeBlob(response, result.stderr());
+                    response.writeBoolean(recycle);
+                    response.flush();
+                } catch (IOException e) {
+                    // A broken connection only affects that one job
+                    realErr.println("JvmRunner: " + e);
+                }
+            }
+        } finally {
+            Files.deleteIfExists(socketPath);
+        }
+
+        // Threads left behind by a timed-out submission must not keep the JVM alive
+        Runtime.getRuntime().halt(0);
+    }
+
+    private static Result runJob(String classDir, String className, byte[] stdin, int timeoutMs, int outputLimit)
+            throws IOException {
+        CappedOutputStream stdoutBuffer = new CappedOutputStream(outputLimit);
+        CappedOutputStream stderrBuffer = new CappedOutputStream(outputLimit);
+        PrintStream jobOut = new PrintStream(stdoutBuffer, true, StandardCharsets.UTF_8);
+        PrintStream jobErr = new PrintStream(stderrBuffer, true, StandardCharsets.UTF_8);
+
+        System.setIn(new ByteArrayInputStream(stdin));
+        System.setOut(jobOut);
+        System.setErr(jobErr);
+
+        URL[] classPath = {Paths.get(classDir).toUri().toURL()};
+        try (URLClassLoader loader = new URLClassLoader(classPath, ClassLoader.getPlatformClassLoader())) {
+            Method main;
+            try {
+                // Don't initialize here: static initializers belong inside the timed job thread
+                main = Class.forName(className, false, loader).getMethod("main", String[].class);
+            } catch (ClassNotFoundException | NoClassDefFoundError e) {
+                jobErr.println("Error: Could not find or load main class " + className);
+                return new Result(STATUS_FINISHED, 1, -1, stdoutBuffer.toByteArray(), stderrBuffer.toByteArray(), false);
+            } catch (NoSuchMethodException e) {
+                main = null;
+            }
+            if (main == null || !Modifier.isStatic(main.getModifiers())) {
+                jobErr.println("Error: Main method not found in class " + className + ", please define the main method as:");
+                jobErr.println("   public static void main(String[] args)");
+                return new Result(STATUS_FINISHED, 1, -1, stdoutBuffer.toByteArray(), stderrBuffer.toByteArray(), false);
+            }
+
+            int[] exitCode = {0};
+            long[] cpuNanos = {-1};
+            Method entryPoint = main;
+            ThreadGroup group = new ThreadGroup("submission");
+            Thread mainThread = new Thread(group, () -> {
+                try {
+                    entryPoint.setAccessible(true);
+                    entryPoint.invoke(null, (Object) new String[0]);
+                } catch (InvocationTargetException e) {
+                    if (!(e.getCause() instanceof OutputLimitExceeded)) {
+                        reportUncaught(e.getCause(), jobErr);
+                    }
+                    exitCode[0] = 1;
+                } catch (OutputLimitExceeded e) {
+                    exitCode[0] = 1;
+                } catch (Throwable e) {
+                    reportUncaught(e, jobErr);
+                    exitCode[0] = 1;
+                } finally {
+                    // The thread is new for every job, so its CPU time is the job's
+                    if (THREADS.isCurrentThreadCpuTimeSupported()) {
+                        cpuNanos[0] = THREADS.getCurrentThreadCpuTime();
+                    }
+                }
+            }, "main");
+            mainThread.setContextClassLoader(loader);
+
+            long deadline = System.nanoTime() + TimeUnit.MILLISECONDS.toNanos(timeoutMs);
+            mainThread.start();
+            int status;
+            try {
+                status = awaitThreads(group, deadline, stdoutBuffer, stderrBuffer);
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                status = STATUS_TIMED_OUT;
+            }
+
+            try {
+                jobOut.flush();
+                jobErr.flush();
+            } catch (OutputLimitExceeded e) {
+                status = STATUS_OUTPUT_LIMIT;
+            }
+            if (stdoutBuffer.exceeded() || stderrBuffer.exceeded()) {
+                status = STATUS_OUTPUT_LIMIT;
+            }
+            return new Result(status, exitCode[0], cpuNanos[0], stdoutBuffer.toByteArray(), stderrBuffer.toByteArray(),
+                    liveThread(group, true) != null);
+        }
+    }
+
+    /**
+     * Like the JVM itself, a submission is done when every non-daemon thread it
+     * started has finished, not just main(). A submission that fills either output
+     * stream is stopped waiting for at once, even if it catches the error. Daemon
+     * threads still running at the end are the caller's to deal with.
+     */
+    private static int awaitThreads(ThreadGroup group, long deadline, CappedOutputStream stdout,
+                                    CappedOutputStream stderr) throws InterruptedException {
+        while (true) {
+            if (stdout.exceeded() || stderr.exceeded()) {
+                return STATUS_OUTPUT_LIMIT;
+            }
+            Thread pending = liveThread(group, false);
+            if (pending == null) {
+                return STATUS_FINISHED;
+            }
+
+            long remaining = deadline - System.nanoTime();
+            if (remaining <= 0) {
+                return STATUS_TIMED_OUT;
+            }
+            pending.join(Math.max(1, Math.min(OUTPUT_POLL_MILLIS, TimeUnit.NANOSECONDS.toMillis(remaining))));
+        }
+    }
+
+    /** Return a live thread of the group, or null; daemon threads only count if includeDaemons is set. */
+    private static Thread liveThread(ThreadGroup group, boolean includeDaemons) {
+        Thread[] threads = new Thread[group.activeCount() + 8];
+        int count = group.enumerate(threads, true);
+        for (int i = 0; i < count; i++) {
+            if (threads[i].isAlive() && (includeDaemons || !threads[i].isDaemon())) {
+                return threads[i];
+            }
+        }
+        return null;
+    }
+
+    /** Print an uncaught exception the way the java launcher does, without the runner's own frames. */
+    private static void reportUncaught(Throwable error, PrintStream err) {
+        List<StackTraceElement> frames = new ArrayList<>();
+        for (StackTraceElement frame : error.getStackTrace()) {
+            String owner = frame.getClassName();
+            if (owner.startsWith("java.lang.reflect.") || owner.startsWith("jdk.internal.reflect.")
+                    || owner.startsWith(JvmRunner.class.getName())) {
+                break;
+            }
+            frames.add(frame);
+        }
+        if (!frames.isEmpty()) {
+            error.setStackTrace(frames.toArray(new StackTraceElement[0]));
+        }
+        err.print("Exception in thread \"main\" ");
+        error.printStackTrace(err);
+    }
+
+    /** Heap use is sampled without forcing a GC, so garbage counts towards the limit. */
+    private static boolean underMemoryPressure(double maxHeapFraction) {
+        Runtime runtime = Runtime.getRuntime();
+        long used = runtime.totalMemory() - runtime.freeMemory();
+        return used > runtime.maxMemory() * maxHeapFraction;
+    }
+
+    private static byte[] readBlob(DataInputStream in) throws IOException {
+        int length = in.readInt();
+        if (length < 0) {
+            throw new IOException("Negative blob length " + length);
+        }
+        byte[] data = new byte[length];
+        in.readFully(data);
+        return data;
+    }
+
+    private static void writeBlob(DataOutputStream out, byte[] data) throws IOException {
+        out.writeInt(data.length);
+        out.write(data);
+    }
+}
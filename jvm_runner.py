@@ -0,0 +1,306 @@
+"""
+Client for the persistent JVM that runs compiled Java submissions.
+
+Starting a fresh `java` process costs hundreds of milliseconds of JVM startup and
+JIT warm-up per run. Instead each worker keeps a small pool of long-lived JVMs
+(jvm/JvmRunner.java) and sends them jobs over a Unix socket. Every job is loaded in
+a throwaway class loader with its own System.in/out/err. The runner restarts itself
+after a timeout, after a job that leaves threads running, after a fixed number of
+jobs or under memory pressure.
+
+Submissions that would take the shared JVM down with them, such as ones calling
+System.exit(), and ones that use the file system, which would share the JVM's
+working directory, keep running in their own `java` process.
+"""
+
+import os
+import re
+import time
+import uuid
+import queue
+import atexit
+import shutil
+import socket
+import struct
+import hashlib
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+import process_runner
+
+# Runner configuration
+JVM_RUNNER_ENABLED = os.getenv('JVM_RUNNER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+JVM_RUNNER_POOL_SIZE = int(os.getenv('JVM_RUNNER_POOL_SIZE', '2'))
+JVM_RUNNER_MAX_JOBS = int(os.getenv('JVM_RUNNER_MAX_JOBS', '500'))
+JVM_RUNNER_HEAP_MB = int(os.getenv('JVM_RUNNER_HEAP_MB', '256'))
+JVM_RUNNER_MAX_HEAP_FRACTION = 0.75
+
+JVM_SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jvm')
+STARTUP_TIMEOUT = 10
+REPLY_GRACE_SECONDS = 2
+
+# After a runner fails to start, use plain `java` for a while before trying again
+STARTUP_RETRY_SECONDS = 60
+
+STATUS_TIMED_OUT = 1
+STATUS_OUTPUT_LIMIT = 2
+
+# Code that exits, halts or rewires the JVM, or touches files relative to its
+# working directory, can't share a process with other jobs
+UNSAFE_FOR_SHARED_JVM = re.compile(
+    r'System\s*\.\s*(exit|setIn|setOut|setErr|setSecurityManager)\s*\('
+    r'|Runtime\s*\.\s*getRuntime\s*\(\s*\)\s*\.\s*(exit|halt|addShutdownHook)\s*\('
+    r'|\b(File|FileReader|FileWriter|FileInputStream|FileOutputStream|RandomAccessFile|Files|Paths|Path)\b'
+)
+
+@lru_cache(maxsize=None)
+def _jvm_class_dir():
+    """Compile the helper programs in jvm/ once per source version and return their class directory."""
+    sources = sorted(
+        os.path.join(JVM_SOURCE_DIR, name) for name in os.listdir(JVM_SOURCE_DIR) if name.endswith(".java")
+    )
+    digest = hashlib.sha256()
+    for path in sources:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+
+    class_dir = os.path.join(tempfile.gettempdir(), f"problem_generator_jvm_{digest.hexdigest()[:16]}")
+    if os.path.isdir(class_dir):
+        return class_dir
+
+    build_dir = tempfile.mkdtemp(prefix="jvm_build_")
+    try:
+        result = subprocess.run(
+            ["javac", "-d", build_dir, *sources],
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if result.returncode != 0 or not os.path.exists(os.path.join(build_dir, "JvmRunner.class")):
+            raise RuntimeError(f"Failed to compile the JVM helpers: {result.stderr.strip()}")
+        try:
+            os.rename(build_dir, class_dir)
+        except OSError:
+            # Another worker published the classes first
+            pass
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return class_dir
+
+def _pack(data):
+    return struct.pack(">i", len(data)) + data
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if data is None or len(data) != size:
+        raise RuntimeError("JVM runner closed the connection")
+    return data
+
+def _read_blob(stream):
+    (size,) = struct.unpack(">i", _read_exact(stream, 4))
+    return _read_exact(stream, size)
+
+def request_job(socket_path, class_dir, class_name, stdin, timeout, output_limit=process_runner.OUTPUT_LIMIT_BYTES):
+    """
+    Send one job to a runner and wait for its result.
+
+    Args:
+        socket_path (str): The runner's Unix socket
+        class_dir (str): Directory holding the compiled classes
+        class_name (str): Class whose main() is run
+        stdin (str): Data fed to System.in
+        timeout (float): Seconds before the runner gives up on the job
+        output_limit (int, optional): Bytes kept of each of stdout and stderr before
+            the job is stopped
+
+    Returns:
+        dict: timed_out, output_limit_exceeded, returncode, cpu_ms (main thread, None
+        if unknown), stdout, stderr and recycle (runner is exiting)
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout + REPLY_GRACE_SECONDS)
+        sock.connect(socket_path)
+        sock.sendall(
+            _pack(class_dir.encode('utf-8'))
+            + _pack(class_name.encode('utf-8'))
+            + _pack(stdin.encode('utf-8'))
+            + struct.pack(">ii", int(timeout * 1000), output_limit)
+        )
+        with sock.makefile('rb') as reply:
+            status, exit_code, cpu_nanos = struct.unpack(">iiq", _read_exact(reply, 16))
+            stdout = _read_blob(reply)
+            stderr = _read_blob(reply)
+            recycle = _read_exact(reply, 1) != b"\0"
+
+    return {
+        "timed_out": status == STATUS_TIMED_OUT,
+        "output_limit_exceeded": status == STATUS_OUTPUT_LIMIT,
+        "returncode": exit_code,
+        "cpu_ms": round(cpu_nanos / 1e6, 3) if cpu_nanos >= 0 else None,
+        "stdout": stdout.decode('utf-8', errors='replace'),
+        "stderr": stderr.decode('utf-8', errors='replace'),
+        "recycle": recycle
+    }
+
+class _JvmDaemon:
+    """Handle to one helper JVM serving a Unix socket."""
+
+    def __init__(self, main_class="JvmRunner", args=None, heap_mb=None):
+        if args is None:
+            args = [str(JVM_RUNNER_MAX_JOBS), str(JVM_RUNNER_MAX_HEAP_FRACTION)]
+        self.socket_path = os.path.join(
+            tempfile.gettempdir(), f"pg-jvm-{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        )
+        self.process = subprocess.Popen(
+            [
+                "java", f"-Xmx{heap_mb or JVM_RUNNER_HEAP_MB}m", "-XX:+UseSerialGC",
+                "-cp", _jvm_class_dir(), main_class, self.socket_path, *args
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self.retired = False
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not os.path.exists(self.socket_path):
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError(f"{main_class} failed to start")
+            time.sleep(0.02)
+
+    def alive(self):
+        return not self.retired and self.process.poll() is None
+
+    def run(self, class_dir, class_name, stdin, timeout):
+        reply = request_job(self.socket_path, class_dir, class_name, stdin, timeout)
+        if reply["recycle"]:
+            # The runner exits on its own after answering
+            self.retired = True
+        return reply
+
+    def close(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+class JvmPool:
+    """Fixed-size pool of runner JVMs, started lazily and replaced when they exit."""
+
+    def __init__(self, size=JVM_RUNNER_POOL_SIZE):
+        self.size = size
+        self._slots = queue.Queue()
+        self._daemons = []
+        self._lock = threading.Lock()
+        self._unavailable_until = 0
+        for _ in range(size):
+            self._slots.put(None)
+
+    def _retire(self, daemon):
+        daemon.close()
+        with self._lock:
+            if daemon in self._daemons:
+                self._daemons.remove(daemon)
+
+    def run(self, class_dir, class_name, stdin, timeout):
+        """
+        Run a compiled class in a warm JVM.
+
+        Returns:
+            process_runner.RunResult with text stdout/stderr and resource usage
+
+        Raises:
+            subprocess.TimeoutExpired: If the job ran past the timeout
+        """
+        if time.monotonic() < self._unavailable_until:
+            raise RuntimeError("JVM runner is unavailable")
+
+        daemon = self._slots.get()
+        try:
+            if daemon is not None and not daemon.alive():
+                self._retire(daemon)
+                daemon = None
+            if daemon is None:
+                try:
+                    daemon = _JvmDaemon()
+                except Exception:
+                    self._unavailable_until = time.monotonic() + STARTUP_RETRY_SECONDS
+                    raise
+                with self._lock:
+                    self._daemons.append(daemon)
+            started = time.monotonic()
+            reply = daemon.run(class_dir, class_name, stdin, timeout)
+        except Exception:
+            if daemon is not None:
+                self._retire(daemon)
+            daemon = None
+            raise
+        finally:
+            self._slots.put(daemon)
+
+        command = ["java", "-cp", class_dir, class_name]
+        if reply["timed_out"]:
+            raise subprocess.TimeoutExpired(command, timeout, output=reply["stdout"], stderr=reply["stderr"])
+        # Peak RSS belongs to the shared JVM, not the job, so it isn't reported
+        return process_runner.RunResult(
+            command, reply["returncode"], reply["stdout"], reply["stderr"],
+            cpu_ms=reply["cpu_ms"], wall_ms=round((time.monotonic() - started) * 1000, 3),
+            output_limit_exceeded=reply["output_limit_exceeded"]
+        )
+
+    def shutdown(self):
+        with self._lock:
+            daemons = list(self._daemons)
+            self._daemons.clear()
+        for daemon in daemons:
+            daemon.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return this process's runner pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JvmPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+def run_java(code, run_command, stdin, timeout, cwd=None):
+    """
+    Run a compiled Java submission, in a warm JVM when it is safe to share one.
+
+    Args:
+        code (str): The submission's source, checked for calls that affect the whole JVM
+        run_command (list): `java -cp CLASS_DIR CLASS_NAME` command for the compiled classes
+        stdin (str): Data fed to System.in
+        timeout (float): Seconds before the program is killed
+        cwd (str, optional): Working directory when the program gets its own JVM
+
+    Returns:
+        process_runner.RunResult with text stdout/stderr and resource usage
+
+    Raises:
+        subprocess.TimeoutExpired: If the program ran past the timeout
+    """
+    if JVM_RUNNER_ENABLED and not UNSAFE_FOR_SHARED_JVM.search(code):
+        class_dir = run_command[run_command.index("-cp") + 1]
+        class_name = run_command[-1]
+        try:
+            return get_pool().run(class_dir, class_name, stdin, timeout)
+        except subprocess.TimeoutExpired:
+            raise
+        except Exception as e:
+            print(f"[JVM RUNNER] Falling back to a fresh JVM: {str(e)}")
+
+    # The JVM reserves far more address space than it uses, so cap the heap instead
+    command = run_command[:1] + [f"-Xmx{process_runner.MEMORY_LIMIT_MB}m"] + run_command[1:]
+    return process_runner.run_process(command, stdin, timeout, memory_limit_mb=None, cwd=cwd)
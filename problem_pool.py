@@ -0,0 +1,222 @@
+"""
+Pool of pre-generated problems per (course, lesson, language).
+
+Generating a problem is a blocking workflow run that takes many seconds, while
+students ask for problems of the same few lessons over and over. Problems are
+therefore generated ahead of time in the background and stored in the problems
+table with pool_status 'unserved'; /generate hands one out at once, marks it
+'served' and asks for a refill.
+
+How many problems a lesson keeps ready follows its recent demand: one for every
+PROBLEM_POOL_REQUESTS_PER_PROBLEM requests in the last
+PROBLEM_POOL_DEMAND_WINDOW_SECONDS, up to PROBLEM_POOL_MAX_TARGET. Lessons nobody
+asked for lately keep none, so the pool never spends workflow runs on them. A
+database lease makes sure only one worker refills a given pool at a time.
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import db
+import generation
+
+# Pool configuration
+PROBLEM_POOL_ENABLED = os.getenv('PROBLEM_POOL_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+PROBLEM_POOL_MAX_TARGET = int(os.getenv('PROBLEM_POOL_MAX_TARGET', '3'))
+PROBLEM_POOL_REQUESTS_PER_PROBLEM = int(os.getenv('PROBLEM_POOL_REQUESTS_PER_PROBLEM', '2'))
+PROBLEM_POOL_DEMAND_WINDOW_SECONDS = int(os.getenv('PROBLEM_POOL_DEMAND_WINDOW_SECONDS', '3600'))
+
+# Pools refilled at once by this worker
+PROBLEM_POOL_WORKERS = int(os.getenv('PROBLEM_POOL_WORKERS', '1'))
+
+# Seconds between scans that top up every pool below its target, e.g. after a restart
+PROBLEM_POOL_SCAN_SECONDS = int(os.getenv('PROBLEM_POOL_SCAN_SECONDS', '300'))
+
+# A refill lease lapses after this long, so a worker that died mid-refill doesn't block its pool
+LEASE_SECONDS = 600
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+_started = False
+
+def pool_key(course, lesson, language):
+    """Return the key naming a pool, e.g. for its refill lease."""
+    return json.dumps([course, lesson, language])
+
+def target_for(requests):
+    """
+    Return how many problems a pool should keep ready.
+
+    Args:
+        requests (int): Requests for the pool's lesson within the demand window
+
+    Returns:
+        int: Number of unserved problems to keep
+    """
+    return min(PROBLEM_POOL_MAX_TARGET, math.ceil(requests / max(1, PROBLEM_POOL_REQUESTS_PER_PROBLEM)))
+
+def _demand():
+    """Return the recent requests per (course, lesson, language)."""
+    since = time.time() - PROBLEM_POOL_DEMAND_WINDOW_SECONDS
+    return {(d["course"], d["lesson"], d["language"]): d["requests"] for d in db.get_generation_demand(since)}
+
+def _depths():
+    """Return the unserved problems per (course, lesson, language)."""
+    return {(d["course"], d["lesson"], d["language"]): d["unserved"] for d in db.get_pool_depths()}
+
+def record_demand(course, lesson, language):
+    """Count a request for a problem of a lesson towards its pool's target."""
+    if not PROBLEM_POOL_ENABLED:
+        return
+    try:
+        db.record_generation_request(course, lesson, language, time.time() - PROBLEM_POOL_DEMAND_WINDOW_SECONDS)
+    except Exception as e:
+        print(f"[PROBLEM POOL] Recording demand failed: {str(e)}")
+
+def take(course, lesson, language):
+    """
+    Hand out a pre-generated problem.
+
+    Args:
+        course (str): Course identifier
+        lesson (str): Lesson identifier
+        language (str): Programming language
+
+    Returns:
+        dict: A /generate response for the problem, marked "pooled": true, or None
+        if the pool is empty
+    """
+    if not PROBLEM_POOL_ENABLED:
+        return None
+    try:
+        problem_id = db.claim_pooled_problem(course, lesson, language)
+        problem = db.get_problem_by_id(problem_id) if problem_id else None
+    except Exception as e:
+        print(f"[PROBLEM POOL] Taking a problem failed: {str(e)}")
+        return None
+    if not problem:
+        return None
+    print(f"[PROBLEM POOL] Serving problem {problem_id} for {course} / {lesson}")
+    # Shaped like the workflow response, which the editor reads the problem from
+    return {
+        "data": {"outputs": {
+            "Title": problem["title"],
+            "Problem": problem["problem_text"],
+            "Testcases": json.dumps(problem["testcases"]),
+        }},
+        "testcases": problem["testcases"],
+        "problem_id": problem_id,
+        "pooled": True,
+    }
+
+def refill(course, lesson, language):
+    """
+    Generate problems for a pool until it reaches its target.
+
+    Does nothing if another worker is refilling the same pool.
+
+    Returns:
+        int: Number of problems added
+    """
+    key = pool_key(course, lesson, language)
+    if not db.acquire_pool_lease(key, time.time() + LEASE_SECONDS):
+        return 0
+    added = 0
+    try:
+        target = target_for(_demand().get((course, lesson, language), 0))
+        depth = _depths().get((course, lesson, language), 0)
+        while depth + added < target:
+            try:
+                result = generation.generate_problem(course, lesson, language)
+                testcases = generation.parse_testcases(result.raw_testcases)
+            except (generation.GenerationError, ValueError) as e:
+                # Try again on the next request or scan rather than hammering a failing upstream
+                print(f"[PROBLEM POOL] Generating for {course} / {lesson} failed: {str(e)}")
+                break
+            if not isinstance(testcases, list) or not testcases:
+                print(f"[PROBLEM POOL] Discarding a problem for {course} / {lesson} without testcases")
+                break
+            if db.store_problem(result.title, result.problem, course, lesson, testcases, language, pool_status="unserved") is None:
+                break
+            added += 1
+    finally:
+        db.release_pool_lease(key)
+    if added:
+        print(f"[PROBLEM POOL] Added {added} problem(s) for {course} / {lesson} ({language})")
+    return added
+
+def _run_refill(course, lesson, language):
+    try:
+        refill(course, lesson, language)
+    except Exception as e:
+        print(f"[PROBLEM POOL] Refill failed: {str(e)}")
+    finally:
+        with _lock:
+            _pending.discard((course, lesson, language))
+
+def request_refill(course, lesson, language):
+    """Refill a pool in the background, unless this worker is already refilling it."""
+    global _executor
+    if not PROBLEM_POOL_ENABLED:
+        return
+    with _lock:
+        if (course, lesson, language) in _pending:
+            return
+        _pending.add((course, lesson, language))
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, PROBLEM_POOL_WORKERS), thread_name_prefix="problem-pool")
+    _executor.submit(_run_refill, course, lesson, language)
+
+def scan():
+    """Request a refill of every pool below its target."""
+    depths = _depths()
+    for (course, lesson, language), requests in _demand().items():
+        if depths.get((course, lesson, language), 0) < target_for(requests):
+            request_refill(course, lesson, language)
+
+def _scanner():
+    while True:
+        time.sleep(PROBLEM_POOL_SCAN_SECONDS)
+        try:
+            scan()
+        except Exception as e:
+            print(f"[PROBLEM POOL] Scan failed: {str(e)}")
+
+def start():
+    """Top up pools below their target every PROBLEM_POOL_SCAN_SECONDS in the background."""
+    global _started
+    if not PROBLEM_POOL_ENABLED or PROBLEM_POOL_SCAN_SECONDS <= 0:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_scanner, name="problem-pool-scanner", daemon=True).start()
+
+def get_depths():
+    """
+    Report every pool with its depth and target.
+
+    Returns:
+        dict: enabled, and pools: a list of course, lesson, language, unserved,
+        target and recent requests, deepest demand first
+    """
+    demand = _demand()
+    depths = _depths()
+    pools = [
+        {
+            "course": course,
+            "lesson": lesson,
+            "language": language,
+            "unserved": depths.get((course, lesson, language), 0),
+            "target": target_for(demand.get((course, lesson, language), 0)),
+            "requests": demand.get((course, lesson, language), 0),
+        }
+        for course, lesson, language in set(demand) | set(depths)
+    ]
+    pools.sort(key=lambda pool: (-pool["requests"], pool["course"], pool["lesson"], pool["language"]))
+    return {"enabled": PROBLEM_POOL_ENABLED, "pools": pools}
@@ -0,0 +1,333 @@
+"""
+Runs user programs as child processes under per-run resource limits.
+
+Every child gets an RLIMIT_CPU backstop a little above its wall-clock timeout and,
+unless the runtime manages its own heap, an RLIMIT_AS memory cap. Its stdout and
+stderr are read as they are produced and the child is killed as soon as either one
+passes the output cap, so a runaway print loop can't grow the worker's memory. The
+child is reaped with wait4() so each run reports the CPU time, wall time and peak
+resident set size it used. The Python pool's zygotes use the same helpers for the children
+they fork.
+"""
+
+import os
+import re
+import math
+import time
+import shutil
+import signal
+import resource
+import selectors
+import subprocess
+
+# Address-space cap for a single run of a user program
+MEMORY_LIMIT_MB = int(os.getenv('EXECUTION_MEMORY_LIMIT_MB', '256'))
+
+# Output kept per stream for comparing against the expected output; more kills the run
+OUTPUT_LIMIT_BYTES = int(os.getenv('EXECUTION_OUTPUT_LIMIT_KB', '1024')) * 1024
+
+# Output shown back to the user per field
+DISPLAY_LIMIT_BYTES = int(os.getenv('EXECUTION_DISPLAY_LIMIT_KB', '64')) * 1024
+
+# RLIMIT_CPU is whole seconds; the wall-clock timeout normally fires first
+CPU_LIMIT_GRACE_SECONDS = 1
+
+# util-linux's prlimit sets limits on itself and then execs the program, so the program
+# starts under them without any Python running in the forked child
+PRLIMIT_PATH = shutil.which("prlimit")
+
+# How each runtime reports a failed allocation
+MEMORY_ERROR_PATTERN = re.compile(r'\bMemoryError\b|std::bad_alloc|java\.lang\.OutOfMemoryError')
+
+TIME_LIMIT_EXCEEDED = "Time Limit Exceeded"
+MEMORY_LIMIT_EXCEEDED = "Memory Limit Exceeded"
+OUTPUT_LIMIT_EXCEEDED = "Output Limit Exceeded"
+
+class RunResult(subprocess.CompletedProcess):
+    """
+    CompletedProcess that also carries the run's resource usage (None when unknown)
+    and whether it was killed for writing too much output.
+    """
+
+    def __init__(self, args, returncode, stdout=None, stderr=None, cpu_ms=None, wall_ms=None, max_rss_kb=None,
+                 output_limit_exceeded=False):
+        super().__init__(args, returncode, stdout, stderr)
+        self.cpu_ms = cpu_ms
+        self.wall_ms = wall_ms
+        self.max_rss_kb = max_rss_kb
+        self.output_limit_exceeded = output_limit_exceeded
+
+def run_limits(timeout, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Work out the CPU and memory limits of a run.
+
+    Args:
+        timeout (float): Wall-clock timeout of the run; the CPU limit sits just above it
+        memory_limit_mb (int, optional): Address-space cap, or None to leave memory alone
+
+    Returns:
+        dict: (soft, hard) limit per resource.RLIMIT_* constant
+    """
+    cpu_seconds = math.ceil(timeout) + CPU_LIMIT_GRACE_SECONDS
+    # The soft limit sends SIGXCPU; the hard limit a second later is a SIGKILL
+    limits = {resource.RLIMIT_CPU: (cpu_seconds, cpu_seconds + 1)}
+    if memory_limit_mb:
+        memory_bytes = memory_limit_mb * 1024 * 1024
+        limits[resource.RLIMIT_AS] = (memory_bytes, memory_bytes)
+    return limits
+
+def apply_limits(pid, timeout, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Set the CPU and memory limits of a process.
+
+    Args:
+        pid (int): Process to limit, or 0 for the calling process
+        timeout (float): Wall-clock timeout of the run
+        memory_limit_mb (int, optional): Address-space cap, or None to leave memory alone
+    """
+    for limit, values in run_limits(timeout, memory_limit_mb).items():
+        resource.prlimit(pid, limit, values)
+
+def limited_command(command, timeout, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Wrap a command so the program starts under its run limits.
+
+    Args:
+        command (list): argv of the program
+        timeout (float): Wall-clock timeout of the run
+        memory_limit_mb (int, optional): Address-space cap, or None to leave memory alone
+
+    Returns:
+        list: argv running the program through prlimit, or None if prlimit isn't installed
+    """
+    if PRLIMIT_PATH is None:
+        return None
+    options = {resource.RLIMIT_CPU: "--cpu", resource.RLIMIT_AS: "--as"}
+    wrapper = [PRLIMIT_PATH]
+    for limit, (soft, hard) in run_limits(timeout, memory_limit_mb).items():
+        wrapper.append(f"{options[limit]}={soft}:{hard}")
+    return [*wrapper, "--", *command]
+
+def usage_from_rusage(rusage):
+    """Convert a struct rusage into the cpu_ms and max_rss_kb fields of a result."""
+    return {
+        "cpu_ms": round((rusage.ru_utime + rusage.ru_stime) * 1000, 3),
+        # Linux reports ru_maxrss in kilobytes
+        "max_rss_kb": rusage.ru_maxrss
+    }
+
+def communicate(pid, stdin_fd, stdout_fd, stderr_fd, data, timeout, output_limit=OUTPUT_LIMIT_BYTES):
+    """
+    Feed stdin to a child and collect its output until it exits, times out or
+    writes more than output_limit bytes to either stream.
+
+    The child must lead its own process group, so a kill takes anything it spawned
+    too. All three fds are closed and the child is reaped.
+
+    Returns:
+        dict: stdout, stderr (each at most output_limit bytes), returncode, timed_out,
+        output_limit_exceeded, cpu_ms, wall_ms and max_rss_kb
+    """
+    started = time.monotonic()
+    selector = selectors.DefaultSelector()
+    pending = memoryview(data)
+    if pending:
+        os.set_blocking(stdin_fd, False)
+        selector.register(stdin_fd, selectors.EVENT_WRITE)
+    else:
+        os.close(stdin_fd)
+    selector.register(stdout_fd, selectors.EVENT_READ)
+    selector.register(stderr_fd, selectors.EVENT_READ)
+
+    output = {stdout_fd: [], stderr_fd: []}
+    remaining_output = {stdout_fd: output_limit, stderr_fd: output_limit}
+    deadline = started + timeout
+    timed_out = output_limit_exceeded = False
+    status = rusage = None
+
+    while not output_limit_exceeded:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+
+        if not selector.get_map():
+            # All pipes are closed; wait for the child itself to exit
+            waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited_pid:
+                break
+            time.sleep(min(0.005, remaining))
+            continue
+
+        for key, _ in selector.select(remaining):
+            fd = key.fd
+            if fd == stdin_fd:
+                try:
+                    written = os.write(fd, pending[:65536])
+                    pending = pending[written:]
+                except BrokenPipeError:
+                    pending = pending[:0]
+                if not pending:
+                    selector.unregister(fd)
+                    os.close(fd)
+            else:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    selector.unregister(fd)
+                    os.close(fd)
+                elif len(chunk) > remaining_output[fd]:
+                    # Keep what fits and stop reading; the child is killed below
+                    output[fd].append(chunk[:remaining_output[fd]])
+                    output_limit_exceeded = True
+                    break
+                else:
+                    output[fd].append(chunk)
+                    remaining_output[fd] -= len(chunk)
+
+    for key in list(selector.get_map().values()):
+        os.close(key.fd)
+    selector.close()
+
+    if status is None:
+        if timed_out or output_limit_exceeded:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        _, status, rusage = os.wait4(pid, 0)
+
+    return {
+        "stdout": b"".join(output[stdout_fd]).decode('utf-8', errors='replace'),
+        "stderr": b"".join(output[stderr_fd]).decode('utf-8', errors='replace'),
+        "returncode": os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+        "output_limit_exceeded": output_limit_exceeded,
+        "wall_ms": round((time.monotonic() - started) * 1000, 3),
+        **usage_from_rusage(rusage)
+    }
+
+def run_process(command, stdin, timeout, memory_limit_mb=MEMORY_LIMIT_MB, output_limit=OUTPUT_LIMIT_BYTES, cwd=None):
+    """
+    Run a compiled user program under resource limits.
+
+    Args:
+        command (list): argv of the program
+        stdin (str): Data fed to the program's stdin
+        timeout (float): Seconds before the program is killed
+        memory_limit_mb (int, optional): Address-space cap, or None for runtimes
+            such as the JVM that reserve far more than they use
+        output_limit (int, optional): Bytes allowed on each of stdout and stderr
+        cwd (str, optional): Working directory of the program, see workspaces.workspace()
+
+    Returns:
+        RunResult with text stdout/stderr and resource usage
+
+    Raises:
+        subprocess.TimeoutExpired: If the program ran past the timeout
+    """
+    stdin_read, stdin_write = os.pipe()
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+    # prlimit execs the program under its limits, so they cover it from its first instruction
+    # (a preexec_fn would run Python in the child of a threaded worker)
+    wrapped = limited_command(command, timeout, memory_limit_mb)
+    try:
+        # A new session makes the child a group leader, so a timeout kills its children too
+        process = subprocess.Popen(
+            wrapped or command,
+            stdin=stdin_read,
+            stdout=stdout_write,
+            stderr=stderr_write,
+            cwd=cwd,
+            start_new_session=True
+        )
+    except BaseException:
+        for fd in (stdin_read, stdin_write, stdout_read, stdout_write, stderr_read, stderr_write):
+            os.close(fd)
+        raise
+    for fd in (stdin_read, stdout_write, stderr_write):
+        os.close(fd)
+
+    if wrapped is None:
+        # Without prlimit the limits follow the exec, after the program's first instructions
+        try:
+            apply_limits(process.pid, timeout, memory_limit_mb)
+        except (ProcessLookupError, PermissionError):
+            # The program already finished
+            pass
+
+    reply = communicate(
+        process.pid, stdin_write, stdout_read, stderr_read, stdin.encode('utf-8'), timeout, output_limit
+    )
+    # communicate() reaped the child itself to get its rusage
+    process.returncode = reply["returncode"]
+
+    if reply["timed_out"]:
+        raise subprocess.TimeoutExpired(command, timeout, output=reply["stdout"], stderr=reply["stderr"])
+    return RunResult(
+        command, reply["returncode"], reply["stdout"], reply["stderr"],
+        cpu_ms=reply["cpu_ms"], wall_ms=reply["wall_ms"], max_rss_kb=reply["max_rss_kb"],
+        output_limit_exceeded=reply["output_limit_exceeded"]
+    )
+
+def usage_of(result):
+    """
+    Get the resource usage fields reported for a run.
+
+    Args:
+        result: A RunResult, plain CompletedProcess or subprocess.TimeoutExpired
+
+    Returns:
+        dict: cpu_ms, wall_ms and max_rss_kb, each None when unknown
+    """
+    if isinstance(result, subprocess.TimeoutExpired):
+        return {"cpu_ms": None, "wall_ms": round(result.timeout * 1000, 3), "max_rss_kb": None}
+    return {
+        "cpu_ms": getattr(result, "cpu_ms", None),
+        "wall_ms": getattr(result, "wall_ms", None),
+        "max_rss_kb": getattr(result, "max_rss_kb", None)
+    }
+
+def limit_verdict(result, memory_limit_mb=MEMORY_LIMIT_MB):
+    """
+    Classify a finished run that hit a resource limit.
+
+    Args:
+        result: A RunResult or plain CompletedProcess
+        memory_limit_mb (int): The memory cap the run had
+
+    Returns:
+        str: OUTPUT_LIMIT_EXCEEDED, TIME_LIMIT_EXCEEDED, MEMORY_LIMIT_EXCEEDED, or
+        None if no limit was hit
+    """
+    if getattr(result, "output_limit_exceeded", False):
+        return OUTPUT_LIMIT_EXCEEDED
+    if result.returncode in (-signal.SIGXCPU, 128 + signal.SIGXCPU):
+        return TIME_LIMIT_EXCEEDED
+    if result.stderr and MEMORY_ERROR_PATTERN.search(result.stderr):
+        return MEMORY_LIMIT_EXCEEDED
+    max_rss_kb = getattr(result, "max_rss_kb", None)
+    if max_rss_kb is not None and memory_limit_mb and max_rss_kb >= memory_limit_mb * 1024:
+        return MEMORY_LIMIT_EXCEEDED
+    return None
+
+def truncate_output(text, limit=None):
+    """
+    Shorten program output to what is worth sending back to the user.
+
+    Args:
+        text (str): Output of a run
+        limit (int, optional): Maximum size in UTF-8 bytes, DISPLAY_LIMIT_BYTES by default
+
+    Returns:
+        str: text itself, or its first limit bytes followed by a truncation note
+    """
+    if limit is None:
+        limit = DISPLAY_LIMIT_BYTES
+    if not text or len(text) * 4 <= limit:
+        return text
+    encoded = text.encode('utf-8')
+    if len(encoded) <= limit:
+        return text
+    kept = encoded[:limit].decode('utf-8', errors='ignore')
+    return f"{kept}\n... [output truncated after {limit // 1024} KB]"
@@ -0,0 +1,643 @@
+"""
+Pool of pre-warmed Python workers for running user code.
+
+Each worker is a long-lived "zygote" interpreter that has already paid for startup
+and the common standard-library imports. For every job the zygote forks a child,
+which gets the testcase on stdin, the optional input() shim and a fresh copy of the
+zygote's address space, so no state leaks between submissions. The Flask process
+talks to zygotes over their stdin/stdout with one JSON line per job.
+
+A batch job runs one submission against many testcases in a single forked child:
+the code is compiled once and the child resets the standard streams, input() and
+module globals between testcases. If a testcase leaves the interpreter in a state
+the reset can't undo, the remaining testcases are handed back to run one per child.
+
+Run as `python3 python_pool.py --zygote` to start a zygote by hand.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import builtins
+import queue
+import signal
+import atexit
+import selectors
+import threading
+import resource
+import traceback
+import subprocess
+import process_runner
+
+# Pool configuration
+POOL_ENABLED = os.getenv('PYTHON_POOL_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+POOL_SIZE = int(os.getenv('PYTHON_POOL_SIZE', '4'))
+POOL_MAX_JOBS = int(os.getenv('PYTHON_POOL_MAX_JOBS', '200'))
+
+# Extra time allowed for a zygote to answer before it is presumed hung
+REPLY_GRACE_SECONDS = 2
+
+# Modules imported once in the zygote so forked children don't pay for them
+WARM_MODULES = [
+    "math", "random", "re", "json", "string", "collections", "itertools",
+    "functools", "heapq", "bisect", "statistics", "datetime", "decimal", "fractions",
+]
+
+# Installed in place of input() when prompts must not pollute stdout
+INPUT_SHIM = (
+    "import builtins, sys\n"
+    "def input_wrapper(prompt=''):\n"
+    "    # Ignore the prompt so nothing interferes with the stdout that we check\n"
+    "    line = sys.stdin.readline()\n"
+    "    # Remove trailing newline if present\n"
+    "    if line and line[-1] == chr(10):\n"
+    "        line = line[:-1]\n"
+    "    return line\n"
+    "builtins.input = input_wrapper\n"
+)
+
+# Used when the pool is disabled or unavailable: runs the code without a temp file
+FALLBACK_BOOTSTRAP = (
+    "import sys\n"
+    "code = sys.argv.pop(1)\n"
+    "if sys.argv.pop(1) == '1':\n"
+    "    exec(" + repr(INPUT_SHIM) + ")\n"
+    "exec(compile(code, '<string>', 'exec'), {'__name__': '__main__'})\n"
+)
+
+# Attributes the batch child rebinds itself before every testcase
+RESET_EACH_TESTCASE = {
+    ("sys", "stdin"), ("sys", "stdout"), ("sys", "stderr"), ("builtins", "input"),
+}
+
+# ---------------------------------------------------------------------------
+# Zygote side
+# ---------------------------------------------------------------------------
+
+def _execute(compiled):
+    """Run compiled user code as a fresh __main__ module and return its exit code."""
+    try:
+        main_module = type(sys)('__main__')
+        sys.modules['__main__'] = main_module
+        exec(compiled, main_module.__dict__)
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Match the interpreter's report, minus the zygote's own frame
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+
+def _child_main(code, silence_prompts):
+    """Run user code inside a freshly forked child. Never returns."""
+    exit_code = 1
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        # The zygote's protocol pipes were replaced by the testcase pipes on fds 0-2
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', closefd=False)
+        sys.stderr = open(2, 'w', closefd=False)
+        sys.argv = ['-c']
+        sys.path[0] = ''
+
+        if silence_prompts:
+            exec(INPUT_SHIM, {})
+
+        try:
+            compiled = compile(code, '<string>', 'exec')
+        except SyntaxError as e:
+            traceback.print_exception(type(e), e, None)
+        else:
+            exit_code = _execute(compiled)
+    finally:
+        os._exit(exit_code)
+
+def _state_fingerprint():
+    """
+    Snapshot the interpreter state a submission could leave behind: which object
+    every module attribute is bound to, plus a few process-wide settings. Objects
+    mutated in place keep their identity and aren't noticed.
+    """
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        namespace = getattr(module, '__dict__', None)
+        if name == '__main__' or namespace is None:
+            continue
+        if name in ('sys', 'builtins'):
+            namespace = {key: value for key, value in namespace.items() if (name, key) not in RESET_EACH_TESTCASE}
+        modules[name] = (tuple(namespace), tuple(map(id, namespace.values())))
+    cwd = os.getcwd()
+    return {
+        "modules": modules,
+        "path": list(sys.path),
+        "cwd": cwd,
+        # Files a testcase writes to its working directory would be seen by the next one
+        "files": sorted(os.listdir(cwd)),
+        "threads": threading.active_count(),
+    }
+
+def _reset_is_trusted(before, after, first):
+    """Check whether a testcase left nothing behind that the next one could see."""
+    for name, attributes in after["modules"].items():
+        if name not in before["modules"]:
+            # The first testcase does the submission's imports; later ones find them cached
+            if not first:
+                return False
+        elif before["modules"][name] != attributes:
+            return False
+    return all(before[key] == after[key] for key in ("path", "cwd", "files", "threads"))
+
+def _write_memfd(fd, data):
+    os.ftruncate(fd, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    os.lseek(fd, 0, os.SEEK_SET)
+
+def _read_memfd(fd):
+    size = os.fstat(fd).st_size
+    chunks = []
+    offset = 0
+    while offset < size:
+        chunk = os.pread(fd, size - offset, offset)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        offset += len(chunk)
+    return b"".join(chunks).decode('utf-8', errors='replace')
+
+def _batch_child_main(code, tests, start, reply_fd, silence_prompts, timeout, memory_limit_mb, output_limit):
+    """
+    Run user code against tests[start:] inside one forked child, writing one JSON
+    line per testcase to reply_fd. Stops at the first testcase after which the
+    interpreter can't be trusted to be clean. Never returns.
+
+    Output goes to memory files capped with RLIMIT_FSIZE: a testcase that writes
+    too much gets SIGXFSZ, and like any other crash it is rerun in its own child,
+    where the output limit is reported properly.
+    """
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        sys.argv = ['-c']
+        sys.path[0] = ''
+
+        replies = os.fdopen(reply_fd, 'wb')
+        try:
+            compiled = compile(code, '<string>', 'exec')
+        except SyntaxError:
+            # Rare enough that the one-child-per-testcase path can report it
+            replies.write(json.dumps({"index": start, "untrusted": True}).encode('utf-8') + b"\n")
+            replies.flush()
+            os._exit(0)
+
+        # fds 0-2 are memory files, so open(0) and os.write(1) behave as in a normal run
+        stdin_fd, stdout_fd, stderr_fd = (os.memfd_create(name) for name in ("stdin", "stdout", "stderr"))
+        original_input = builtins.input
+        random_state = random.getstate()
+        recursion_limit = sys.getrecursionlimit()
+        before = None
+        if memory_limit_mb:
+            memory_bytes = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        # Testcase input must fit too, so the cap never falls below it. Python ignores
+        # SIGXFSZ, which would turn an oversized write into an exception the code can catch
+        file_limit = max([output_limit] + [len(stdin.encode('utf-8')) for stdin in tests[start:]])
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_limit, file_limit))
+        signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+
+        for index in range(start, len(tests)):
+            _write_memfd(stdin_fd, tests[index].encode('utf-8'))
+            _write_memfd(stdout_fd, b"")
+            _write_memfd(stderr_fd, b"")
+            os.dup2(stdin_fd, 0)
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_fd, 2)
+            sys.stdin = open(0, 'r', closefd=False)
+            sys.stdout = open(1, 'w', closefd=False)
+            sys.stderr = open(2, 'w', closefd=False)
+            builtins.input = original_input
+            if silence_prompts:
+                exec(INPUT_SHIM, {})
+            random.setstate(random_state)
+            sys.setrecursionlimit(recursion_limit)
+
+            # Resetting only touches what the fingerprint leaves out, so the last
+            # testcase's closing snapshot still describes the interpreter
+            if before is None:
+                before = _state_fingerprint()
+            # Each testcase gets its own CPU allowance on top of what earlier ones used
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            cpu_used = usage.ru_utime + usage.ru_stime
+            cpu_limit = int(cpu_used) + math.ceil(timeout) + process_runner.CPU_LIMIT_GRACE_SECONDS
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, resource.RLIM_INFINITY))
+
+            started = time.perf_counter()
+            exit_code = _execute(compiled)
+            wall_ms = round((time.perf_counter() - started) * 1000, 3)
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            after = _state_fingerprint()
+
+            for stream in (sys.stdin, sys.stdout, sys.stderr):
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+
+            if not _reset_is_trusted(before, after, first=index == start):
+                replies.write(json.dumps({"index": index, "untrusted": True}).encode('utf-8') + b"\n")
+                replies.flush()
+                break
+
+            reply = {
+                "index": index,
+                "returncode": exit_code,
+                "stdout": _read_memfd(stdout_fd),
+                "stderr": _read_memfd(stderr_fd),
+                "wall_ms": wall_ms,
+                "cpu_ms": round((usage.ru_utime + usage.ru_stime - cpu_used) * 1000, 3),
+                # Peak RSS is per process, so this is the highest of any testcase so far
+                "max_rss_kb": usage.ru_maxrss,
+                "timed_out": False
+            }
+            replies.write(json.dumps(reply).encode('utf-8') + b"\n")
+            replies.flush()
+            before = after
+    finally:
+        os._exit(0)
+
+def _run_job(job):
+    """Fork a child for one job and return its result."""
+    stdin_read, stdin_write = os.pipe()
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # Put the child and anything it spawns in its own group so a timeout kills them all
+        os.setpgid(0, 0)
+        os.dup2(stdin_read, 0)
+        os.dup2(stdout_write, 1)
+        os.dup2(stderr_write, 2)
+        for fd in (stdin_read, stdin_write, stdout_read, stdout_write, stderr_read, stderr_write):
+            os.close(fd)
+        if job.get("cwd"):
+            os.chdir(job["cwd"])
+        process_runner.apply_limits(0, job["timeout"], job.get("memory_limit_mb"))
+        _child_main(job["code"], job.get("silence_prompts", False))
+
+    # Also set the group from this side so a kill can't race the child's own setpgid
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    for fd in (stdin_read, stdout_write, stderr_write):
+        os.close(fd)
+    return process_runner.communicate(
+        pid, stdin_write, stdout_read, stderr_read,
+        job.get("stdin", "").encode('utf-8'), job["timeout"],
+        job.get("output_limit", process_runner.OUTPUT_LIMIT_BYTES)
+    )
+
+def _collect_batch(pid, reply_fd, results, start, timeout):
+    """
+    Gather a batch child's replies into results, giving each testcase its own
+    timeout. Returns the index a new child should resume from.
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(reply_fd, selectors.EVENT_READ)
+    index = start
+    resume_at = len(results)
+    pending = b""
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # Only the testcase that ran too long times out; the rest get a new child
+            results[index] = {"timed_out": True, "stdout": "", "stderr": ""}
+            resume_at = index + 1
+            break
+        if not selector.select(remaining):
+            continue
+        chunk = os.read(reply_fd, 65536)
+        if not chunk:
+            # The child is done, or died mid-testcase; unanswered testcases stay None
+            break
+        pending += chunk
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            reply = json.loads(line)
+            if reply.get("untrusted"):
+                continue
+            results[reply["index"]] = reply
+            index = reply["index"] + 1
+            deadline = time.monotonic() + timeout
+
+    selector.close()
+    os.close(reply_fd)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    os.waitpid(pid, 0)
+    return resume_at
+
+def _run_batch(job):
+    """Run one submission against every testcase of a batch job."""
+    tests = job["tests"]
+    results = [None] * len(tests)
+    start = 0
+    while start < len(tests):
+        reply_read, reply_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.setpgid(0, 0)
+            os.close(reply_read)
+            if job.get("cwd"):
+                os.chdir(job["cwd"])
+            _batch_child_main(
+                job["code"], tests, start, reply_write, job.get("silence_prompts", False),
+                job["timeout"], job.get("memory_limit_mb"),
+                job.get("output_limit", process_runner.OUTPUT_LIMIT_BYTES)
+            )
+
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        os.close(reply_write)
+        start = _collect_batch(pid, reply_read, results, start, job["timeout"])
+    return {"results": results}
+
+def serve():
+    """Zygote main loop: one JSON request line in, one JSON result line out."""
+    for name in WARM_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    requests_in = sys.stdin.buffer
+    replies_out = sys.stdout.buffer
+    while True:
+        line = requests_in.readline()
+        if not line:
+            break
+        try:
+            job = json.loads(line)
+            reply = _run_batch(job) if job.get("kind") == "batch" else _run_job(job)
+        except Exception as e:
+            reply = {"error": str(e)}
+        replies_out.write(json.dumps(reply).encode('utf-8') + b"\n")
+        replies_out.flush()
+
+# ---------------------------------------------------------------------------
+# Flask side
+# ---------------------------------------------------------------------------
+
+class _Zygote:
+    """Handle to one zygote process."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["python3", os.path.abspath(__file__), "--zygote"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self.jobs = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def submit(self, job, timeout):
+        request_line = json.dumps(job).encode('utf-8') + b"\n"
+        self.process.stdin.write(request_line)
+        self.process.stdin.flush()
+        self.jobs += 1
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.process.stdout, selectors.EVENT_READ)
+        try:
+            if not selector.select(timeout + REPLY_GRACE_SECONDS):
+                raise RuntimeError("Python worker stopped responding")
+        finally:
+            selector.close()
+
+        reply_line = self.process.stdout.readline()
+        if not reply_line:
+            raise RuntimeError("Python worker exited unexpectedly")
+        reply = json.loads(reply_line)
+        if "error" in reply:
+            raise RuntimeError(f"Python worker failed: {reply['error']}")
+        return reply
+
+    def close(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+
+def _outcome(reply, timeout):
+    """Turn a zygote's reply for one run into a RunResult, or a TimeoutExpired if it ran too long."""
+    if reply["timed_out"]:
+        return subprocess.TimeoutExpired(["python3"], timeout, output=reply["stdout"], stderr=reply["stderr"])
+    return process_runner.RunResult(
+        ["python3"], reply["returncode"], reply["stdout"], reply["stderr"],
+        cpu_ms=reply.get("cpu_ms"), wall_ms=reply.get("wall_ms"), max_rss_kb=reply.get("max_rss_kb"),
+        output_limit_exceeded=reply.get("output_limit_exceeded", False)
+    )
+
+class PythonPool:
+    """
+    Fixed-size pool of zygotes. Zygotes are started lazily, replaced when they die
+    and recycled after max_jobs jobs.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_jobs=POOL_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._slots = queue.Queue()
+        self._zygotes = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._slots.put(None)
+
+    def _spawn(self):
+        zygote = _Zygote()
+        with self._lock:
+            self._zygotes.append(zygote)
+        return zygote
+
+    def _retire(self, zygote):
+        zygote.close()
+        with self._lock:
+            if zygote in self._zygotes:
+                self._zygotes.remove(zygote)
+
+    def run(self, code, stdin, timeout, silence_prompts=False, cwd=None):
+        """
+        Run code in a forked child of a warm zygote.
+
+        Args:
+            code (str): Python source to execute
+            stdin (str): Data fed to the program's stdin
+            timeout (float): Seconds before the child is killed
+            silence_prompts (bool): Replace input() with a version that ignores prompts
+            cwd (str, optional): Working directory of the child
+
+        Returns:
+            process_runner.RunResult with text stdout/stderr and resource usage
+
+        Raises:
+            subprocess.TimeoutExpired: If the child ran past the timeout
+        """
+        job = {
+            "code": code, "stdin": stdin, "timeout": timeout, "silence_prompts": silence_prompts, "cwd": cwd,
+            "memory_limit_mb": process_runner.MEMORY_LIMIT_MB, "output_limit": process_runner.OUTPUT_LIMIT_BYTES
+        }
+        outcome = _outcome(self._submit(job, timeout), timeout)
+        if isinstance(outcome, subprocess.TimeoutExpired):
+            raise outcome
+        return outcome
+
+    def run_batch(self, code, stdins, timeout, silence_prompts=False, cwd=None):
+        """
+        Run code against several inputs in one forked child of a warm zygote.
+
+        Args:
+            code (str): Python source to execute
+            stdins (list): Data fed to the program's stdin, one entry per testcase
+            timeout (float): Seconds each testcase may run before it is killed
+            silence_prompts (bool): Replace input() with a version that ignores prompts
+            cwd (str, optional): Working directory of the child
+
+        Returns:
+            list: Per input, a process_runner.RunResult, a subprocess.TimeoutExpired
+            for a testcase that ran too long, or None if the testcase must be run on its own
+        """
+        job = {
+            "kind": "batch", "code": code, "tests": stdins, "timeout": timeout, "cwd": cwd,
+            "silence_prompts": silence_prompts, "memory_limit_mb": process_runner.MEMORY_LIMIT_MB,
+            "output_limit": process_runner.OUTPUT_LIMIT_BYTES
+        }
+        reply = self._submit(job, timeout * len(stdins))
+        return [None if result is None else _outcome(result, timeout) for result in reply["results"]]
+
+    def _submit(self, job, timeout):
+        """Send a job to an idle zygote, replacing zygotes that died or served enough jobs."""
+        zygote = self._slots.get()
+        try:
+            if zygote is not None and (not zygote.alive() or zygote.jobs >= self.max_jobs):
+                self._retire(zygote)
+                zygote = None
+            if zygote is None:
+                zygote = self._spawn()
+            return zygote.submit(job, timeout)
+        except Exception:
+            if zygote is not None:
+                self._retire(zygote)
+            zygote = None
+            raise
+        finally:
+            self._slots.put(zygote)
+
+    def shutdown(self):
+        with self._lock:
+            zygotes = list(self._zygotes)
+            self._zygotes.clear()
+        for zygote in zygotes:
+            zygote.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return this process's pool, creating it on first use (after gunicorn forks)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PythonPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+def run_python(code, stdin, timeout, silence_prompts=False, cwd=None):
+    """
+    Run Python code, preferring the warm pool and falling back to a fresh interpreter.
+
+    Args:
+        code (str): Python source to execute
+        stdin (str): Data fed to the program's stdin
+        timeout (float): Seconds before the program is killed
+        silence_prompts (bool): Replace input() with a version that ignores prompts
+        cwd (str, optional): Working directory of the program, see workspaces.workspace()
+
+    Returns:
+        process_runner.RunResult with text stdout/stderr and resource usage
+
+    Raises:
+        subprocess.TimeoutExpired: If the program ran past the timeout
+    """
+    if POOL_ENABLED:
+        try:
+            return get_pool().run(code, stdin, timeout, silence_prompts, cwd)
+        except subprocess.TimeoutExpired:
+            raise
+        except Exception as e:
+            print(f"[PYTHON POOL] Falling back to a fresh interpreter: {str(e)}")
+
+    return process_runner.run_process(
+        ["python3", "-c", FALLBACK_BOOTSTRAP, code, "1" if silence_prompts else "0"],
+        stdin,
+        timeout,
+        cwd=cwd
+    )
+
+def run_python_batch(code, stdins, timeout, silence_prompts=False, cwd=None):
+    """
+    Run Python code against several inputs in a single warm child.
+
+    Args:
+        code (str): Python source to execute
+        stdins (list): Data fed to the program's stdin, one entry per testcase
+        timeout (float): Seconds each testcase may run before it is killed
+        silence_prompts (bool): Replace input() with a version that ignores prompts
+        cwd (str, optional): Working directory of the child, shared by every testcase
+
+    Returns:
+        list: Per input, a process_runner.RunResult, a subprocess.TimeoutExpired,
+        or None when that testcase has to be run with run_python() instead
+    """
+    if POOL_ENABLED:
+        try:
+            return get_pool().run_batch(code, stdins, timeout, silence_prompts, cwd)
+        except Exception as e:
+            print(f"[PYTHON POOL] Batch unavailable, running testcases separately: {str(e)}")
+    return [None] * len(stdins)
+
+if __name__ == "__main__":
+    if "--zygote" in sys.argv:
+        serve()
+    else:
+        print("Usage: python3 python_pool.py --zygote", file=sys.stderr)
+        sys.exit(2)
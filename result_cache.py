@@ -0,0 +1,95 @@
+"""
+Cache of recent check results, keyed by submission and testcase set.
+
+Students often press "Check" again without changing anything. The events of a
+finished check are kept in the check_results table, so every gunicorn worker can
+answer a repeated check at once instead of running every testcase again. Entries
+expire after a TTL, and only the most recently used ones are kept.
+"""
+
+import os
+import json
+import time
+import hashlib
+import db
+
+# Cache configuration
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', '600'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))
+
+# Bump when the checker changes what a result contains, so stale entries miss
+CACHE_FORMAT_VERSION = 4
+
+# Verdicts that depend on how busy the host was rather than on the submission
+UNCACHEABLE_VERDICTS = ("Time Limit Exceeded", "Internal Error")
+
+def normalize_source(code):
+    """Normalize line endings and trailing newlines, which don't change what code does.
+
+    Leading whitespace is kept: in Python it can turn working code into an IndentationError.
+    """
+    return code.replace('\r\n', '\n').replace('\r', '\n').rstrip('\n')
+
+def cache_key(code, language, inputs, expected_outputs, mode="full", compare="lines"):
+    """
+    Build the cache key of a check.
+
+    Args:
+        code (str): The user's code
+        language (str): Programming language (python, java, cpp)
+        inputs (list): stdin of each testcase
+        expected_outputs (list): Expected output of each testcase
+        mode (str): Check mode, which decides which testcases were run
+        compare (str): How outputs were compared
+
+    Returns:
+        str: Hex digest identifying the source, language, testcases and modes
+    """
+    canonical = json.dumps({
+        "version": CACHE_FORMAT_VERSION,
+        "language": language,
+        "mode": mode,
+        "compare": compare,
+        "code": normalize_source(code),
+        "testcases": [[stdin, expected] for stdin, expected in zip(inputs, expected_outputs)]
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def get(key):
+    """
+    Return the cached events of a check, or None on a miss.
+
+    Lookup errors count as misses, so a broken cache never fails a check.
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None
+    try:
+        return db.get_cached_check(key, time.time() - RESULT_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"[RESULT CACHE] Lookup failed: {str(e)}")
+        return None
+
+def is_cacheable(events):
+    """Return whether a finished check's outcome would be the same if it ran again."""
+    for event in events:
+        if event["event"] == "testcase" and event["result"].get("verdict") in UNCACHEABLE_VERDICTS:
+            return False
+    return bool(events) and events[-1]["event"] == "summary"
+
+def put(key, events):
+    """
+    Cache the events of a finished check, unless its outcome depended on load.
+
+    Args:
+        key (str): Key from cache_key()
+        events (list): Every event of the check, summary last
+    """
+    if not RESULT_CACHE_ENABLED or not is_cacheable(events):
+        return
+    try:
+        db.put_cached_check(
+            key, events, time.time() - RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES
+        )
+    except Exception as e:
+        print(f"[RESULT CACHE] Store failed: {str(e)}")
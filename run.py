@@ -1,14 +1,26 @@
 import subprocess
-import tempfile
-import os
-import re
-import json
 from flask import jsonify
+import compile_cache
+import executor
+import process_runner
 
-def run_code(code, stdin, language):
-    """ Runs user-submitted code in the specified language and returns the output. """
+# Seconds a program may run for
+RUN_TIMEOUT = 5
+
+def execute_run(code, stdin, language):
+    """
+    Runs user-submitted code in the specified language.
+    
+    Args:
+        code (str): The user's code
+        stdin (str): Data fed to the program's stdin
+        language (str): Programming language (python, java, cpp)
+        
+    Returns:
+        tuple: (payload, status_code). payload is the response body as a dict.
+    """
     if not code.strip():
-        return jsonify({"error": "No code provided"}), 400
+        return {"error": "No code provided"}, 400
         
     # Ensure stdin is properly converted to string
     if stdin is None:
@@ -21,97 +33,57 @@ def run_code(code, stdin, language):
         except:
             stdin = ""
 
+    # Default to Python if language is not specified
+    if not language:
+        language = "python"
+
     try:
-        if language == "python" or language is None or language == "":
-            # Run Python code (default to Python if language is not specified)
-            process = subprocess.run(
-                ["python3", "-c", code], 
-                input=stdin,
-                capture_output=True, text=True, timeout=5
-            )
-        elif language == "java":
-            # For Java, we need to create temporary files
-            # Create a temporary directory
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Determine the class name (assuming public class)
-                class_match = re.search(r'public\s+class\s+(\w+)', code)
-                
-                if not class_match:
-                    return jsonify({"error": "Could not find a public class in your Java code."}), 400
-                
-                class_name = class_match.group(1)
-                java_file_path = os.path.join(temp_dir, f"{class_name}.java")
-                
-                # Write the code to a temporary Java file
-                with open(java_file_path, 'w') as java_file:
-                    java_file.write(code)
-                
-                # Compile the Java code
-                compile_process = subprocess.run(
-                    ["javac", java_file_path],
-                    capture_output=True, text=True
-                )
-                
-                if compile_process.returncode != 0:
-                    # Compilation error
-                    return jsonify({
-                        "stdout": "",
-                        "stderr": f"Compilation error:\n{compile_process.stderr}"
-                    })
-                
-                # Run the compiled Java code
-                process = subprocess.run(
-                    ["java", "-cp", temp_dir, class_name],
-                    input=stdin,
-                    capture_output=True, text=True, timeout=5
-                )
-        elif language == "cpp":
-            # For C++, we need to create temporary files
-            # Create a temporary directory
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Create a temporary C++ file
-                cpp_file_path = os.path.join(temp_dir, "main.cpp")
-                executable_path = os.path.join(temp_dir, "program")
-                
-                # Write the code to a temporary C++ file
-                with open(cpp_file_path, 'w') as cpp_file:
-                    cpp_file.write(code)
-                
-                # Compile the C++ code
-                compile_process = subprocess.run(
-                    ["g++", "-std=c++17", cpp_file_path, "-o", executable_path],
-                    capture_output=True, text=True
-                )
-                
-                if compile_process.returncode != 0:
-                    # Compilation error
-                    return jsonify({
-                        "stdout": "",
-                        "stderr": f"Compilation error:\n{compile_process.stderr}"
-                    })
-                
-                # Run the compiled C++ code
-                process = subprocess.run(
-                    [executable_path],
-                    input=stdin,
-                    capture_output=True, text=True, timeout=5
-                )
-        else:
-            return jsonify({"error": f"Unsupported language: {language}"}), 400
+        try:
+            program, compile_error = executor.prepare(code, language, profile="run")
+        except executor.SubmissionError as e:
+            return {"error": str(e)}, 400
+        
+        if compile_error is not None:
+            # Nothing ran, so there is no usage to report
+            line, column = compile_cache.error_location(compile_error)
+            return {
+                "stdout": "",
+                "stderr": f"Compilation error:\n{compile_error}",
+                "verdict": "Compilation Error",
+                "line": line,
+                "column": column,
+                "cpu_ms": None,
+                "wall_ms": None,
+                "max_rss_kb": None
+            }, 200
+        
+        process = program.run(stdin, timeout=RUN_TIMEOUT)
 
-        # Ensure we have valid outputs
-        stdout = process.stdout.strip() if process.stdout else ""
-        stderr = process.stderr.strip() if process.stderr else ""
+        # Ensure we have valid outputs, no longer than is worth displaying
+        stdout = process_runner.truncate_output(process.stdout.strip()) if process.stdout else ""
+        stderr = process_runner.truncate_output(process.stderr.strip()) if process.stderr else ""
+        
+        # Report what the run used, and whether it hit a resource limit
+        verdict = process_runner.limit_verdict(process)
+        if verdict is None:
+            verdict = "OK" if process.returncode == 0 else "Runtime Error"
         
-        return jsonify({
+        return {
             "stdout": stdout,
-            "stderr": stderr
-        })
+            "stderr": stderr,
+            "verdict": verdict,
+            **process_runner.usage_of(process)
+        }, 200
 
     except subprocess.TimeoutExpired:
-        return jsonify({"error": "Execution timed out"}), 500
+        return {"error": "Execution timed out", "verdict": process_runner.TIME_LIMIT_EXCEEDED}, 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+def run_code(code, stdin, language):
+    """ Runs user-submitted code in the specified language and returns the output. """
+    payload, status_code = execute_run(code, stdin, language)
+    return jsonify(payload), status_code
 
 # This is still used to run the Flask app
 if __name__ == "__main__":
@@ -880,12 +880,52 @@ function setupEventListeners() {
       resultDiv.textContent = loadingText + dotsText.padEnd(3, " ");
     }, 300);
 
-    fetch("/generate", {
+    // Progress arrives as Server-Sent Events; the problem text is shown as it is written
+    let streamedProblem = "";
+    let result = null;
+    const handleEvent = event => {
+      if (event.event === "title") {
+        titleHeader.textContent = event.title;
+      } else if (event.event === "problem_chunk") {
+        clearInterval(loadingInterval);
+        streamedProblem += event.text;
+        resultDiv.innerHTML = marked.parse(streamedProblem);
+      } else if (event.event === "done") {
+        result = event.result;
+      } else if (event.event === "error") {
+        throw new Error(event.error);
+      }
+    };
+
+    fetch("/generate?stream=1", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ course, lesson, language })
     })
-    .then(res => res.json())
+    .then(async res => {
+      if (!res.ok || !res.body) {
+        const data = await res.json();
+        throw new Error(data.error || `Request failed with status ${res.status}`);
+      }
+
+      // Events are separated by a blank line; each has one data line of JSON
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const blocks = buffered.split("\n\n");
+        buffered = blocks.pop();
+        blocks.forEach(block => {
+          const dataLine = block.split("\n").find(line => line.startsWith("data: "));
+          if (dataLine) handleEvent(JSON.parse(dataLine.slice(6)));
+        });
+      }
+      if (!result) throw new Error("Generation ended without a problem");
+      return result;
+    })
     .then(data => {
       // Clear the loading interval
       clearInterval(loadingInterval);
@@ -1102,6 +1142,72 @@ function setupEventListeners() {
       return;
     }
 
+    const stopLoading = () => {
+      clearInterval(loadingInterval);
+      checkAnswerBtn.textContent = originalText;
+      checkAnswerBtn.disabled = false;
+    };
+
+    const cellStyle = "word-wrap: break-word; overflow-wrap: break-word;";
+    const preStyle = "white-space: pre-wrap; word-wrap: break-word; max-width: 100%;";
+
+    // Fill in one row of the results table
+    const renderRow = (row, tc) => {
+      const isPassing = tc.status === '✅';
+
+      // Add background color to the entire row based on test result
+      row.style.backgroundColor = isPassing
+        ? 'rgba(0, 255, 0, 0.1)' // Light green for passing
+        : 'rgba(255, 0, 0, 0.1)'; // Light red for failing
+
+      row.innerHTML = `<td style="${cellStyle}"><pre style="${preStyle}">${tc.input}</pre></td>
+                       <td style="${cellStyle}"><pre style="${preStyle}">${tc.expected_output}</pre></td>
+                       <td style="${cellStyle}"><pre style="${preStyle}">${tc.user_output}</pre></td>
+                       <td style="color: ${isPassing ? 'green' : 'red'}; text-align: center; font-size: 1.2em;">${tc.status}</td>`;
+    };
+
+    // Draw the table up front with a pending row per testcase; rows fill in as results stream in
+    resultsDiv.innerHTML = `<h2>Test Case Results</h2><table border="1" style="width: 100%; table-layout: fixed;">
+                      <tr>
+                        <th style="width: 20%;">Input</th>
+                        <th style="width: 30%;">Expected Output</th>
+                        <th style="width: 30%;">Your Output</th>
+                        <th style="width: 10%; text-align: center;">Status</th>
+                      </tr>
+                    </table>
+                    <p class="check-summary" style="text-align: center; margin-top: 10px;"></p>`;
+    const table = resultsDiv.querySelector("table");
+    const summary = resultsDiv.querySelector(".check-summary");
+    const rows = testcases.map(tc => {
+      const row = table.insertRow();
+      const input = typeof tc === 'object' && tc !== null ? (tc.input ?? "") : String(tc);
+      const expected = typeof tc === 'object' && tc !== null ? (tc.expected_output ?? tc.output ?? "") : "";
+      row.innerHTML = `<td style="${cellStyle}"><pre style="${preStyle}">${input}</pre></td>
+                       <td style="${cellStyle}"><pre style="${preStyle}">${expected}</pre></td>
+                       <td style="${cellStyle}"><pre style="${preStyle}"></pre></td>
+                       <td style="text-align: center; font-size: 1.2em;">⏳</td>`;
+      return row;
+    });
+
+    const handleEvent = event => {
+      if (event.event === "compile" && (event.status === "error" || event.status === "failed")) {
+        // A compile error (or the server failing to compile) is the only result; drop the pending rows
+        rows.forEach(row => row.remove());
+        rows.length = 0;
+        rows.push(table.insertRow());
+      } else if (event.event === "testcase" && rows[event.index]) {
+        renderRow(rows[event.index], event.result);
+      } else if (event.event === "summary") {
+        // Add a summary of the test results
+        summary.innerHTML = `<strong>${event.passed} of ${event.total} tests passing</strong>`;
+
+        // If all tests pass, show confetti!
+        if (event.success) {
+          showConfetti();
+        }
+      }
+    };
+
     fetch("/check_code", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
@@ -1109,70 +1215,37 @@ function setupEventListeners() {
         code, 
         testcases, 
         language,
-        problem_id: currentProblemId 
+        problem_id: currentProblemId,
+        stream: "ndjson"
       })
     })
-    .then(res => res.json())
-    .then(data => {
-      // Clear loading animation
-      clearInterval(loadingInterval);
-      checkAnswerBtn.textContent = originalText;
-      checkAnswerBtn.disabled = false;
-      
-      if (data.error) {
-        resultsDiv.innerHTML = `<p style="color: red;">Error: ${data.error}</p>`;
-        return;
+    .then(async res => {
+      if (!res.ok || !res.body) {
+        const data = await res.json();
+        throw new Error(data.error || `Request failed with status ${res.status}`);
       }
 
-      // Count the number of passing tests
-      let passingTests = 0;
-      const totalTests = data.results.length;
-      
-      let tableHTML = `<h2>Test Case Results</h2><table border="1" style="width: 100%; table-layout: fixed;">
-                      <tr>
-                        <th style="width: 20%;">Input</th>
-                        <th style="width: 30%;">Expected Output</th>
-                        <th style="width: 30%;">Your Output</th>
-                        <th style="width: 10%; text-align: center;">Status</th>
-                      </tr>`;
-      data.results.forEach(tc => {
-        const isPassing = tc.status === '✅';
-        if (isPassing) passingTests++;
-        
-        // Add background color to the entire row based on test result
-        const rowColor = isPassing 
-          ? 'background-color: rgba(0, 255, 0, 0.1);' // Light green for passing
-          : 'background-color: rgba(255, 0, 0, 0.1);'; // Light red for failing
-          
-        tableHTML += `<tr style="${rowColor}">
-                        <td style="word-wrap: break-word; overflow-wrap: break-word;"><pre style="white-space: pre-wrap; word-wrap: break-word; max-width: 100%;">${tc.input}</pre></td>
-                        <td style="word-wrap: break-word; overflow-wrap: break-word;"><pre style="white-space: pre-wrap; word-wrap: break-word; max-width: 100%;">${tc.expected_output}</pre></td>
-                        <td style="word-wrap: break-word; overflow-wrap: break-word;"><pre style="white-space: pre-wrap; word-wrap: break-word; max-width: 100%;">${tc.user_output}</pre></td>
-                        <td style="color: ${isPassing ? 'green' : 'red'}; text-align: center; font-size: 1.2em;">${tc.status}</td>
-                      </tr>`;
-      });
-      tableHTML += "</table>";
-      
-      // Add a summary of the test results
-      tableHTML += `<p style="text-align: center; margin-top: 10px;">
-                      <strong>${passingTests} of ${totalTests} tests passing</strong>
-                    </p>`;
-
-      resultsDiv.innerHTML = tableHTML;  // Now results are stored correctly
-      
-      // If all tests pass, show confetti!
-      if (passingTests === totalTests && totalTests > 0) {
-        showConfetti();
+      // Each line of the response is one JSON event
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
       }
+      if (buffered.trim()) handleEvent(JSON.parse(buffered));
+      stopLoading();
     })
     .catch(err => {
       // Clear loading animation
-      clearInterval(loadingInterval);
-      checkAnswerBtn.textContent = originalText;
-      checkAnswerBtn.disabled = false;
+      stopLoading();
       
       console.error(err);
-      resultsDiv.innerHTML = `<p style="color: red;">Error checking answer.</p>`;
+      resultsDiv.innerHTML = `<p style="color: red;">Error: ${err.message || "Error checking answer."}</p>`;
     });
   });
 }
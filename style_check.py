@@ -1,9 +1,44 @@
 import subprocess
-import json
 import os
 import tempfile
 import re
+import ast
 from flask import jsonify
+import capabilities
+
+# flake8's own checkers, run in-process on the source string when installed
+try:
+    import pycodestyle
+    import pyflakes.checker
+except ImportError:
+    pycodestyle = None
+
+PYTHON_LINT_IN_PROCESS = pycodestyle is not None
+
+# flake8's codes for pyflakes messages
+try:
+    from flake8.plugins.pyflakes import FLAKE8_PYFLAKES_CODES as PYFLAKES_CODES
+except ImportError:
+    PYFLAKES_CODES = {
+        "UnusedImport": "F401", "ImportShadowedByLoopVar": "F402", "ImportStarUsed": "F403",
+        "LateFutureImport": "F404", "ImportStarUsage": "F405", "ImportStarNotPermitted": "F406",
+        "FutureFeatureNotDefined": "F407", "PercentFormatInvalidFormat": "F501",
+        "PercentFormatExpectedMapping": "F502", "PercentFormatExpectedSequence": "F503",
+        "PercentFormatExtraNamedArguments": "F504", "PercentFormatMissingArgument": "F505",
+        "PercentFormatMixedPositionalAndNamed": "F506", "PercentFormatPositionalCountMismatch": "F507",
+        "PercentFormatStarRequiresSequence": "F508", "PercentFormatUnsupportedFormatCharacter": "F509",
+        "StringDotFormatInvalidFormat": "F521", "StringDotFormatExtraNamedArguments": "F522",
+        "StringDotFormatExtraPositionalArguments": "F523", "StringDotFormatMissingArgument": "F524",
+        "StringDotFormatMixingAutomatic": "F525", "FStringMissingPlaceholders": "F541",
+        "MultiValueRepeatedKeyLiteral": "F601", "MultiValueRepeatedKeyVariable": "F602",
+        "TooManyExpressionsInStarredAssignment": "F621", "TwoStarredExpressions": "F622",
+        "AssertTuple": "F631", "IsLiteral": "F632", "InvalidPrintSyntax": "F633", "IfTuple": "F634",
+        "BreakOutsideLoop": "F701", "ContinueOutsideLoop": "F702", "YieldOutsideFunction": "F704",
+        "ReturnOutsideFunction": "F706", "DefaultExceptNotLast": "F707", "DoctestSyntaxError": "F721",
+        "ForwardAnnotationSyntaxError": "F722", "RedefinedWhileUnused": "F811", "UndefinedName": "F821",
+        "UndefinedExport": "F822", "UndefinedLocal": "F823", "DuplicateArgument": "F831",
+        "UnusedVariable": "F841", "UnusedAnnotation": "F842", "RaiseNotImplemented": "F901",
+    }
 
 def check_style(code, language):
     """
@@ -33,32 +68,24 @@ def check_style(code, language):
         # Select appropriate style checker based on language
         print(f"[STYLE CHECK] Using checker for {language}")
         
+        # Whether each linter is installed was probed once, at startup
         if language == "python":
-            try:
-                # Quick check if flake8 is installed
-                subprocess.run(['flake8', '--version'], capture_output=True, check=True)
+            if PYTHON_LINT_IN_PROCESS or capabilities.is_available("flake8"):
                 return check_python_style(code)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                print("[STYLE CHECK] flake8 not found, using fallback")
-                return provide_fallback_style_check(code, language)
+            print("[STYLE CHECK] flake8 not found, using fallback")
+            return provide_fallback_style_check(code, language)
                 
         elif language == "java":
-            try:
-                # Check if PMD is installed
-                subprocess.run(['pmd', 'check', '--help'], capture_output=True)
+            if capabilities.is_available("pmd"):
                 return check_java_style(code)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                print("[STYLE CHECK] PMD not found, using fallback")
-                return provide_fallback_style_check(code, language)
+            print("[STYLE CHECK] PMD not found, using fallback")
+            return provide_fallback_style_check(code, language)
                 
         elif language == "cpp":
-            try:
-                # Check if clang-tidy is installed
-                subprocess.run(['clang-tidy', '--version'], capture_output=True, check=True)
+            if capabilities.is_available("clang-tidy"):
                 return check_cpp_style(code)
-            except (subprocess.SubprocessError, FileNotFoundError):
-                print("[STYLE CHECK] clang-tidy not found, using fallback")
-                return provide_fallback_style_check(code, language)
+            print("[STYLE CHECK] clang-tidy not found, using fallback")
+            return provide_fallback_style_check(code, language)
                 
         else:
             print(f"[STYLE CHECK] Error: Style checking not supported for {language}")
@@ -224,8 +251,98 @@ def provide_fallback_style_check(code, language):
         "fallback": True
     })
 
+if PYTHON_LINT_IN_PROCESS:
+    class _CollectingReport(pycodestyle.BaseReport):
+        """pycodestyle report that keeps the errors instead of printing them."""
+        
+        def __init__(self, options):
+            super().__init__(options)
+            self.errors = []
+        
+        def error(self, line_number, offset, text, check):
+            code = super().error(line_number, offset, text, check)
+            if code:
+                self.errors.append({
+                    "line": line_number,
+                    "column": offset + 1,
+                    "message": text[5:],
+                    "code": code
+                })
+            return code
+    
+    # flake8's defaults: 79 character lines and pycodestyle's default ignore list
+    _pycodestyle_options = pycodestyle.StyleGuide(quiet=True, max_line_length=79).options
+
+def lint_python(code):
+    """
+    Lint Python source in-process with the checkers flake8 runs (pycodestyle and pyflakes).
+    
+    Args:
+        code (str): The user's code
+        
+    Returns:
+        list: Errors with line, column, message and code, as flake8 reports them
+    """
+    try:
+        tree = ast.parse(code, filename="solution.py")
+    except (SyntaxError, ValueError) as e:
+        # Like flake8, report code that doesn't parse as a single E999 and nothing else
+        return [{
+            "line": getattr(e, "lineno", None) or 1,
+            "column": (getattr(e, "offset", None) or 0) + 1,
+            "message": f"{type(e).__name__}: {getattr(e, 'msg', None) or str(e)}",
+            "code": "E999"
+        }]
+    
+    report = _CollectingReport(_pycodestyle_options)
+    pycodestyle.Checker(filename="solution.py", lines=code.splitlines(True), options=_pycodestyle_options, report=report).check_all()
+    errors = report.errors
+    for message in pyflakes.checker.Checker(tree, filename="solution.py").messages:
+        errors.append({
+            "line": message.lineno,
+            "column": message.col + 1,
+            "message": message.message % message.message_args,
+            "code": PYFLAKES_CODES.get(type(message).__name__, "F999")
+        })
+    
+    return sorted(errors, key=lambda error: (error["line"], error["column"]))
+
+def run_flake8(code):
+    """
+    Lint Python source with the flake8 command, fed through stdin.
+    
+    Args:
+        code (str): The user's code
+        
+    Returns:
+        list: Errors with line, column, message and code
+    """
+    result = subprocess.run(
+        ['flake8', '-'],
+        input=code,
+        capture_output=True,
+        text=True,
+        timeout=5
+    )
+    
+    # Parse the output in standard format (stdin:line:column: error)
+    pattern = r'.*?:(\d+):(\d+): ([A-Z]\d+) (.*)'
+    errors = []
+    
+    for line in result.stdout.splitlines():
+        match = re.match(pattern, line)
+        if match:
+            line_num, col_num, error_code, message = match.groups()
+            errors.append({
+                "line": int(line_num),
+                "column": int(col_num),
+                "message": message,
+                "code": error_code
+            })
+    return errors
+
 def check_python_style(code):
-    """Check Python code style using flake8"""
+    """Check Python code style with flake8's checkers, in-process when they are installed"""
     print("[STYLE CHECK] Running Python style check with flake8")
     print(f"[STYLE CHECK] Original code (first 100 chars): {code[:100]}...")
     
@@ -233,67 +350,10 @@ def check_python_style(code):
     original_code = code
     
     try:
-        # Create a temporary file with the code
-        with tempfile.NamedTemporaryFile(suffix='.py', mode='w', delete=False) as temp_file:
-            temp_file.write(code)
-            temp_path = temp_file.name
-            print(f"[STYLE CHECK] Created temporary file: {temp_path}")
-        
-        # Run flake8 on the temporary file
-        try:
-            # First try with JSON format if flake8-json is available
-            result = subprocess.run(
-                ['flake8', '--format=json', temp_path],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            # Parse the output as JSON if possible
-            try:
-                error_data = json.loads(result.stdout)
-                # Convert to our standardized format
-                errors = []
-                
-                for file_path, file_errors in error_data.items():
-                    for error in file_errors:
-                        errors.append({
-                            "line": error.get("line_number", 1),
-                            "column": error.get("column_number", 1),
-                            "message": error.get("text", "Unknown error"),
-                            "code": error.get("code", "")
-                        })
-                        
-            except json.JSONDecodeError:
-                # If JSON parsing fails, fallback to standard format
-                raise ValueError("JSON parsing failed")
-                
-        except (subprocess.SubprocessError, ValueError):
-            # Fallback to standard format if JSON format is not available
-            result = subprocess.run(
-                ['flake8', temp_path],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
-            # Parse the output in standard format (filename:line:column: error)
-            pattern = r'.*?:(\d+):(\d+): ([A-Z]\d+) (.*)'
-            errors = []
-            
-            for line in result.stdout.splitlines():
-                match = re.match(pattern, line)
-                if match:
-                    line_num, col_num, error_code, message = match.groups()
-                    errors.append({
-                        "line": int(line_num),
-                        "column": int(col_num),
-                        "message": message,
-                        "code": error_code
-                    })
-        
-        # Clean up the temporary file
-        os.unlink(temp_path)
+        if PYTHON_LINT_IN_PROCESS:
+            errors = lint_python(code)
+        else:
+            errors = run_flake8(code)
         
         # Return the formatted results
         code_lines = code.splitlines()
@@ -583,6 +643,14 @@ def format_java_code(code):
 
 def format_cpp_code(code):
     """Format C++ code using clang-format"""
+    if not capabilities.is_available("clang-format"):
+        print("[FORMAT] clang-format not found")
+        return jsonify({
+            "error": "clang-format is not installed",
+            "success": False,
+            "original_code": code
+        })
+    
     try:
         # Store original code in case of errors
         original_code = code
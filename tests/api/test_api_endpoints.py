@@ -2,9 +2,11 @@ import json
 import pytest
 import tempfile
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from flask import jsonify
 
+import db
+import generation
 from app import app as flask_app
 from db import init_db  # Import init_db to create test database
 
@@ -27,8 +29,9 @@ class TestAPIEndpoints:
         # Create a test database in a temporary file
         _, test_db_path = tempfile.mkstemp()
         
-        # Override DB path for testing
-        with patch('db.DB_PATH', test_db_path):
+        # Override DB path for testing, and keep the problem pool from generating in the background
+        with patch('db.DB_PATH', test_db_path), \
+             patch('problem_pool.PROBLEM_POOL_ENABLED', False):
             # Initialize the test database
             init_db()
             yield flask_app
@@ -95,14 +98,12 @@ class TestAPIEndpoints:
         assert response.status_code == 200
         assert response.json == mock_lessons
     
-    @patch('subprocess.run')
+    @patch('generation.generate_problem')
     @patch('db.store_problem')
-    def test_generate_problem(self, mock_store_problem, mock_subprocess_run, client):
+    def test_generate_problem(self, mock_store_problem, mock_generate_problem, client):
         """Test generating a new problem"""
-        # Mock the subprocess.run response (which simulates request.py output)
-        mock_subprocess_process = MagicMock()
-        mock_subprocess_process.returncode = 0
-        mock_subprocess_process.stdout = json.dumps({
+        # Mock the generation service's result
+        mock_generate_problem.return_value = generation.GenerationResult({
             "data": {
                 "outputs": {
                     "Title": "Test Problem",
@@ -114,8 +115,6 @@ class TestAPIEndpoints:
                 }
             }
         })
-        mock_subprocess_process.stderr = ""
-        mock_subprocess_run.return_value = mock_subprocess_process
         
         # Mock the database store_problem function to return a problem ID
         mock_store_problem.return_value = 1
@@ -138,6 +137,86 @@ class TestAPIEndpoints:
         assert len(data["testcases"]) == 2
         assert "input" in data["testcases"][0]
         assert "expected_output" in data["testcases"][0]
+        mock_generate_problem.assert_called_once_with("learnpython.org", "Basic Operators", "python")
+        assert mock_store_problem.call_args[0][:2] == ("Test Problem", "Write a function that adds two numbers.")
+    
+    @patch('db.store_problem', return_value=7)
+    @patch('generation.generate_problem_events')
+    def test_generate_stream(self, mock_generate_events, mock_store_problem, client):
+        """Test that ?stream=1 relays generation progress as SSE and stores the finished problem"""
+        result = generation.GenerationResult({"data": {"outputs": {
+            "Title": "Test Problem",
+            "Problem": "Add two numbers.",
+            "Testcases": json.dumps([{"input": "1 2", "expected_output": "3"}])
+        }}})
+        mock_generate_events.return_value = iter([
+            {"event": "started", "workflow_run_id": "run-1"},
+            {"event": "problem_chunk", "text": "Add two numbers."},
+            {"event": "title", "title": "Test Problem"},
+            {"event": "finished", "result": result},
+        ])
+        
+        response = client.post('/generate?stream=1', json={"course": "learnpython.org", "lesson": "Basic Operators"})
+        
+        assert response.mimetype == "text/event-stream"
+        events = [json.loads(block.split("data: ", 1)[1]) for block in response.get_data(as_text=True).strip().split("\n\n")]
+        assert [e["event"] for e in events] == ["started", "problem_chunk", "title", "testcases", "done"]
+        assert events[3]["testcases"] == [{"input": "1 2", "expected_output": "3"}]
+        assert events[4]["result"]["problem_id"] == 7
+        mock_store_problem.assert_called_once()
+    
+    @patch('problem_pool.request_refill')
+    @patch('generation.generate_problem')
+    def test_generate_serves_pooled_problem(self, mock_generate_problem, mock_request_refill, client):
+        """Test that a pre-generated problem is handed out once, without a workflow run"""
+        problem_id = db.store_problem("Pooled", "Add two numbers.", "learnpython.org", "Basic Operators",
+                                      [{"input": "1 2", "expected_output": "3"}], "python", pool_status="unserved")
+        
+        with patch('problem_pool.PROBLEM_POOL_ENABLED', True):
+            first = client.post('/generate', json={"course": "learnpython.org", "lesson": "Basic Operators"})
+            depth = client.get('/problem_pool').json
+        
+        mock_generate_problem.assert_not_called()
+        mock_request_refill.assert_called_once_with("learnpython.org", "Basic Operators", "python")
+        assert first.json["problem_id"] == problem_id
+        assert first.json["pooled"] is True
+        assert first.json["data"]["outputs"]["Title"] == "Pooled"
+        assert first.json["testcases"] == [{"input": "1 2", "expected_output": "3"}]
+        assert depth["pools"] == [{"course": "learnpython.org", "lesson": "Basic Operators", "language": "python",
+                                   "unserved": 0, "target": 1, "requests": 1}]
+    
+    @patch('db.store_problem', return_value=7)
+    @patch('problem_pool.request_refill')
+    @patch('generation.generate_problem')
+    def test_generate_miss_refills_after_generating(self, mock_generate_problem, mock_request_refill, mock_store_problem, client):
+        """Test that a lesson with an empty pool is only topped up once its own problem is generated"""
+        def generate_problem(course, lesson, language):
+            # Nothing else is generating for the lesson meanwhile
+            mock_request_refill.assert_not_called()
+            return generation.GenerationResult({"data": {"outputs": {
+                "Title": "Test Problem",
+                "Problem": "Add two numbers.",
+                "Testcases": json.dumps([{"input": "1 2", "expected_output": "3"}])
+            }}})
+        mock_generate_problem.side_effect = generate_problem
+        
+        with patch('problem_pool.PROBLEM_POOL_ENABLED', True):
+            response = client.post('/generate', json={"course": "learnpython.org", "lesson": "Basic Operators"})
+            mock_generate_problem.side_effect = generation.GenerationError("File upload failed")
+            failed = client.post('/generate', json={"course": "learnpython.org", "lesson": "Basic Operators"})
+        
+        assert response.status_code == 200
+        assert failed.status_code == 500
+        # Only the successful generation asked for a refill
+        mock_request_refill.assert_called_once_with("learnpython.org", "Basic Operators", "python")
+    
+    @patch('generation.generate_problem', side_effect=generation.GenerationError("File upload failed"))
+    def test_generate_problem_failure(self, mock_generate_problem, client):
+        """Test that a failed generation is reported with the service's error"""
+        response = client.post('/generate', json={"course": "learnpython.org", "lesson": "Basic Operators"})
+        
+        assert response.status_code == 500
+        assert response.json == {"error": "File upload failed"}
     
     @patch('check.check_code')
     def test_check_code_endpoint(self, mock_check_code, client, sample_problem):
@@ -178,6 +257,108 @@ class TestAPIEndpoints:
             assert data["results"][0]["status"] == "✅"
             assert data["success_rate"] == "2/2"
     
+    @staticmethod
+    def fake_check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+        """Yield the events of a two-testcase check that finishes out of order"""
+        yield {"event": "compile", "status": "skipped"}
+        yield {"event": "testcase", "index": 1, "result": {"input": inputs[1], "status": "✅"}}
+        yield {"event": "testcase", "index": 0, "result": {"input": inputs[0], "status": "❌"}}
+        yield {"event": "summary", "passed": 1, "total": 2, "success_rate": "1/2", "success": False}
+    
+    def test_check_code_streams_ndjson(self, client, sample_problem):
+        """Test that a streaming check emits one JSON event per line and stores the summary"""
+        with patch('check.check_events', side_effect=self.fake_check_events), \
+             patch('db.get_problem_by_id', return_value=sample_problem), \
+             patch('db.store_solution') as mock_store:
+            response = client.post('/check_code', json={
+                "code": "def add(a, b):\n    return a + b",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "problem_id": 1,
+                "language": "python",
+                "stream": "ndjson"
+            })
+            events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert [event["event"] for event in events] == ["compile", "testcase", "testcase", "summary"]
+        assert events[1]["index"] == 1
+        mock_store.assert_called_once_with(1, "python", "def add(a, b):\n    return a + b", 1, 2, "full")
+    
+    def test_check_code_streams_sse(self, client, sample_problem):
+        """Test that an event-stream client gets Server-Sent Events"""
+        with patch('check.check_events', side_effect=self.fake_check_events):
+            response = client.post('/check_code', json={
+                "code": "print(1)",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "language": "python"
+            }, headers={"Accept": "text/event-stream"})
+            body = response.get_data(as_text=True)
+        
+        assert response.mimetype == "text/event-stream"
+        assert body.startswith("event: compile\ndata: ")
+        assert body.count("event: testcase\n") == 2
+        assert "event: summary\n" in body
+    
+    def test_cached_check_is_not_stored_again(self, client, sample_problem):
+        """Test that a replayed check is marked cached and doesn't add another solution"""
+        def cached_check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+            for event in self.fake_check_events(code, inputs, expected_outputs, language):
+                yield {**event, "cached": True}
+        
+        with patch('check.check_events', side_effect=cached_check_events), \
+             patch('db.get_problem_by_id', return_value=sample_problem), \
+             patch('db.store_solution') as mock_store:
+            response = client.post('/check_code', json={
+                "code": "def add(a, b):\n    return a + b",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "problem_id": 1,
+                "language": "python"
+            })
+        
+        assert response.status_code == 200
+        assert response.json["cached"] is True
+        mock_store.assert_not_called()
+    
+    def test_check_code_stream_rejects_invalid_request(self, client):
+        """Test that validation errors come back as a normal JSON error"""
+        response = client.post('/check_code', json={"code": "", "testcases": [], "stream": True})
+        
+        assert response.status_code == 400
+        assert response.json["error"] == "No code provided"
+    
+    def test_check_code_forwards_mode(self, client, sample_problem):
+        """Test that the check mode reaches the checker and the stored solution"""
+        with patch('check.check_events', side_effect=self.fake_check_events) as mock_events, \
+             patch('db.get_problem_by_id', return_value=sample_problem), \
+             patch('db.store_solution') as mock_store:
+            response = client.post('/check_code', json={
+                "code": "def add(a, b):\n    return a + b",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "problem_id": 1,
+                "language": "python",
+                "mode": "fail_fast"
+            })
+            invalid = client.post('/check_code', json={"code": "x", "testcases": [{"input": "", "output": ""}], "mode": "quick"})
+        
+        assert response.status_code == 200
+        assert mock_events.call_args[0][4] == "fail_fast"
+        assert mock_store.call_args[0][5] == "fail_fast"
+        assert invalid.status_code == 400
+    
+    def test_capabilities_endpoint(self, client):
+        """Test that the toolchain registry is reported, and re-probed on request"""
+        report = {"tools": {"g++": {"available": True}}, "languages": {"cpp": {"run": True}}, "probed_at": 1.0}
+        with patch('capabilities.get_capabilities', return_value=report), \
+             patch('capabilities.probe_all') as mock_probe:
+            response = client.get('/capabilities')
+            refreshed = client.get('/capabilities?refresh=1')
+        
+        assert response.status_code == 200
+        assert response.json == report
+        assert refreshed.status_code == 200
+        assert mock_probe.call_count == 1
+    
     @patch('run.run_code')
     def test_run_code_endpoint(self, mock_run_code, client):
         """Test executing user code with specified input"""
@@ -199,6 +380,104 @@ class TestAPIEndpoints:
         assert data["stdout"] == "3"
         assert data["stderr"] == ""
     
+    def test_run_code_compile_error_payload(self, client):
+        """Test that a run that doesn't compile reports a verdict, position and usage like any other run"""
+        response = client.post('/run_code', json={
+            "code": "print(1 +\n",
+            "language": "python",
+            "stdin": ""
+        })
+        
+        assert response.status_code == 200
+        data = response.json
+        assert data["stderr"].startswith("Compilation error:\nsolution.py:1:")
+        assert data["verdict"] == "Compilation Error"
+        assert (data["line"], data["column"]) == (1, 6)
+        assert data["cpu_ms"] is None and data["wall_ms"] is None and data["max_rss_kb"] is None
+    
+    def test_check_job_runs_in_background(self, client, sample_problem):
+        """Test that a queued check returns a job ID and its result can be polled"""
+        import jobs
+        with patch('check.check_events', side_effect=self.fake_check_events), \
+             patch('jobs._queue', jobs.JobQueue()), \
+             patch('db.get_problem_by_id', return_value=sample_problem), \
+             patch('db.store_solution') as mock_store:
+            response = client.post('/jobs/check', json={
+                "code": "def add(a, b):\n    return a + b",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "problem_id": 1,
+                "language": "python"
+            })
+            assert response.status_code == 202
+            job_id = response.json["job_id"]
+            assert response.headers["Location"] == f"/jobs/{job_id}"
+            
+            # Following the job as a stream ends once it has finished
+            body = client.get(f'/jobs/{job_id}?stream=ndjson').get_data(as_text=True)
+            events = [json.loads(line) for line in body.splitlines()]
+            job = client.get(f'/jobs/{job_id}').json
+            jobs._queue.shutdown()
+        
+        assert [event["event"] for event in events] == ["compile", "testcase", "testcase", "summary", "job"]
+        assert job["status"] == "done"
+        assert job["result"]["success_rate"] == "1/2"
+        assert [result["status"] for result in job["result"]["results"]] == ["❌", "✅"]
+        assert len(job["events"]) == 4
+        mock_store.assert_called_once_with(1, "python", "def add(a, b):\n    return a + b", 1, 2, "full")
+    
+    def test_check_job_that_could_not_compile_stores_nothing(self, client, sample_problem):
+        """Test that a queued check the host was too busy to compile fails without storing an attempt"""
+        import jobs
+        def busy_check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+            yield {"event": "compile", "status": "failed", "error": "Server is busy"}
+            yield {"event": "testcase", "index": 0, "result": {"status": "❗", "verdict": "Internal Error"}}
+            yield {"event": "summary", "passed": 0, "total": 1, "success_rate": "0/1", "success": False}
+        
+        with patch('check.check_events', side_effect=busy_check_events), \
+             patch('jobs._queue', jobs.JobQueue()), \
+             patch('db.get_problem_by_id', return_value=sample_problem), \
+             patch('db.store_solution') as mock_store:
+            job_id = client.post('/jobs/check', json={
+                "code": "def add(a, b):\n    return a + b",
+                "testcases": json.loads(sample_problem["testcases"]),
+                "problem_id": 1,
+                "language": "python"
+            }).json["job_id"]
+            client.get(f'/jobs/{job_id}?stream=ndjson').get_data(as_text=True)
+            job = client.get(f'/jobs/{job_id}').json
+            jobs._queue.shutdown()
+        
+        assert job["status"] == "failed"
+        assert job["error"] == "Server is busy"
+        assert job["result"]["results"][0]["verdict"] == "Internal Error"
+        mock_store.assert_not_called()
+    
+    def test_run_job_refused_when_queue_is_full(self, client):
+        """Test that a saturated queue answers 429 with Retry-After"""
+        import jobs
+        with patch('jobs.submit_run', side_effect=jobs.QueueFullError("python", 3)):
+            response = client.post('/jobs/run', json={"code": "print(1)", "language": "python"})
+        
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3"
+        assert response.json["retry_after"] == 3
+    
+    def test_run_job_accepts_registered_languages(self, client):
+        """Test that /jobs/run accepts whatever languages the executor has plugins for"""
+        with patch('executor.supported_languages', return_value=["python", "ruby"]), \
+             patch('jobs.submit_run', return_value="job-1") as mock_submit:
+            response = client.post('/jobs/run', json={"code": "puts 1", "language": "ruby"})
+        
+        assert response.status_code == 202
+        mock_submit.assert_called_once_with("puts 1", "", "ruby")
+    
+    def test_job_endpoints_reject_invalid_requests(self, client):
+        """Test that invalid job requests and unknown jobs are rejected"""
+        assert client.post('/jobs/run', json={"code": "", "language": "python"}).status_code == 400
+        assert client.post('/jobs/run', json={"code": "x", "language": "cobol"}).status_code == 400
+        assert client.post('/jobs/check', json={"code": "x", "testcases": []}).status_code == 400
+        assert client.get('/jobs/does-not-exist').status_code == 404
+    
     @patch('db.get_problems')
     def test_get_problems_endpoint(self, mock_get_problems, client):
         """Test retrieving all problems"""
@@ -10,6 +10,9 @@ import pytest
 import json
 from unittest.mock import patch, MagicMock
 
+# A prelude precompiling in the background would run g++ in the middle of other tests
+os.environ.setdefault('CPP_PRELUDE_WARM_UP', 'false')
+
 import db
 from app import app as flask_app
 
@@ -88,3 +91,26 @@ def mock_github_fetcher():
     mock_fetcher.get_json_content.return_value = {"key": "value"}
     
     return mock_fetcher
+
+@pytest.fixture(scope="function")
+def compile_cache_dir(tmp_path):
+    """Point the compiled-artifact cache at a throwaway directory"""
+    import compile_cache
+    cache_dir = str(tmp_path / "compile_cache")
+    with patch.multiple(
+        compile_cache,
+        CACHE_DIR=cache_dir,
+        ENTRIES_DIR=os.path.join(cache_dir, "entries"),
+        BUILD_DIR=os.path.join(cache_dir, "build"),
+        LOCK_PATH=os.path.join(cache_dir, "cache.lock"),
+        STATS_PATH=os.path.join(cache_dir, "stats.json"),
+        PCH_DIR=os.path.join(cache_dir, "pch"),
+    ), patch('compile_cache.compiler_version', return_value="test-compiler 1.0"), \
+       patch.dict(compile_cache._preludes, clear=True):
+        yield cache_dir
+
+@pytest.fixture(autouse=True)
+def result_cache_disabled():
+    """Keep checks from reusing each other's results; cache tests turn it back on"""
+    with patch('result_cache.RESULT_CACHE_ENABLED', False):
+        yield
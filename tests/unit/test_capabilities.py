@@ -0,0 +1,84 @@
+"""
+Unit tests for the toolchain registry in capabilities.py
+"""
+
+import subprocess
+import flask
+import pytest
+from unittest.mock import patch
+
+import capabilities
+import style_check
+
+class TestCapabilities:
+    """Test that toolchains are probed once and reported from the registry"""
+
+    @pytest.fixture(autouse=True)
+    def empty_registry(self):
+        """Start every test with nothing probed"""
+        with patch.dict(capabilities._tools, clear=True):
+            yield
+
+    def test_missing_tool_is_not_run(self):
+        """Test that a tool that isn't on the PATH is reported without spawning it"""
+        with patch('shutil.which', return_value=None), \
+             patch('subprocess.run') as mock_run:
+            capability = capabilities.probe("pmd")
+
+        mock_run.assert_not_called()
+        assert capability == {"available": False, "version": None, "path": None, "kind": "linter"}
+
+    def test_version_read_from_stderr(self):
+        """Test that tools printing their version to stderr are still recognised"""
+        banner = subprocess.CompletedProcess(["javac"], 0, "", "javac 17.0.2\n")
+        with patch('shutil.which', return_value="/usr/bin/javac"), \
+             patch('subprocess.run', return_value=banner):
+            capability = capabilities.probe("javac")
+
+        assert capability["available"] is True
+        assert capability["version"] == "javac 17.0.2"
+
+    def test_tool_probed_once(self):
+        """Test that repeated lookups are answered from the registry"""
+        banner = subprocess.CompletedProcess(["flake8"], 0, "7.0.0 (pyflakes 3.2.0)\n", "")
+        with patch('shutil.which', return_value="/usr/bin/flake8"), \
+             patch('subprocess.run', return_value=banner) as mock_run:
+            assert capabilities.is_available("flake8")
+            assert capabilities.is_available("flake8")
+
+        assert mock_run.call_count == 1
+
+    def test_languages_report_their_features(self):
+        """Test that a language feature is available only when all its tools are"""
+        installed = {"python3", "g++", "clang-format"}
+        fake_probe = lambda name: {"available": name in installed, "version": None, "path": None, "kind": "linter"}
+        with patch('capabilities.probe', side_effect=fake_probe):
+            capabilities.probe_all()
+            report = capabilities.get_capabilities()
+
+        assert report["languages"]["python"] == {"run": True, "style_check": False}
+        assert report["languages"]["java"]["run"] is False
+        assert report["languages"]["cpp"] == {"run": True, "style_check": False, "format": True}
+        assert report["probed_at"] is not None
+
+    def test_python_linters_probed_as_modules(self):
+        """Test that Python's style check is reported from its in-process linters, not the flake8 command"""
+        with patch('shutil.which', return_value=None), \
+             patch('subprocess.run') as mock_run:
+            capability = capabilities.probe("pycodestyle")
+            report = capabilities.get_capabilities()
+
+        mock_run.assert_not_called()
+        assert capability["available"] is (style_check.pycodestyle is not None)
+        assert report["tools"]["flake8"]["available"] is False
+        assert report["languages"]["python"]["style_check"] is style_check.PYTHON_LINT_IN_PROCESS
+
+    def test_style_check_spawns_no_probe(self):
+        """Test that a style check without its linter falls back without running anything"""
+        capabilities._tools["clang-tidy"] = {"available": False, "version": None, "path": None, "kind": "linter"}
+        app = flask.Flask(__name__)
+        with app.app_context(), patch('subprocess.run') as mock_run:
+            response = style_check.check_style("int main() {}\n", "cpp")
+
+        mock_run.assert_not_called()
+        assert "Fallback" in response.get_json()["linter"]
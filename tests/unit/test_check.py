@@ -0,0 +1,272 @@
+"""
+Unit tests for the code checker in check.py
+"""
+
+import json
+import time
+import subprocess
+import pytest
+import flask
+from unittest.mock import patch, MagicMock
+
+import host_limits
+import process_runner
+from check import check_code, check_events
+
+class TestCheckCode:
+    """Test how check_code prepares submissions and runs testcases"""
+    
+    @pytest.fixture
+    def app_context(self):
+        """Provide a Flask application context for jsonify"""
+        app = flask.Flask(__name__)
+        with app.app_context():
+            yield
+    
+    @pytest.fixture
+    def testcases(self):
+        """Three simple addition testcases"""
+        return [
+            {"input": "1 2", "output": "3"},
+            {"input": "5 5", "output": "10"},
+            {"input": "0 0", "output": "0"}
+        ]
+    
+    def test_java_compiles_once_for_all_testcases(self, app_context, compile_cache_dir, testcases):
+        """Test that a Java submission is compiled once and run per testcase"""
+        outputs = {tc["input"]: tc["output"] for tc in testcases}
+        
+        def fake_run_process(command, stdin, timeout, **kwargs):
+            return subprocess.CompletedProcess(command, 0, outputs[stdin], "")
+        
+        with patch('subprocess.run', return_value=MagicMock(returncode=0, stdout="", stderr="")) as mock_compile, \
+             patch('process_runner.run_process', side_effect=fake_run_process) as mock_run, \
+             patch('javac_server.JAVAC_SERVER_ENABLED', False), \
+             patch('jvm_runner.JVM_RUNNER_ENABLED', False):
+            result = check_code("public class Main {}", testcases, "java")
+        
+        assert [call[0][0][0] for call in mock_compile.call_args_list] == ["javac"]
+        assert [call[0][0][0] for call in mock_run.call_args_list] == ["java"] * len(testcases)
+        
+        result_data = json.loads(result.get_data(as_text=True))
+        assert result_data["passed"] == len(testcases)
+    
+    def test_compile_error_returned_before_any_testcase(self, app_context, compile_cache_dir, testcases):
+        """Test that a compile error is reported once and nothing is executed"""
+        compile_process = MagicMock(returncode=1, stdout="", stderr="solution.cpp:1: error")
+        
+        with patch('subprocess.run', return_value=compile_process) as mock_run:
+            result = check_code("int main() {", testcases, "cpp")
+        
+        assert mock_run.call_count == 1
+        result_data = json.loads(result.get_data(as_text=True))
+        assert result_data["total"] == 1
+        assert result_data["results"][0]["error"].startswith("Compilation error")
+        assert result_data["results"][0]["line"] == 1
+
+    def test_host_failure_while_compiling_is_an_internal_error(self, app_context, testcases):
+        """Test that a busy host is a 503 Internal Error rather than the submission's Compilation Error"""
+        busy = host_limits.HostBusyError("Server is busy running other submissions, please try again")
+        with patch('executor.prepare', side_effect=busy):
+            result = check_code("int main() {}", testcases, "cpp")
+        
+        assert result.status_code == 503
+        result_data = json.loads(result.get_data(as_text=True))
+        assert result_data["total"] == 1
+        assert result_data["results"][0]["verdict"] == "Internal Error"
+
+    def test_python_syntax_error_runs_nothing(self, app_context, testcases):
+        """Test that a Python syntax error is one compilation error with its position"""
+        with patch('python_pool.run_python') as mock_run, \
+             patch('python_pool.run_python_batch') as mock_batch:
+            result = check_code("x = 1\nprint(x +)\n", testcases, "python")
+
+        mock_run.assert_not_called()
+        mock_batch.assert_not_called()
+        result_data = json.loads(result.get_data(as_text=True))
+        assert result_data["total"] == 1
+        assert result_data["results"][0]["verdict"] == "Compilation Error"
+        assert result_data["results"][0]["user_output"].startswith("solution.py:2:")
+        assert result_data["results"][0]["line"] == 2
+        assert result_data["results"][0]["column"] is not None
+
+    def test_timeout_reported_per_testcase(self, app_context, testcases):
+        """Test that a timed out run only fails its own testcase"""
+        def fake_run_python(code, stdin, **kwargs):
+            if stdin == "5 5":
+                raise subprocess.TimeoutExpired("python3", 2)
+            return subprocess.CompletedProcess(["python3"], 0, str(sum(map(int, stdin.split()))), "")
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python), \
+             patch('executor.python.BATCH_ENABLED', False):
+            result = check_code("print(sum(map(int, input().split())))", testcases, "python")
+        
+        result_data = json.loads(result.get_data(as_text=True))
+        assert [r["status"] for r in result_data["results"]] == ["✅", "⌛", "✅"]
+    
+    def test_parallel_results_keep_testcase_order(self, app_context):
+        """Test that testcases finishing out of order are reported in input order"""
+        testcases = [{"input": str(delay), "output": str(delay)} for delay in (0.2, 0.0, 0.1, 0.05)]
+        
+        def fake_run_python(code, stdin, **kwargs):
+            time.sleep(float(stdin))
+            return subprocess.CompletedProcess(["python3"], 0, stdin, "")
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python), \
+             patch('executor.python.BATCH_ENABLED', False):
+            result = check_code("print(input())", testcases, "python")
+        
+        result_data = json.loads(result.get_data(as_text=True))
+        assert [r["input"] for r in result_data["results"]] == [tc["input"] for tc in testcases]
+        assert result_data["passed"] == len(testcases)
+    
+    def test_python_batch_results_used_and_gaps_rerun(self, app_context, testcases):
+        """Test that batched outcomes are used and unanswered testcases run on their own"""
+        batch = [
+            subprocess.CompletedProcess(["python3"], 0, "3\n", ""),
+            None,
+            subprocess.TimeoutExpired(["python3"], 2)
+        ]
+        single = subprocess.CompletedProcess(["python3"], 0, "10\n", "")
+        
+        with patch('python_pool.run_python_batch', return_value=batch) as mock_batch, \
+             patch('python_pool.run_python', return_value=single) as mock_run:
+            result = check_code("print(sum(map(int, input().split())))", testcases, "python")
+        
+        assert mock_batch.call_args[0][1] == [tc["input"] for tc in testcases]
+        assert [call[0][1] for call in mock_run.call_args_list] == [testcases[1]["input"]]
+        result_data = json.loads(result.get_data(as_text=True))
+        assert [r["status"] for r in result_data["results"]] == ["✅", "✅", "⌛"]
+    
+    def test_results_carry_usage_and_verdicts(self, app_context, testcases):
+        """Test that each result reports resource usage and a verdict, including memory limits"""
+        def fake_run_python(code, stdin, **kwargs):
+            if stdin == "5 5":
+                return process_runner.RunResult(["python3"], 1, "", "MemoryError", cpu_ms=3.0, wall_ms=4.0, max_rss_kb=9000)
+            return process_runner.RunResult(["python3"], 0, "3" if stdin == "1 2" else "1", "", cpu_ms=1.0, wall_ms=2.0, max_rss_kb=8000)
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python), \
+             patch('executor.python.BATCH_ENABLED', False):
+            result = check_code("print(sum(map(int, input().split())))", testcases, "python")
+        
+        results = json.loads(result.get_data(as_text=True))["results"]
+        assert [r["verdict"] for r in results] == ["Accepted", "Memory Limit Exceeded", "Wrong Answer"]
+        assert results[1]["status"] == "❌"
+        assert results[0]["cpu_ms"] == 1.0
+        assert results[0]["wall_ms"] == 2.0
+        assert results[1]["max_rss_kb"] == 9000
+    
+    def test_output_limit_verdict_and_display_cap(self, app_context, testcases):
+        """Test that runaway output gets its own verdict and long output is cut for display"""
+        def fake_run_python(code, stdin, **kwargs):
+            if stdin == "1 2":
+                return process_runner.RunResult(["python3"], -9, "y" * 4096, "", output_limit_exceeded=True)
+            return process_runner.RunResult(["python3"], 0, "z" * 4096, "")
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python), \
+             patch('executor.python.BATCH_ENABLED', False), \
+             patch('process_runner.DISPLAY_LIMIT_BYTES', 1024):
+            result = check_code("print(input())", testcases, "python")
+        
+        results = json.loads(result.get_data(as_text=True))["results"]
+        assert results[0]["verdict"] == "Output Limit Exceeded"
+        assert results[1]["verdict"] == "Wrong Answer"
+        assert results[1]["user_output"].endswith("[output truncated after 1 KB]")
+        assert len(results[1]["user_output"]) < 1100
+    
+    def test_check_events_report_compile_testcases_then_summary(self, testcases):
+        """Test that check_events yields every testcase between the compile status and the summary"""
+        def fake_run_python(code, stdin, **kwargs):
+            return subprocess.CompletedProcess(["python3"], 0, str(sum(map(int, stdin.split()))), "")
+        
+        inputs = [tc["input"] for tc in testcases]
+        expected_outputs = [tc["output"] for tc in testcases]
+        with patch('python_pool.run_python', side_effect=fake_run_python), \
+             patch('executor.python.BATCH_ENABLED', False):
+            events = list(check_events("print(sum(map(int, input().split())))", inputs, expected_outputs, "python"))
+        
+        assert events[0] == {"event": "compile", "status": "skipped"}
+        assert sorted(event["index"] for event in events[1:-1]) == [0, 1, 2]
+        assert events[-1] == {"event": "summary", "passed": 3, "total": 3, "success_rate": "3/3", "success": True}
+    
+    def test_fail_fast_skips_testcases_after_a_failure(self, app_context, testcases):
+        """Test that fail_fast starts no testcase after the first failure"""
+        def fake_run_python(code, stdin, **kwargs):
+            return subprocess.CompletedProcess(["python3"], 0, "wrong", "")
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python) as mock_run, \
+             patch('executor.python.BATCH_ENABLED', False), \
+             patch('check.CHECK_PARALLELISM', 1):
+            result = check_code("print('wrong')", testcases, "python", mode="fail_fast")
+        
+        result_data = json.loads(result.get_data(as_text=True))
+        assert mock_run.call_count == 1
+        assert [r["verdict"] for r in result_data["results"]] == ["Wrong Answer", "Skipped", "Skipped"]
+        assert result_data["total"] == 3
+        assert result_data["success"] is False
+    
+    def test_fail_fast_skips_batched_testcases_after_a_failure(self, app_context, testcases):
+        """Test that fail_fast reports the testcases after the first failure as skipped when Python runs them as a batch"""
+        batch = [
+            subprocess.CompletedProcess(["python3"], 0, "wrong\n", ""),
+            subprocess.CompletedProcess(["python3"], 0, "10\n", ""),
+            subprocess.CompletedProcess(["python3"], 0, "0\n", "")
+        ]
+        
+        with patch('python_pool.run_python_batch', return_value=batch), \
+             patch('python_pool.run_python') as mock_run:
+            result = check_code("print(sum(map(int, input().split())))", testcases, "python", mode="fail_fast")
+        
+        mock_run.assert_not_called()
+        result_data = json.loads(result.get_data(as_text=True))
+        assert [r["verdict"] for r in result_data["results"]] == ["Wrong Answer", "Skipped", "Skipped"]
+    
+    def test_sample_mode_runs_the_rest_only_after_the_sample_passes(self, app_context, testcases):
+        """Test that sample mode runs the sample first and stops there when it fails"""
+        def fake_run_python(code, stdin, **kwargs):
+            return subprocess.CompletedProcess(["python3"], 0, str(sum(map(int, stdin.split()))), "")
+        
+        with patch('python_pool.run_python', side_effect=fake_run_python) as mock_run, \
+             patch('executor.python.BATCH_ENABLED', False), \
+             patch('check.CHECK_SAMPLE_SIZE', 1):
+            passing = json.loads(check_code("print(sum(map(int, input().split())))", testcases, "python", mode="sample").get_data(as_text=True))
+            assert mock_run.call_count == 3
+            
+            testcases[0]["output"] = "4"
+            failing = json.loads(check_code("print(sum(map(int, input().split())))", testcases, "python", mode="sample").get_data(as_text=True))
+            assert mock_run.call_count == 4
+        
+        assert passing["passed"] == 3
+        assert [r["verdict"] for r in failing["results"]] == ["Wrong Answer", "Skipped", "Skipped"]
+    
+    def test_unknown_mode_is_rejected(self, app_context, testcases):
+        """Test that an unsupported mode is a 400 before anything runs"""
+        response, status = check_code("print(1)", testcases, "python", mode="quick")
+        
+        assert status == 400
+        assert json.loads(response.get_data(as_text=True))["error"] == "Unsupported mode: quick"
+    
+    def test_float_comparison_accepts_rounding(self, app_context):
+        """Test that the float compare mode accepts output within the tolerance"""
+        testcases = [{"input": "1 3", "output": "0.333333"}]
+        
+        with patch('python_pool.run_python', return_value=subprocess.CompletedProcess(["python3"], 0, "0.3333333333333333\n", "")):
+            lines = json.loads(check_code("print(1 / 3)", testcases, "python").get_data(as_text=True))
+            floats = json.loads(check_code("print(1 / 3)", testcases, "python", compare="float").get_data(as_text=True))
+        
+        assert lines["results"][0]["verdict"] == "Wrong Answer"
+        assert lines["results"][0]["diff"].startswith("First difference at line 1")
+        assert floats["results"][0]["verdict"] == "Accepted"
+    
+    def test_leading_spaces_of_the_first_line_are_compared(self, app_context):
+        """Test that a pyramid whose first line starts with spaces is accepted, and one without them isn't"""
+        pyramid = "  *\n ***\n*****"
+        testcases = [{"input": "3", "output": pyramid}]
+        
+        with patch('python_pool.run_python', return_value=subprocess.CompletedProcess(["python3"], 0, pyramid + "\n", "")):
+            right = json.loads(check_code("print(pyramid)", testcases, "python").get_data(as_text=True))
+        with patch('python_pool.run_python', return_value=subprocess.CompletedProcess(["python3"], 0, "*\n ***\n*****\n", "")):
+            wrong = json.loads(check_code("print(flat)", testcases, "python").get_data(as_text=True))
+        
+        assert right["results"][0]["verdict"] == "Accepted"
+        assert wrong["results"][0]["verdict"] == "Wrong Answer"
@@ -0,0 +1,63 @@
+"""
+Unit tests for output comparison in comparator.py
+"""
+
+import pytest
+
+import comparator
+
+class TestComparator:
+    """Test each compare mode and the windowed diff"""
+
+    @pytest.mark.parametrize("expected,actual", [
+        ("1\n2\n3", "1\n2\n3"),
+        ("1\n2\n3", "1  \n2\r\n3\n\n"),
+        ("1\n2", "\n\n1\n2"),
+    ])
+    def test_lines_ignore_trailing_whitespace_and_edge_blank_lines(self, expected, actual):
+        """Test that the default mode matches what the checker always accepted"""
+        assert comparator.first_mismatch(expected, actual) is None
+
+    def test_lines_report_first_difference(self):
+        """Test that inner blank lines and changed lines are differences"""
+        assert comparator.first_mismatch("1\n2\n3", "1\n\n2\n3") == (2, 2)
+        assert comparator.first_mismatch("1\n2\n3", "1\n2") == (3, None)
+        assert comparator.first_mismatch("1\n2", "1\n2\n3") == (None, 3)
+
+    def test_whitespace_and_token_modes(self):
+        """Test that whitespace only matters as far as each mode says"""
+        assert comparator.first_mismatch("1 2\n3", "1   2\n3", "lines") == (1, 1)
+        assert comparator.first_mismatch("1 2\n3", "1   2\n3", "whitespace") is None
+        assert comparator.first_mismatch("1 2\n3", "1\n2 3", "whitespace") == (1, 1)
+        assert comparator.first_mismatch("1 2\n3", "1\n2 3", "tokens") is None
+
+    def test_float_mode_tolerates_rounding(self):
+        """Test that numbers only have to be close and other tokens still match exactly"""
+        assert comparator.first_mismatch("0.333333 2", "0.3333333333 2.0", "float") is None
+        assert comparator.first_mismatch("1e9", "1000000001", "float") is None
+        assert comparator.first_mismatch("0.5", "0.51", "float") == (1, 1)
+        assert comparator.first_mismatch("yes 1", "Yes 1", "float") == (1, 1)
+        assert comparator.first_mismatch("10", "1_0", "float") == (1, 1)
+        assert comparator.first_mismatch("0.5", "0.51", "float", abs_tol=0.1) is None
+
+    def test_diff_shows_a_capped_window(self):
+        """Test that the diff only shows lines around the first difference"""
+        expected = "\n".join(str(i) for i in range(1, 10001))
+        actual = expected.replace("\n5000\n", "\n" + "x" * 1000 + "\n")
+
+        mismatch = comparator.first_mismatch(expected, actual)
+        text = comparator.diff(expected, actual, mismatch)
+
+        assert mismatch == (5000, 5000)
+        assert text.startswith("First difference at line 5000")
+        assert "> 5000 | 5000" in text
+        assert "4998 | 4998" in text and "4997 |" not in text
+        assert "x" * comparator.DIFF_LINE_CHARS + "..." in text
+        assert len(text) < 1000
+
+    def test_diff_of_missing_output(self):
+        """Test that output ending early is described as such"""
+        text = comparator.diff("a\nb", "a", comparator.first_mismatch("a\nb", "a"))
+
+        assert text.startswith("Output ended before line 2")
+        assert text.endswith("Got:\n(no more output)")
@@ -0,0 +1,159 @@
+"""
+Unit tests for the compiled-artifact cache
+"""
+
+import os
+import time
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+
+import compile_cache
+
+class TestCompileCache:
+    """Test content addressing, hit/miss accounting and LRU eviction"""
+    
+    @staticmethod
+    def fake_build(calls, payload=b"binary"):
+        """Create a build callable that records how often it was invoked"""
+        def build(build_dir):
+            calls.append(build_dir)
+            with open(os.path.join(build_dir, "solution"), "wb") as f:
+                f.write(payload)
+            return {"executable": "solution"}, None
+        return build
+    
+    def test_key_depends_on_source_flags_and_compiler(self, compile_cache_dir):
+        """Test that every input to the compiler changes the cache key"""
+        base = compile_cache.cache_key("cpp", "int main() {}", "g++", ["-std=c++17"])
+        assert base == compile_cache.cache_key("cpp", "int main() {}", "g++", ["-std=c++17"])
+        assert base != compile_cache.cache_key("cpp", "int main() { }", "g++", ["-std=c++17"])
+        assert base != compile_cache.cache_key("cpp", "int main() {}", "g++", ["-std=c++17", "-O1"])
+        
+        with patch('compile_cache.compiler_version', return_value="test-compiler 2.0"):
+            assert base != compile_cache.cache_key("cpp", "int main() {}", "g++", ["-std=c++17"])
+    
+    def test_hit_skips_compilation(self, compile_cache_dir):
+        """Test that the second lookup of the same source doesn't rebuild"""
+        calls = []
+        first = compile_cache.get_or_compile("cpp", "int main() {}", "g++", [], self.fake_build(calls))
+        second = compile_cache.get_or_compile("cpp", "int main() {}", "g++", [], self.fake_build(calls))
+        
+        assert len(calls) == 1
+        assert first[0] == second[0]
+        assert os.path.exists(os.path.join(second[0], "solution"))
+        
+        stats = compile_cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+    
+    def test_compile_errors_are_not_cached(self, compile_cache_dir):
+        """Test that a failed build is reported and retried on the next lookup"""
+        def failing_build(build_dir):
+            return None, "solution.cpp:1: error: expected ';'"
+        
+        for _ in range(2):
+            artifact_dir, meta, error = compile_cache.get_or_compile("cpp", "int main(", "g++", [], failing_build)
+            assert artifact_dir is None
+            assert "error" in error
+        
+        assert compile_cache.get_stats()["entries"] == 0
+        assert os.listdir(compile_cache.BUILD_DIR) == []
+    
+    def test_evicts_least_recently_used(self, compile_cache_dir):
+        """Test that eviction removes the oldest entries first once over budget"""
+        calls = []
+        old_dir, _, _ = compile_cache.get_or_compile("cpp", "old", "g++", [], self.fake_build(calls, b"x" * 600))
+        
+        # Age the first entry past the grace period
+        stale = time.time() - compile_cache.EVICTION_GRACE_SECONDS * 2
+        os.utime(old_dir, (stale, stale))
+        
+        with patch('compile_cache.CACHE_MAX_BYTES', 1000):
+            new_dir, _, _ = compile_cache.get_or_compile("cpp", "new", "g++", [], self.fake_build(calls, b"x" * 600))
+        
+        assert not os.path.exists(old_dir)
+        assert os.path.exists(new_dir)
+        assert compile_cache.get_stats()["evictions"] == 1
+    
+    @pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+    def test_compile_cpp_runs_from_cache(self, compile_cache_dir):
+        """Test compiling a real C++ program and getting a runnable command back"""
+        run_command, error = compile_cache.compile_cpp("int main() { return 0; }")
+        
+        assert error is None
+        assert os.access(run_command[0], os.X_OK)
+        assert compile_cache.compile_cpp("int main() { return 0; }")[0] == run_command
+    
+    @pytest.mark.parametrize("code, covered", [
+        ("#include <iostream>\n#include <vector>\nint main() {}", True),
+        ("#include<string>\nint main() {}", True),
+        ("int main() {}", False),
+        ("#include <bits/stdc++.h>\nint main() {}", False),
+        ('#include "helpers.h"\nint main() {}', False),
+        ("#define _GLIBCXX_DEBUG\n#include <vector>\nint main() {}", False),
+        ("#include <vector>\n#define N 100\nint main() {}", True),
+    ])
+    def test_prelude_covers_standard_includes(self, code, covered):
+        """Test that the prelude is only used for submissions whose includes it provides"""
+        assert compile_cache.prelude_covers(code) is covered
+    
+    def test_profiles_are_cached_separately(self, compile_cache_dir):
+        """Test that Run and Check builds of the same source use their own flags"""
+        commands = []
+        def fake_gpp(command, **kwargs):
+            commands.append(command)
+            open(command[-1], 'wb').close()
+            return subprocess.CompletedProcess(command, 0, "", "")
+        
+        with patch('subprocess.run', side_effect=fake_gpp):
+            run_binary = compile_cache.compile_cpp("int main() {}", profile="run")[0]
+            check_binary = compile_cache.compile_cpp("int main() {}", profile="check")[0]
+        
+        assert run_binary != check_binary
+        assert "-O0" in commands[0] and "-O1" in commands[1]
+    
+    @pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+    def test_prelude_is_precompiled_and_used(self, compile_cache_dir):
+        """Test that a covered submission compiles against the precompiled prelude"""
+        code = "#include <iostream>\nint main() { std::cout << 42; }"
+        # Nothing is precompiled inside a request; warm_up() does it in the background
+        assert compile_cache.cpp_prelude(compile_cache.CPP_FLAGS + compile_cache.CPP_PROFILES["run"]) is None
+        compile_cache.build_cpp_prelude(compile_cache.CPP_FLAGS + compile_cache.CPP_PROFILES["run"])
+        with patch('subprocess.run', wraps=subprocess.run) as mock_run:
+            run_command, error = compile_cache.compile_cpp(code, profile="run")
+        
+        assert error is None
+        assert subprocess.run(run_command, capture_output=True, text=True).stdout == "42"
+        assert any(name.endswith(".gch") for _, _, files in os.walk(compile_cache.PCH_DIR) for name in files)
+        assert "-include" in mock_run.call_args[0][0]
+    
+    @pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+    def test_prelude_name_clash_falls_back(self, compile_cache_dir):
+        """Test that names the prelude adds don't break a submission that compiles on its own"""
+        code = (
+            "#include <iostream>\n"
+            "using namespace std;\n"
+            "int count = 0;\n"
+            "int main() { count++; cout << count; }"
+        )
+        compile_cache.build_cpp_prelude(compile_cache.CPP_FLAGS + compile_cache.CPP_PROFILES["run"])
+        with patch('subprocess.run', wraps=subprocess.run) as mock_run:
+            run_command, error = compile_cache.compile_cpp(code, profile="run")
+        
+        assert error is None
+        assert subprocess.run(run_command, capture_output=True, text=True).stdout == "1"
+        assert mock_run.call_count == 2
+    
+    @pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+    def test_submission_error_is_not_compiled_twice(self, compile_cache_dir):
+        """Test that an error in the submission's own code doesn't retry without the prelude"""
+        compile_cache.build_cpp_prelude(compile_cache.CPP_FLAGS + compile_cache.CPP_PROFILES["run"])
+        with patch('subprocess.run', wraps=subprocess.run) as mock_run:
+            run_command, error = compile_cache.compile_cpp("#include <iostream>\nint main() { int x = ; }", profile="run")
+        
+        assert run_command is None
+        assert error.startswith("solution.cpp:")
+        assert mock_run.call_count == 1
@@ -47,6 +47,18 @@ class TestDatabaseOperations:
         # Close the connection
         conn.close()
     
+    def test_solution_records_check_mode(self, temp_db_path):
+        """Test that stored solutions record their check mode, defaulting to full"""
+        import db
+        with patch('db.DB_PATH', temp_db_path):
+            db.init_db()
+            db.store_solution(1, "python", "print(1)", 1, 3, "fail_fast")
+            db.store_solution(1, "python", "print(1)", 3, 3)
+            
+            modes = sorted(s["mode"] for s in db.get_solutions_for_problem(1))
+        
+        assert modes == ["fail_fast", "full"]
+    
     @patch('db.get_db_connection')
     def test_problem_storage(self, mock_get_conn, temp_db_path):
         """Test storing and retrieving problems"""
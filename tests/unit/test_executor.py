@@ -0,0 +1,81 @@
+"""
+Unit tests for the execution engine and its language plugins
+"""
+
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+
+import executor
+from executor.base import Language, Program
+
+class TestExecutor:
+    """Test how submissions are prepared and run through language plugins"""
+
+    def test_registers_supported_languages(self):
+        """Test that every supported language has a plugin"""
+        assert set(executor.supported_languages()) == {"python", "java", "cpp"}
+        assert executor.get_language("ruby") is None
+
+    def test_unsupported_language_is_refused(self):
+        """Test that preparing a submission in an unknown language raises"""
+        with pytest.raises(executor.SubmissionError):
+            executor.prepare("puts 1", "ruby", profile="run")
+
+    def test_java_needs_a_class_to_run(self):
+        """Test that Java code without a public or Main class is refused"""
+        java = executor.get_language("java")
+
+        assert java.prepare("public class Solver {}") == {"class_name": "Solver"}
+        assert java.prepare("class Main {}") == {"class_name": "Main"}
+        with pytest.raises(executor.SubmissionError):
+            java.prepare("class Helper {}")
+
+    def test_compile_timeout_becomes_compile_error(self, compile_cache_dir):
+        """Test that a compiler that hangs is reported as a compilation error"""
+        with patch('subprocess.run', side_effect=subprocess.TimeoutExpired("g++", 5)):
+            program, error = executor.prepare("int main() {}", "cpp", profile="run")
+
+        assert program is None
+        assert error == executor.COMPILE_TIMEOUT_MESSAGE
+
+    def test_program_runs_in_a_workspace(self):
+        """Test that a run goes through its plugin with a private working directory"""
+        completed = subprocess.CompletedProcess(["python"], 0, "3\n", "")
+        program, error = executor.prepare("print(1 + 2)", "python", profile="run")
+
+        with patch('python_pool.run_python', return_value=completed) as mock_run:
+            assert program.run("", timeout=5) is completed
+
+        assert error is None
+        assert mock_run.call_args.kwargs["timeout"] == 5
+        assert mock_run.call_args.kwargs["cwd"]
+
+    def test_run_batch_falls_back_without_batch_mode(self):
+        """Test that a language without a batch hook leaves every input to run()"""
+        class Plain(Language):
+            name = "plain"
+            run = MagicMock()
+
+        program = Program(Plain(), "code", {})
+
+        assert program.run_batch(["1", "2"], timeout=2) == [None, None]
+        Plain.run.assert_not_called()
+
+    def test_python_batch_can_be_disabled(self):
+        """Test that Python hands every input back when batching is off"""
+        program, _ = executor.prepare("print(input())", "python", profile="check")
+
+        with patch('executor.python.BATCH_ENABLED', False), \
+             patch('python_pool.run_python_batch') as mock_batch:
+            assert program.run_batch(["1", "2"], timeout=2) == [None, None]
+
+        mock_batch.assert_not_called()
+
+    def test_python_syntax_error_is_a_compile_error(self):
+        """Test that broken Python fails in prepare() with the error's position"""
+        program, error = executor.prepare("def f(:\n    pass\n", "python", profile="run")
+
+        assert program is None
+        assert error.startswith("solution.py:1:7: error:")
+        assert error.splitlines()[-1].strip() == "^"
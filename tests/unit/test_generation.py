@@ -0,0 +1,152 @@
+"""
+Unit tests for the problem generation service in generation.py
+"""
+
+import os
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+import db
+import generation
+
+class TestGeneration:
+    """Test that problems are generated in-process from a syllabus upload and a workflow run"""
+
+    @pytest.fixture(autouse=True)
+    def api_key(self):
+        """Provide an API key without a .env file"""
+        with patch.dict(os.environ, {"PROBLEM_GENERATOR_API_KEY": "test-key"}):
+            yield
+
+    @pytest.fixture(autouse=True)
+    def upload_db(self, tmp_path):
+        """Cache upload IDs in a throwaway database"""
+        with patch('db.DB_PATH', str(tmp_path / "uploads.db")), \
+             patch('upload_cache.UPLOAD_CACHE_ENABLED', True):
+            db.init_db()
+            yield
+
+    @pytest.fixture
+    def syllabus(self, tmp_path):
+        """A syllabus file in place of one built from GitHub"""
+        path = tmp_path / "syllabus.md"
+        path.write_text("# Syllabus\n")
+        with patch('generation.build_syllabus', return_value=str(path)):
+            yield path
+
+    def test_generates_problem(self, syllabus):
+        """Test that the workflow runs on the uploaded syllabus and its outputs are returned"""
+        response = {"data": {"outputs": {"Title": "Sum", "Problem": "Add two numbers.", "Testcases": " [] \n"}}}
+        with patch('generation.upload_file', return_value="file-1"), \
+             patch('generation.run_workflow', return_value=response) as mock_workflow:
+            result = generation.generate_problem("learnpython.org", "Basic Operators")
+
+        inputs = mock_workflow.call_args[0][0]
+        assert inputs["Language"] == "python"
+        assert inputs["syllabus"]["upload_file_id"] == "file-1"
+        assert (result.title, result.problem, result.raw_testcases) == ("Sum", "Add two numbers.", "[]")
+        assert result.response is response
+        assert not syllabus.exists()
+
+    def test_workflow_error_raises(self, syllabus):
+        """Test that a workflow failure raises instead of returning an error payload"""
+        with patch('generation.upload_file', return_value="file-1"), \
+             patch('generation.run_workflow', return_value={"error": "bad gateway"}):
+            with pytest.raises(generation.GenerationError, match="Workflow API error: bad gateway"):
+                generation.generate_problem("csa", "Loops")
+
+        assert not syllabus.exists()
+
+    def test_identical_syllabus_uploaded_once(self, tmp_path):
+        """Test that a syllabus with unchanged content reuses the earlier upload's ID"""
+        paths = [tmp_path / "first.md", tmp_path / "second.md"]
+        for path in paths:
+            path.write_text("# Same syllabus\n")
+        response = {"data": {"outputs": {"Testcases": "[]"}}}
+        with patch('generation.build_syllabus', side_effect=[str(p) for p in paths]), \
+             patch('generation.upload_file', return_value="file-1") as mock_upload, \
+             patch('generation.run_workflow', return_value=response) as mock_workflow:
+            generation.generate_problem("learnpython.org", "Basic Operators")
+            generation.generate_problem("learnpython.org", "Basic Operators")
+
+        assert mock_upload.call_count == 1
+        assert [c[0][0]["syllabus"]["upload_file_id"] for c in mock_workflow.call_args_list] == ["file-1", "file-1"]
+
+    def test_stale_upload_reuploaded_once(self, syllabus):
+        """Test that a cached ID the workflow rejects is dropped and the syllabus uploaded again"""
+        key = generation.upload_cache.cache_key(syllabus.read_bytes(), generation.DEFAULT_USER, f"{generation.BASE_URL}/files/upload")
+        generation.upload_cache.put(key, "file-old")
+        responses = [{"error": '{"code": "invalid_param", "message": "File not found"}'}, {"data": {"outputs": {}}}]
+        with patch('generation.upload_file', return_value="file-new") as mock_upload, \
+             patch('generation.run_workflow', side_effect=responses) as mock_workflow:
+            generation.generate_problem("learnpython.org", "Basic Operators")
+
+        assert mock_upload.call_count == 1
+        assert [c[0][0]["syllabus"]["upload_file_id"] for c in mock_workflow.call_args_list] == ["file-old", "file-new"]
+        assert generation.upload_cache.get(key) == "file-new"
+
+    def stream_response(self, events):
+        """A streaming workflow response sending the given events"""
+        response = MagicMock()
+        response.status_code = 200
+        lines = []
+        for event in events:
+            lines += [f"data: {json.dumps(event)}", ""]
+        response.iter_lines.return_value = iter(lines)
+        return response
+
+    def test_streamed_generation_relays_progress(self, syllabus):
+        """Test that workflow events become progress, title and text events, ending with the result"""
+        outputs = {"Title": "Sum", "Problem": "Add two numbers.", "Testcases": "[]"}
+        response = self.stream_response([
+            {"event": "workflow_started", "workflow_run_id": "run-1", "data": {}},
+            {"event": "node_started", "data": {"title": "Write problem"}},
+            {"event": "ping"},
+            {"event": "text_chunk", "data": {"text": "Add two "}},
+            {"event": "text_chunk", "data": {"text": "numbers."}},
+            {"event": "node_finished", "data": {"title": "Write problem", "status": "succeeded", "outputs": {"Title": "Sum"}}},
+            {"event": "workflow_finished", "workflow_run_id": "run-1", "data": {"status": "succeeded", "outputs": outputs}},
+        ])
+        with patch('generation.upload_file', return_value="file-1"), \
+             patch('http_client.post', return_value=response) as mock_post:
+            events = list(generation.generate_problem_events("learnpython.org", "Basic Operators"))
+
+        assert mock_post.call_args.kwargs["json"]["response_mode"] == "streaming"
+        assert mock_post.call_args.kwargs["stream"] is True
+        assert [e["event"] for e in events] == ["started", "progress", "problem_chunk", "problem_chunk", "progress", "title", "finished"]
+        assert "".join(e["text"] for e in events if e["event"] == "problem_chunk") == "Add two numbers."
+        assert events[-1]["result"].title == "Sum"
+        assert events[-1]["result"].response["data"]["outputs"] == outputs
+        response.close.assert_called_once()
+
+    @pytest.mark.parametrize("events,message", [
+        ([{"event": "workflow_finished", "data": {"status": "failed", "error": "LLM quota exceeded"}}], "LLM quota exceeded"),
+        ([{"event": "workflow_started", "data": {}}], "ended before"),
+    ])
+    def test_streamed_generation_failure_raises(self, syllabus, events, message):
+        """Test that a failed or cut-off workflow run raises instead of finishing"""
+        with patch('generation.upload_file', return_value="file-1"), \
+             patch('http_client.post', return_value=self.stream_response(events)):
+            with pytest.raises(generation.GenerationError, match=message):
+                list(generation.generate_problem_events("learnpython.org", "Basic Operators"))
+
+    def test_missing_api_key_raises_on_use(self):
+        """Test that the service imports without a key and only fails when generating"""
+        with patch.dict(os.environ, clear=True), \
+             patch('generation.build_syllabus') as mock_build:
+            with pytest.raises(generation.GenerationError, match="PROBLEM_GENERATOR_API_KEY"):
+                generation.generate_problem("learnpython.org", "Basic Operators")
+
+        mock_build.assert_not_called()
+
+    @pytest.mark.parametrize("course,language", [
+        ("csa", "java"),
+        ("learnpython.org", "python"),
+        ("learnjavaonline.org", "java"),
+        ("learn-cpp.org", "cpp"),
+        ("unknown", "python"),
+    ])
+    def test_default_language(self, course, language):
+        """Test that the language follows from the course"""
+        assert generation.default_language(course) == language
@@ -124,7 +124,7 @@ class TestGitHubFetcher:
             # Restore the original method
             fetcher.get_file_content = original_method
     
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_get_file_content_uses_cache(self, mock_get, fetcher, mock_cache_dir):
         """Test that cached content is used when available and valid"""
         # Setup cache
@@ -147,7 +147,7 @@ class TestGitHubFetcher:
             assert content == "Cached content"
             mock_get.assert_not_called()  # No API call made
     
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_list_directory(self, mock_get, fetcher):
         """Test listing directory contents"""
         # Setup mock response
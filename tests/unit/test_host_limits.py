@@ -0,0 +1,55 @@
+"""
+Unit tests for the host-wide execution slot limit
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+import host_limits
+
+class TestHostLimits:
+    """Test that process slots cap concurrent executions"""
+    
+    @pytest.fixture(autouse=True)
+    def slot_dir(self, tmp_path):
+        """Use a private slot directory with a budget of two"""
+        with patch('host_limits.SLOT_DIR', str(tmp_path)), \
+             patch('host_limits.MAX_PROCESSES', 2):
+            yield
+    
+    def test_caps_concurrent_holders(self):
+        """Test that no more than MAX_PROCESSES callers hold a slot at once"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+        
+        def work():
+            with host_limits.process_slot():
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+        
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert max(peak) == 2
+        assert len(peak) == 6
+    
+    def test_times_out_when_host_is_busy(self):
+        """Test that waiting for a slot gives up after the timeout"""
+        with host_limits.process_slot(), host_limits.process_slot():
+            with pytest.raises(host_limits.HostBusyError):
+                with host_limits.process_slot(timeout=0.1):
+                    pass
+        
+        # Slots are released again afterwards
+        with host_limits.process_slot(timeout=0.1):
+            pass
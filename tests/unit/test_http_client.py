@@ -0,0 +1,119 @@
+"""
+Unit tests for the shared upstream HTTP client in http_client.py
+"""
+
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+
+import http_client
+
+def response(status_code):
+    """A fake response with the given status"""
+    fake = MagicMock()
+    fake.status_code = status_code
+    return fake
+
+class TestHTTPClient:
+    """Test timeouts, retries and circuit breaking of upstream calls"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_state(self):
+        """Give every test closed breakers and no backoff sleeps"""
+        with patch.dict(http_client._breakers, clear=True), \
+             patch('http_client._backoff') as mock_backoff:
+            yield mock_backoff
+
+    @pytest.fixture
+    def session(self):
+        """A fake session standing in for the pooled one"""
+        fake = MagicMock()
+        with patch('http_client.get_session', return_value=fake):
+            yield fake
+
+    def test_default_timeouts(self, session):
+        """Test that every call gets a connect and a read timeout"""
+        session.request.return_value = response(200)
+
+        http_client.get("https://example.com/a")
+        http_client.post("https://example.com/b", timeout=90)
+
+        assert session.request.call_args_list[0].kwargs["timeout"] == (http_client.HTTP_CONNECT_TIMEOUT, http_client.HTTP_READ_TIMEOUT)
+        assert session.request.call_args_list[1].kwargs["timeout"] == (http_client.HTTP_CONNECT_TIMEOUT, 90)
+
+    def test_get_retried_with_backoff(self, session, fresh_state):
+        """Test that idempotent calls are retried on connection errors and overload"""
+        session.request.side_effect = [requests.ConnectionError("reset"), response(503), response(200)]
+
+        result = http_client.get("https://example.com/a")
+
+        assert result.status_code == 200
+        assert session.request.call_count == 3
+        assert [c.args[0] for c in fresh_state.call_args_list] == [0, 1]
+
+    def test_post_not_retried(self, session):
+        """Test that a POST is sent once, and its last response returned whatever the status"""
+        session.request.return_value = response(503)
+
+        assert http_client.post("https://example.com/a").status_code == 503
+        assert session.request.call_count == 1
+
+        session.request.side_effect = requests.Timeout("slow")
+        with pytest.raises(requests.Timeout):
+            http_client.post("https://example.com/a")
+        assert session.request.call_count == 2
+
+    def test_breaker_opens_after_failures(self, session):
+        """Test that a failing host is refused at once until its reset time passes"""
+        session.request.side_effect = requests.ConnectionError("refused")
+        for _ in range(http_client.BREAKER_FAILURES):
+            with pytest.raises(requests.ConnectionError):
+                http_client.post("https://down.example.com/a")
+        calls = session.request.call_count
+
+        with pytest.raises(http_client.CircuitOpenError):
+            http_client.get("https://down.example.com/b")
+        assert session.request.call_count == calls
+        assert http_client.get_breaker("https://down.example.com").state() == "open"
+
+        # Other hosts are unaffected
+        session.request.side_effect = None
+        session.request.return_value = response(200)
+        assert http_client.get("https://up.example.com/a").status_code == 200
+
+    def test_breaker_trial_call_closes_it(self):
+        """Test that one trial call after the reset time decides whether the circuit closes"""
+        breaker = http_client.CircuitBreaker(failures=1, reset_seconds=0)
+        breaker.record_failure()
+
+        assert breaker.allow()
+        assert not breaker.allow()  # Only one trial at a time
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state() == "closed"
+        assert breaker.allow() and breaker.allow()
+
+    def test_other_errors_settle_a_trial_call(self, session):
+        """Test that an error other than a connection failure during a trial doesn't leave the breaker stuck"""
+        breaker = http_client.get_breaker("https://flaky.example.com")
+        breaker.failures, breaker.reset_seconds = 1, 0
+        breaker.record_failure()
+
+        session.request.side_effect = requests.exceptions.ChunkedEncodingError("truncated")
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            http_client.post("https://flaky.example.com/a")
+        assert session.request.call_count == 1
+
+        session.request.side_effect = None
+        session.request.return_value = response(200)
+        assert http_client.post("https://flaky.example.com/a").status_code == 200
+        assert breaker.state() == "closed"
+
+    def test_client_errors_keep_circuit_closed(self, session):
+        """Test that 4xx answers don't count against the host"""
+        session.request.return_value = response(404)
+        for _ in range(http_client.BREAKER_FAILURES + 1):
+            assert http_client.get("https://example.com/missing").status_code == 404
+
+        assert http_client.get_breaker("https://example.com/").state() == "closed"
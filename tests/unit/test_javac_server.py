@@ -0,0 +1,158 @@
+"""
+Unit tests for the resident Java compile server client
+"""
+
+import os
+import socket
+import struct
+import threading
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+
+import javac_server
+import compile_cache
+
+def blob(data):
+    return struct.pack(">i", len(data)) + data
+
+class FakeCompileServer:
+    """Speaks the CompileServer protocol on a Unix socket with a canned reply"""
+    
+    def __init__(self, path, reply):
+        self.reply = reply
+        self.requests = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self.serve_one, daemon=True)
+        self.thread.start()
+    
+    @staticmethod
+    def read_blob(stream):
+        (size,) = struct.unpack(">i", stream.read(4))
+        return stream.read(size).decode()
+    
+    def serve_one(self):
+        conn, _ = self.server.accept()
+        with conn, conn.makefile('rb') as request:
+            class_name = self.read_blob(request)
+            source = self.read_blob(request)
+            (option_count,) = struct.unpack(">i", request.read(4))
+            options = [self.read_blob(request) for _ in range(option_count)]
+            self.requests.append((class_name, source, options))
+            conn.sendall(self.reply)
+        self.server.close()
+
+class TestJavacServer:
+    """Test the compile protocol, diagnostics formatting and the javac fallback"""
+    
+    def test_request_compile_returns_classes(self, tmp_path):
+        """Test that class files and warnings are decoded from a successful compile"""
+        socket_path = str(tmp_path / "javac.sock")
+        reply = (
+            b"\1"
+            + struct.pack(">i", 2)
+            + blob(b"Main") + blob(b"\xca\xfe\xba\xbe")
+            + blob(b"Main$Node") + blob(b"\xca\xfe")
+            + struct.pack(">i", 1)
+            + blob(b"WARNING") + struct.pack(">ii", -1, -1) + blob(b"unchecked call")
+            + b"\0"
+        )
+        server = FakeCompileServer(socket_path, reply)
+        
+        result = javac_server.request_compile(socket_path, "Main", "class Main {}", ["-g"], timeout=5)
+        server.thread.join(1)
+        
+        assert server.requests == [("Main", "class Main {}", ["-g"])]
+        assert result["success"] is True
+        assert result["classes"] == {"Main": b"\xca\xfe\xba\xbe", "Main$Node": b"\xca\xfe"}
+        assert result["diagnostics"] == [
+            {"kind": "WARNING", "line": None, "column": None, "message": "unchecked call"}
+        ]
+        assert result["recycle"] is False
+    
+    def test_format_diagnostics_matches_javac(self):
+        """Test that diagnostics render like javac's own report"""
+        code = "public class Main {\n    int x = 1\n}"
+        diagnostics = [{"kind": "ERROR", "line": 2, "column": 14, "message": "';' expected"}]
+        
+        report = javac_server.format_diagnostics("Main.java", code, diagnostics)
+        
+        assert report == (
+            "Main.java:2: error: ';' expected\n"
+            "    int x = 1\n"
+            "             ^\n"
+            "1 error"
+        )
+    
+    def test_compile_java_writes_class_files(self, tmp_path):
+        """Test that compiled classes land in the output directory"""
+        server = MagicMock()
+        server.compile.return_value = {
+            "success": True,
+            "classes": {"Main": b"main", "Main$Node": b"node"},
+            "diagnostics": [],
+            "recycle": False
+        }
+        
+        with patch('javac_server.get_server', return_value=server):
+            success, diagnostics = javac_server.compile_java("Main", "code", [], 5, str(tmp_path))
+        
+        assert success is True
+        assert (tmp_path / "Main.class").read_bytes() == b"main"
+        assert (tmp_path / "Main$Node.class").read_bytes() == b"node"
+    
+    def test_compile_errors_are_formatted(self, compile_cache_dir):
+        """Test that compile_cache reports server diagnostics in javac's format, keeping the error's position"""
+        diagnostics = [
+            {"kind": "WARNING", "line": 1, "column": 1, "message": "unchecked call"},
+            {"kind": "ERROR", "line": 2, "column": 5, "message": "class, interface, enum, or record expected"}
+        ]
+        
+        with patch('javac_server.compile_java', return_value=(False, diagnostics)), \
+             patch('subprocess.run') as mock_run:
+            run_command, error = compile_cache.compile_java("oops", "Main")
+        
+        mock_run.assert_not_called()
+        assert run_command is None
+        assert "Main.java:2: error: class, interface, enum, or record expected" in error
+        assert compile_cache.error_location(error) == (2, 5)
+    
+    def test_falls_back_to_javac_command(self, compile_cache_dir):
+        """Test that the javac command is used when the server is unavailable"""
+        def fake_javac(command, **kwargs):
+            source = command[-1]
+            open(os.path.join(os.path.dirname(source), "Main.class"), 'wb').close()
+            return subprocess.CompletedProcess(command, 0, "", "")
+        
+        with patch('javac_server.compile_java', side_effect=RuntimeError("no compiler")), \
+             patch('subprocess.run', side_effect=fake_javac) as mock_run:
+            run_command, error = compile_cache.compile_java("public class Main {}", "Main")
+        
+        assert error is None
+        assert mock_run.call_args[0][0][0] == "javac"
+        assert os.path.exists(os.path.join(run_command[2], "Main.class"))
+    
+    def test_busy_server_is_not_waited_for(self):
+        """Test that a compile stuck in the server sends the next one to javac instead of queueing it"""
+        server = javac_server.CompileServer()
+        server._lock.acquire()
+        try:
+            with patch('javac_server.LOCK_WAIT_SECONDS', 0.05), \
+                 patch('jvm_runner._JvmDaemon') as mock_daemon:
+                with pytest.raises(RuntimeError, match="busy"):
+                    server.compile("Main", "public class Main {}", [], timeout=5)
+        finally:
+            server._lock.release()
+        
+        mock_daemon.assert_not_called()
+    
+    def test_timeout_is_not_retried_with_javac(self, compile_cache_dir):
+        """Test that a compile that times out in the server isn't run again"""
+        with patch('javac_server.compile_java', side_effect=subprocess.TimeoutExpired(["javac"], 5)), \
+             patch('subprocess.run') as mock_run:
+            with pytest.raises(subprocess.TimeoutExpired):
+                compile_cache.compile_java("public class Main {}", "Main")
+        
+        mock_run.assert_not_called()
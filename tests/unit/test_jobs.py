@@ -0,0 +1,189 @@
+"""
+Unit tests for the asynchronous job queue
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+import db
+import jobs
+
+def wait_for_job(job_id, timeout=5):
+    """Poll a job until it finishes and return it"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = db.get_job(job_id)
+        if job["status"] in jobs.FINISHED_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+class TestJobQueue:
+    """Test that jobs run in the background under per-language limits"""
+
+    @pytest.fixture(autouse=True)
+    def job_db(self, tmp_path):
+        """Keep jobs in a throwaway database"""
+        with patch('db.DB_PATH', str(tmp_path / "jobs.db")):
+            db.init_db()
+            yield
+
+    def test_records_events_and_result(self):
+        """Test that a job's events and return value are stored"""
+        queue = jobs.JobQueue(concurrency={"python": 1})
+
+        def work(emit):
+            emit({"event": "compile", "status": "skipped"})
+            emit({"event": "summary", "passed": 1, "total": 1})
+            return {"passed": 1}
+
+        job_id = queue.submit("check", "python", work)
+        job = wait_for_job(job_id)
+
+        assert job["status"] == "done"
+        assert job["kind"] == "check"
+        assert job["result"] == {"passed": 1}
+        assert job["started_at"] is not None
+        assert [event["event"] for _, event in db.get_job_events(job_id)] == ["compile", "summary"]
+        queue.shutdown()
+
+    def test_failed_job_records_error(self):
+        """Test that an exception in the work fails the job instead of the worker"""
+        queue = jobs.JobQueue(concurrency={"python": 1})
+
+        def work(emit):
+            raise RuntimeError("boom")
+
+        job = wait_for_job(queue.submit("run", "python", work))
+
+        assert job["status"] == "failed"
+        assert job["error"] == "boom"
+        assert db.get_job_events(job["job_id"])[-1][1] == {"event": "error", "error": "boom"}
+        queue.shutdown()
+
+    def test_caps_concurrency_per_language(self):
+        """Test that a language never runs more jobs at once than its limit"""
+        queue = jobs.JobQueue(concurrency={"java": 2}, queue_depth=10)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def work(emit):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        job_ids = [queue.submit("run", "java", work) for _ in range(6)]
+        for job_id in job_ids:
+            wait_for_job(job_id)
+
+        assert max(peak) == 2
+        assert len(peak) == 6
+        assert queue.depth("java") == 0
+        queue.shutdown()
+
+    def test_refuses_jobs_past_the_queue_depth(self):
+        """Test that a saturated language is refused with a retry estimate"""
+        queue = jobs.JobQueue(concurrency={"cpp": 1}, queue_depth=1)
+        release = threading.Event()
+
+        def work(emit):
+            release.wait(5)
+
+        first = queue.submit("run", "cpp", work)
+        second = queue.submit("run", "cpp", work)
+        with pytest.raises(jobs.QueueFullError) as excinfo:
+            queue.submit("run", "cpp", work)
+
+        assert excinfo.value.retry_after >= 1
+        # Other languages have their own limits
+        python_job = queue.submit("run", "python", lambda emit: None)
+
+        release.set()
+        for job_id in (first, second, python_job):
+            assert wait_for_job(job_id)["status"] == "done"
+        queue.submit("run", "cpp", work)
+        queue.shutdown()
+
+    def test_job_events_follow_until_finished(self):
+        """Test that following a job yields its events and then its final status"""
+        queue = jobs.JobQueue(concurrency={"python": 1})
+        release = threading.Event()
+
+        def work(emit):
+            emit({"event": "compile", "status": "skipped"})
+            release.wait(5)
+            emit({"event": "summary", "passed": 0, "total": 1})
+
+        job_id = queue.submit("check", "python", work)
+        threading.Timer(0.05, release.set).start()
+        events = list(jobs.job_events(job_id, poll_interval=0.01))
+
+        assert [event["event"] for event in events] == ["compile", "summary", "job"]
+        assert events[-1]["status"] == "done"
+        queue.shutdown()
+
+    def test_job_events_give_up_on_a_stale_job(self):
+        """Test that a job lost with its worker is failed instead of followed forever, over one connection"""
+        db.create_job("lost", "check", "python")
+        db.start_job("lost")
+
+        with patch('jobs.JOB_STALE_MARGIN_SECONDS', 0), \
+             patch('db.get_db_connection', wraps=db.get_db_connection) as mock_connect:
+            events = list(jobs.job_events("lost", poll_interval=0.01, timeout=0))
+
+        assert [event["event"] for event in events] == ["error", "job"]
+        assert events[-1]["status"] == "failed"
+        assert mock_connect.call_count == 1
+        # The lost worker can't overwrite the failure if it turns up after all
+        assert db.finish_job("lost", "done", result={}) is False
+        assert db.get_job("lost")["status"] == "failed"
+
+    def test_stale_queued_job_is_not_run(self):
+        """Test that a job given up on while it waited doesn't run afterwards"""
+        queue = jobs.JobQueue(concurrency={"python": 1})
+        release = threading.Event()
+        ran = []
+
+        blocker = queue.submit("run", "python", lambda emit: release.wait(5))
+        job_id = queue.submit("run", "python", lambda emit: ran.append(1))
+        assert db.fail_stale_job(job_id, "Job did not finish within 0 seconds")
+        release.set()
+        wait_for_job(blocker)
+        deadline = time.monotonic() + 5
+        while queue.depth("python") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        queue.shutdown()
+
+        assert ran == []
+        assert queue.depth("python") == 0
+        assert db.get_job(job_id)["status"] == "failed"
+
+    def test_submit_run_fails_on_error_status(self):
+        """Test that a run /run_code would reject still records its response body"""
+        payload = {"error": "Execution timed out", "verdict": "Time Limit Exceeded"}
+        with patch('run.execute_run', return_value=(payload, 500)), \
+             patch('jobs._queue', jobs.JobQueue()):
+            job = wait_for_job(jobs.submit_run("while True: pass", "", "python"))
+            jobs._queue.shutdown()
+
+        assert job["status"] == "failed"
+        assert job["result"] == payload
+        assert db.get_job_events(job["job_id"])[0][1] == {"event": "result", **payload}
+
+    def test_expires_finished_jobs(self):
+        """Test that finished jobs are dropped once their retention has passed"""
+        db.create_job("old", "run", "python")
+        db.append_job_event("old", {"event": "result"})
+        db.finish_job("old", "done", result={})
+        db.create_job("pending", "run", "python")
+
+        assert db.delete_finished_jobs(time.time() + 1) == 1
+        assert db.get_job("old") is None
+        assert db.get_job_events("old") == []
+        assert db.get_job("pending")["status"] == "queued"
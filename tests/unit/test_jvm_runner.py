@@ -0,0 +1,187 @@
+"""
+Unit tests for the persistent JVM runner client
+"""
+
+import shutil
+import socket
+import struct
+import subprocess
+import threading
+import pytest
+from unittest.mock import patch
+
+import jvm_runner
+
+class FakeRunner:
+    """Speaks the JvmRunner protocol on a Unix socket and echoes stdin back"""
+    
+    def __init__(self, path, status=0, recycle=False):
+        self.path = path
+        self.status = status
+        self.recycle = recycle
+        self.requests = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self.serve_one, daemon=True)
+        self.thread.start()
+    
+    @staticmethod
+    def read_blob(stream):
+        (size,) = struct.unpack(">i", stream.read(4))
+        return stream.read(size)
+    
+    def serve_one(self):
+        conn, _ = self.server.accept()
+        with conn, conn.makefile('rb') as request:
+            class_dir = self.read_blob(request).decode()
+            class_name = self.read_blob(request).decode()
+            stdin = self.read_blob(request)
+            timeout_ms, output_limit = struct.unpack(">ii", request.read(8))
+            self.requests.append((class_dir, class_name, stdin, timeout_ms, output_limit))
+            
+            stderr = b"warning"
+            conn.sendall(
+                struct.pack(">iiq", self.status, 0, 1500000)
+                + struct.pack(">i", len(stdin)) + stdin
+                + struct.pack(">i", len(stderr)) + stderr
+                + (b"\1" if self.recycle else b"\0")
+            )
+        self.server.close()
+
+class TestJvmRunner:
+    """Test the socket protocol and when the shared JVM is bypassed"""
+    
+    @pytest.fixture
+    def socket_path(self, tmp_path):
+        return str(tmp_path / "runner.sock")
+    
+    def test_request_job_round_trip(self, socket_path):
+        """Test that a job is encoded and its result decoded correctly"""
+        runner = FakeRunner(socket_path)
+        
+        reply = jvm_runner.request_job(socket_path, "/classes", "Main", "1 2\n", timeout=2, output_limit=4096)
+        runner.thread.join(1)
+        
+        assert runner.requests == [("/classes", "Main", b"1 2\n", 2000, 4096)]
+        assert reply == {
+            "timed_out": False,
+            "output_limit_exceeded": False,
+            "returncode": 0,
+            "cpu_ms": 1.5,
+            "stdout": "1 2\n",
+            "stderr": "warning",
+            "recycle": False
+        }
+    
+    def test_request_job_reports_timeout_and_recycle(self, socket_path):
+        """Test that the timed-out status and recycle flag come through"""
+        FakeRunner(socket_path, status=jvm_runner.STATUS_TIMED_OUT, recycle=True)
+        
+        reply = jvm_runner.request_job(socket_path, "/classes", "Main", "", timeout=1)
+        
+        assert reply["timed_out"] is True
+        assert reply["recycle"] is True
+    
+    def test_request_job_reports_output_limit(self, socket_path):
+        """Test that a job stopped for writing too much is reported as such"""
+        FakeRunner(socket_path, status=jvm_runner.STATUS_OUTPUT_LIMIT, recycle=True)
+        
+        reply = jvm_runner.request_job(socket_path, "/classes", "Main", "", timeout=1)
+        
+        assert reply["output_limit_exceeded"] is True
+        assert reply["timed_out"] is False
+    
+    @pytest.mark.parametrize("code", [
+        "public class Main { public static void main(String[] a) { System.exit(0); } }",
+        "public class Main { public static void main(String[] a) { Runtime.getRuntime().halt(1); } }",
+        "public class Main { public static void main(String[] a) { System.setOut(null); } }",
+    ])
+    def test_unsafe_code_uses_its_own_jvm(self, code):
+        """Test that submissions which could take down a shared JVM run in a fresh one"""
+        completed = subprocess.CompletedProcess(["java"], 0, "", "")
+        with patch('jvm_runner.get_pool') as mock_get_pool, \
+             patch('process_runner.run_process', return_value=completed) as mock_run:
+            jvm_runner.run_java(code, ["java", "-cp", "/classes", "Main"], "", timeout=2)
+        
+        mock_get_pool.assert_not_called()
+        command = mock_run.call_args[0][0]
+        assert command[0] == "java" and command[-3:] == ["-cp", "/classes", "Main"]
+        assert any(arg.startswith("-Xmx") for arg in command)
+    
+    def test_falls_back_when_runner_cannot_start(self):
+        """Test that a missing or broken runner falls back to plain java and backs off"""
+        pool = jvm_runner.JvmPool(size=1)
+        completed = subprocess.CompletedProcess(["java"], 0, "3\n", "")
+        
+        with patch('jvm_runner.get_pool', return_value=pool), \
+             patch('jvm_runner._JvmDaemon', side_effect=RuntimeError("no java")) as mock_daemon, \
+             patch('process_runner.run_process', return_value=completed):
+            for _ in range(2):
+                result = jvm_runner.run_java("public class Main {}", ["java", "-cp", "/classes", "Main"], "", timeout=2)
+                assert result.stdout == "3\n"
+        
+        # The second run skipped the runner instead of trying to start it again
+        assert mock_daemon.call_count == 1
+
+@pytest.mark.skipif(shutil.which("javac") is None or shutil.which("java") is None, reason="JDK not installed")
+class TestJvmRunnerProcess:
+    """Test the real jvm/JvmRunner.java against compiled submissions"""
+    
+    @pytest.fixture
+    def compile_submission(self, tmp_path):
+        def compile_submission(name, code):
+            class_dir = tmp_path / name
+            class_dir.mkdir()
+            (class_dir / "Main.java").write_text(code)
+            subprocess.run(["javac", "-d", str(class_dir), str(class_dir / "Main.java")], check=True, timeout=60)
+            return str(class_dir)
+        return compile_submission
+    
+    @pytest.fixture
+    def daemon(self):
+        daemon = jvm_runner._JvmDaemon()
+        yield daemon
+        daemon.close()
+    
+    def test_finished_job_keeps_the_runner(self, daemon, compile_submission):
+        """Test that a plain submission runs and the runner stays up for the next job"""
+        class_dir = compile_submission("echo", """
+            public class Main {
+                public static void main(String[] args) {
+                    System.out.println(new java.util.Scanner(System.in).nextLine());
+                }
+            }
+        """)
+        
+        reply = daemon.run(class_dir, "Main", "hello\n", timeout=5)
+        
+        assert reply["stdout"] == "hello\n"
+        assert reply["recycle"] is False
+        assert daemon.alive()
+    
+    def test_leftover_daemon_thread_recycles_the_runner(self, daemon, compile_submission):
+        """Test that a daemon thread still running after main() returns retires the runner"""
+        class_dir = compile_submission("daemon", """
+            public class Main {
+                public static void main(String[] args) {
+                    Thread thread = new Thread(() -> {
+                        while (true) {
+                            System.out.println("leak");
+                            try { Thread.sleep(10); } catch (InterruptedException e) { return; }
+                        }
+                    });
+                    thread.setDaemon(true);
+                    thread.start();
+                    System.out.println("done");
+                }
+            }
+        """)
+        
+        reply = daemon.run(class_dir, "Main", "", timeout=5)
+        
+        assert reply["timed_out"] is False
+        assert "done" in reply["stdout"]
+        assert reply["recycle"] is True
+        daemon.process.wait(timeout=5)
+
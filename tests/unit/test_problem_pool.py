@@ -0,0 +1,85 @@
+"""
+Unit tests for the pre-generated problem pool
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+
+import db
+import generation
+import problem_pool
+
+def generated(title):
+    """A workflow result with one testcase"""
+    return generation.GenerationResult({"data": {"outputs": {
+        "Title": title,
+        "Problem": f"{title} text",
+        "Testcases": json.dumps([{"input": "1", "expected_output": "1"}]),
+    }}})
+
+class TestProblemPool:
+    """Test that pooled problems are served once and refilled to a demand-based target"""
+
+    @pytest.fixture(autouse=True)
+    def pool_db(self, tmp_path):
+        """Pool problems in a throwaway database"""
+        with patch('db.DB_PATH', str(tmp_path / "pool.db")), \
+             patch('problem_pool.PROBLEM_POOL_ENABLED', True):
+            db.init_db()
+            yield
+
+    def test_target_follows_demand(self):
+        """Test that targets grow with recent requests up to the cap"""
+        with patch('problem_pool.PROBLEM_POOL_REQUESTS_PER_PROBLEM', 2), \
+             patch('problem_pool.PROBLEM_POOL_MAX_TARGET', 3):
+            assert [problem_pool.target_for(n) for n in (0, 1, 2, 3, 5, 100)] == [0, 1, 1, 2, 3, 3]
+
+    def test_pooled_problem_served_once_and_hidden_until_then(self):
+        """Test that unserved problems stay out of listings and are each handed out once"""
+        first = db.store_problem("A", "a", "learnpython.org", "Loops", [{"input": "", "expected_output": "1"}], "python", pool_status="unserved")
+        second = db.store_problem("B", "b", "learnpython.org", "Loops", [{"input": "", "expected_output": "2"}], "python", pool_status="unserved")
+        assert db.get_problems_by_lesson("learnpython.org", "Loops") == []
+
+        served = [problem_pool.take("learnpython.org", "Loops", "python") for _ in range(3)]
+
+        assert [s["problem_id"] for s in served[:2]] == [first, second]
+        assert served[2] is None
+        assert problem_pool.take("learnpython.org", "Loops", "java") is None
+        assert {p["id"] for p in db.get_problems_by_lesson("learnpython.org", "Loops")} == {first, second}
+
+    def test_refill_reaches_target(self):
+        """Test that a refill generates only as many problems as the pool lacks"""
+        for _ in range(3):
+            problem_pool.record_demand("learnpython.org", "Loops", "python")
+        db.store_problem("Old", "old", "learnpython.org", "Loops", [{"input": "", "expected_output": "1"}], "python", pool_status="unserved")
+
+        with patch('problem_pool.PROBLEM_POOL_REQUESTS_PER_PROBLEM', 1), \
+             patch('generation.generate_problem', side_effect=[generated("New 1"), generated("New 2")]) as mock_generate:
+            added = problem_pool.refill("learnpython.org", "Loops", "python")
+            pools = problem_pool.get_depths()["pools"]
+
+        assert added == 2
+        assert mock_generate.call_count == 2
+        assert pools == [{"course": "learnpython.org", "lesson": "Loops", "language": "python",
+                                                     "unserved": 3, "target": 3, "requests": 3}]
+
+    def test_refill_skipped_while_leased(self):
+        """Test that a pool another worker is refilling isn't refilled twice"""
+        problem_pool.record_demand("learnpython.org", "Loops", "python")
+        db.acquire_pool_lease(problem_pool.pool_key("learnpython.org", "Loops", "python"), 2e9)
+
+        with patch('generation.generate_problem') as mock_generate:
+            assert problem_pool.refill("learnpython.org", "Loops", "python") == 0
+
+        mock_generate.assert_not_called()
+
+    def test_failed_generation_stops_refill(self):
+        """Test that a failing upstream ends the refill and releases the lease"""
+        problem_pool.record_demand("learnpython.org", "Loops", "python")
+
+        with patch('generation.generate_problem', side_effect=generation.GenerationError("File upload failed")) as mock_generate:
+            assert problem_pool.refill("learnpython.org", "Loops", "python") == 0
+
+        assert mock_generate.call_count == 1
+        assert db.acquire_pool_lease(problem_pool.pool_key("learnpython.org", "Loops", "python"), 2e9)
@@ -0,0 +1,89 @@
+"""
+Unit tests for running user programs under resource limits
+"""
+
+import sys
+import signal
+import subprocess
+import pytest
+from unittest.mock import patch
+
+import process_runner
+
+class TestProcessRunner:
+    """Test resource limits, usage accounting and limit verdicts"""
+    
+    def test_reports_output_and_usage(self):
+        """Test that a run returns its output along with CPU, wall time and peak RSS"""
+        result = process_runner.run_process(
+            [sys.executable, "-c", "print(sum(range(10 ** 6)) + int(input()))"], "1\n", timeout=5
+        )
+        
+        assert result.returncode == 0
+        assert result.stdout == "499999500001\n"
+        assert result.cpu_ms > 0
+        assert result.wall_ms >= result.cpu_ms * 0.5
+        assert result.max_rss_kb > 0
+        assert process_runner.limit_verdict(result) is None
+    
+    def test_memory_limit_is_enforced(self):
+        """Test that allocating past the cap fails and is reported as a memory verdict"""
+        result = process_runner.run_process(
+            [sys.executable, "-c", "data = bytearray(512 * 1024 * 1024)"], "", timeout=5, memory_limit_mb=128
+        )
+        
+        assert result.returncode != 0
+        assert "MemoryError" in result.stderr
+        assert process_runner.limit_verdict(result, memory_limit_mb=128) == process_runner.MEMORY_LIMIT_EXCEEDED
+    
+    @pytest.mark.skipif(process_runner.PRLIMIT_PATH is None, reason="prlimit is not installed")
+    def test_limits_are_in_place_before_the_program_starts(self):
+        """Test that the program sees its limits from its first instruction, not once it is already running"""
+        result = process_runner.run_process(["sh", "-c", "ulimit -St; ulimit -Ht; ulimit -v"], "", timeout=2, memory_limit_mb=128)
+        
+        cpu_seconds = 2 + process_runner.CPU_LIMIT_GRACE_SECONDS
+        assert result.stdout.split() == [str(cpu_seconds), str(cpu_seconds + 1), str(128 * 1024)]
+        assert result.args == ["sh", "-c", "ulimit -St; ulimit -Ht; ulimit -v"]
+    
+    def test_limits_follow_the_exec_without_prlimit(self):
+        """Test that hosts without prlimit still get the limits, set from the parent"""
+        with patch('process_runner.PRLIMIT_PATH', None):
+            result = process_runner.run_process(["sh", "-c", "sleep 0.2; ulimit -t"], "", timeout=2)
+        
+        assert result.stdout.strip() == str(2 + process_runner.CPU_LIMIT_GRACE_SECONDS)
+    
+    def test_timeout_kills_the_process_group(self):
+        """Test that a timeout raises and takes the program's children with it"""
+        code = "import subprocess, sys, time\nsubprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\ntime.sleep(30)"
+        
+        with pytest.raises(subprocess.TimeoutExpired) as excinfo:
+            process_runner.run_process([sys.executable, "-c", code], "", timeout=0.5)
+        
+        assert process_runner.usage_of(excinfo.value)["wall_ms"] == 500
+    
+    def test_cpu_limit_counts_as_time_limit(self):
+        """Test that a run killed by RLIMIT_CPU gets the time limit verdict"""
+        result = subprocess.CompletedProcess(["./solution"], -signal.SIGXCPU, "", "")
+        assert process_runner.limit_verdict(result) == process_runner.TIME_LIMIT_EXCEEDED
+        
+        bad_alloc = subprocess.CompletedProcess(["./solution"], -signal.SIGABRT, "", "terminate called after throwing an instance of 'std::bad_alloc'")
+        assert process_runner.limit_verdict(bad_alloc) == process_runner.MEMORY_LIMIT_EXCEEDED
+    
+    def test_output_limit_kills_runaway_printer(self):
+        """Test that a program printing forever is stopped at the output cap"""
+        result = process_runner.run_process(
+            [sys.executable, "-c", "while True: print('x' * 100)"], "", timeout=5, output_limit=64 * 1024
+        )
+        
+        assert len(result.stdout) == 64 * 1024
+        assert result.output_limit_exceeded is True
+        assert result.wall_ms < 5000
+        assert process_runner.limit_verdict(result) == process_runner.OUTPUT_LIMIT_EXCEEDED
+    
+    def test_truncate_output_for_display(self):
+        """Test that long output is cut at the display limit with a note"""
+        assert process_runner.truncate_output("short", limit=1024) == "short"
+        
+        truncated = process_runner.truncate_output("é" * 2000, limit=1024)
+        assert truncated.startswith("é" * 512)
+        assert truncated.endswith("[output truncated after 1 KB]")
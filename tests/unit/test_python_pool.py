@@ -0,0 +1,150 @@
+"""
+Unit tests for the warm Python execution pool
+"""
+
+import subprocess
+import pytest
+from unittest.mock import patch
+
+import python_pool
+
+class TestPythonPool:
+    """Test running code in forked children of warm zygotes"""
+    
+    @pytest.fixture
+    def pool(self):
+        """Create a small pool that recycles zygotes quickly"""
+        pool = python_pool.PythonPool(size=1, max_jobs=2)
+        yield pool
+        pool.shutdown()
+    
+    def test_runs_code_with_stdin(self, pool):
+        """Test that stdin reaches the program and stdout comes back"""
+        result = pool.run("a, b = map(int, input().split())\nprint(a + b)", "1 2\n", timeout=2)
+        
+        assert result.returncode == 0
+        assert result.stdout == "3\n"
+        assert result.stderr == ""
+    
+    def test_input_prompts_can_be_silenced(self, pool):
+        """Test that the input() shim keeps prompts out of stdout"""
+        code = "name = input('Name: ')\nprint(name)"
+        
+        assert pool.run(code, "Ada\n", timeout=2).stdout == "Name: Ada\n"
+        assert pool.run(code, "Ada\n", timeout=2, silence_prompts=True).stdout == "Ada\n"
+    
+    def test_jobs_do_not_share_state(self, pool):
+        """Test that each job starts from a fresh copy of the zygote"""
+        pool.run("import math\nmath.pi = 3", "", timeout=2)
+        
+        assert pool.run("import math\nprint(math.pi > 3)", "", timeout=2).stdout == "True\n"
+    
+    def test_errors_and_exit_codes(self, pool):
+        """Test that exceptions and sys.exit behave like a normal interpreter"""
+        error = pool.run("1 / 0", "", timeout=2)
+        assert error.returncode == 1
+        assert "ZeroDivisionError" in error.stderr
+        assert 'File "<string>", line 1' in error.stderr
+        
+        assert pool.run("import sys\nsys.exit(3)", "", timeout=2).returncode == 3
+    
+    def test_timeout_raises(self, pool):
+        """Test that a runaway child is killed and reported as a timeout"""
+        with pytest.raises(subprocess.TimeoutExpired):
+            pool.run("while True:\n    pass", "", timeout=0.5)
+        
+        # The zygote survives and keeps serving jobs
+        assert pool.run("print('ok')", "", timeout=2).stdout == "ok\n"
+    
+    def test_zygote_recycled_after_max_jobs(self, pool):
+        """Test that a zygote is replaced once it has served max_jobs jobs"""
+        pids = set()
+        for _ in range(4):
+            pool.run("print('x')", "", timeout=2)
+            pids.update(zygote.process.pid for zygote in pool._zygotes)
+        
+        assert len(pids) == 2
+    
+    def test_fallback_without_pool(self):
+        """Test that run_python still works with the pool disabled"""
+        with patch('python_pool.POOL_ENABLED', False):
+            result = python_pool.run_python("print(input('> '))", "hi\n", timeout=2, silence_prompts=True)
+        
+        assert result.stdout == "hi\n"
+    
+    def test_batch_runs_every_testcase_in_one_child(self, pool):
+        """Test that a batch resets stdin and stdout between testcases"""
+        code = "a, b = map(int, input().split())\nprint(a + b)"
+        
+        outcomes = pool.run_batch(code, ["1 2\n", "3 4\n", "10 -1\n"], timeout=2)
+        
+        assert [outcome.stdout for outcome in outcomes] == ["3\n", "7\n", "9\n"]
+        assert all(outcome.returncode == 0 for outcome in outcomes)
+    
+    def test_batch_gives_each_testcase_fresh_globals_and_fds(self, pool):
+        """Test that globals and raw file descriptors behave like a separate run"""
+        code = (
+            "import sys, random\n"
+            "data = open(0).read()\n"
+            "print(data.upper(), 'seen' in globals(), random.random() < 2)\n"
+            "seen = True\n"
+            "sys.setrecursionlimit(5000)"
+        )
+        
+        outcomes = pool.run_batch(code, ["ab", "cd"], timeout=2)
+        
+        assert [outcome.stdout for outcome in outcomes] == ["AB False True\n", "CD False True\n"]
+    
+    def test_batch_times_out_single_testcase(self, pool):
+        """Test that one runaway testcase doesn't take the rest of the batch with it"""
+        code = "x = input()\nwhile x == 'loop':\n    pass\nprint(x)"
+        
+        outcomes = pool.run_batch(code, ["a", "loop", "c"], timeout=0.5)
+        
+        assert outcomes[0].stdout == "a\n"
+        assert isinstance(outcomes[1], subprocess.TimeoutExpired)
+        assert outcomes[2].stdout == "c\n"
+    
+    @pytest.mark.parametrize("code", [
+        "import math\nmath.pi = 3\nprint(math.pi)",
+        "import os\nos._exit(0)",
+        "print(",
+    ])
+    def test_batch_hands_back_testcases_it_cannot_trust(self, pool, code):
+        """Test that module mutation, hard exits and syntax errors fall back to separate runs"""
+        assert pool.run_batch(code, ["", ""], timeout=2) == [None, None]
+    
+    def test_runs_report_usage_and_memory_errors(self, pool):
+        """Test that pooled runs carry resource usage and hit the memory cap"""
+        with patch('process_runner.MEMORY_LIMIT_MB', 128):
+            result = pool.run("print('ok')", "", timeout=2)
+            hog = pool.run("data = bytearray(512 * 1024 * 1024)", "", timeout=2)
+            batch = pool.run_batch("print(input())", ["a", "b"], timeout=2)
+        
+        assert result.cpu_ms is not None and result.wall_ms is not None and result.max_rss_kb > 0
+        assert "MemoryError" in hog.stderr
+        assert all(outcome.cpu_ms is not None and outcome.max_rss_kb > 0 for outcome in batch)
+    
+    def test_output_limit_stops_pooled_runs(self, pool):
+        """Test that runaway output stops a pooled run and sends a batched testcase to its own child"""
+        code = "x = input()\nwhile x == 'spam':\n    print('y' * 1000)\nprint(x)"
+        with patch('process_runner.OUTPUT_LIMIT_BYTES', 64 * 1024):
+            result = pool.run(code, "spam", timeout=2)
+            batch = pool.run_batch(code, ["a", "spam"], timeout=2)
+        
+        assert result.output_limit_exceeded is True
+        assert len(result.stdout) == 64 * 1024
+        assert batch[0].stdout == "a\n"
+        assert batch[1] is None
+    
+    def test_runs_in_the_given_working_directory(self, pool, tmp_path):
+        """Test that files land in the run's workspace and a batch can't pass them between testcases"""
+        code = "import os\nprint(sorted(os.listdir('.')))\nopen('out.txt', 'w').write(input())"
+        
+        result = pool.run(code, "hello", timeout=2, cwd=str(tmp_path))
+        assert result.stdout == "[]\n"
+        assert (tmp_path / "out.txt").read_text() == "hello"
+        
+        (tmp_path / "out.txt").unlink()
+        batch = pool.run_batch(code, ["a", "b"], timeout=2, cwd=str(tmp_path))
+        assert batch == [None, None]
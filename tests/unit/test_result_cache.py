@@ -0,0 +1,115 @@
+"""
+Unit tests for the check result cache
+"""
+
+import time
+import pytest
+from unittest.mock import patch
+
+import db
+import host_limits
+import result_cache
+from check import check_events, collect_results
+
+def fake_run_check_events(code, inputs, expected_outputs, language, mode="full", compare="lines"):
+    """Yield the events of a check whose testcases finish out of order"""
+    yield {"event": "compile", "status": "skipped"}
+    for index in reversed(range(len(inputs))):
+        yield {"event": "testcase", "index": index, "result": {"input": inputs[index], "status": "✅", "verdict": "Accepted"}}
+    yield {"event": "summary", "passed": len(inputs), "total": len(inputs), "success_rate": "", "success": True}
+
+class TestResultCache:
+    """Test that repeated checks of unchanged code are answered from the cache"""
+
+    @pytest.fixture(autouse=True)
+    def cache_db(self, tmp_path):
+        """Cache results in a throwaway database"""
+        with patch('db.DB_PATH', str(tmp_path / "cache.db")), \
+             patch('result_cache.RESULT_CACHE_ENABLED', True):
+            db.init_db()
+            yield
+
+    def test_key_ignores_line_endings_but_not_tests(self):
+        """Test that the key changes with the code or testcases only"""
+        key = result_cache.cache_key("print(1)\n", "python", ["1"], ["1"])
+
+        assert result_cache.cache_key("print(1)\r\n\n", "python", ["1"], ["1"]) == key
+        assert result_cache.cache_key("print(2)", "python", ["1"], ["1"]) != key
+        assert result_cache.cache_key("print(1)", "python", ["1"], ["2"]) != key
+        assert result_cache.cache_key("print(1)", "cpp", ["1"], ["1"]) != key
+
+    def test_key_keeps_leading_indentation(self):
+        """Test that code differing in leading indentation, which Python rejects, gets its own key"""
+        assert result_cache.cache_key("  print(1)", "python", ["1"], ["1"]) != result_cache.cache_key("print(1)", "python", ["1"], ["1"])
+
+    def test_repeated_check_is_replayed(self):
+        """Test that a second identical check doesn't run and comes back marked cached"""
+        with patch('check.run_check_events', side_effect=fake_run_check_events) as mock_run:
+            first = list(check_events("print(1)", ["a", "b"], ["1", "1"], "python"))
+            second = list(check_events("print(1)", ["a", "b"], ["1", "1"], "python"))
+
+        assert mock_run.call_count == 1
+        assert not any(event.get("cached") for event in first)
+        assert all(event["cached"] for event in second)
+        # The replay lists testcases in order
+        assert [event.get("index") for event in second] == [None, 0, 1, None]
+        body = collect_results(iter(second))
+        assert body["cached"] is True
+        assert [result["input"] for result in body["results"]] == ["a", "b"]
+
+    def test_changed_tests_run_again(self):
+        """Test that a different testcase set misses the cache"""
+        with patch('check.run_check_events', side_effect=fake_run_check_events) as mock_run:
+            list(check_events("print(1)", ["a"], ["1"], "python"))
+            list(check_events("print(1)", ["a"], ["2"], "python"))
+
+        assert mock_run.call_count == 2
+
+    def test_load_dependent_results_are_not_cached(self):
+        """Test that a check with a timeout is run again next time"""
+        events = [
+            {"event": "compile", "status": "skipped"},
+            {"event": "testcase", "index": 0, "result": {"verdict": "Time Limit Exceeded"}},
+            {"event": "summary", "passed": 0, "total": 1}
+        ]
+        result_cache.put("key", events)
+
+        assert result_cache.get("key") is None
+
+    def test_entries_expire_and_are_evicted(self):
+        """Test the TTL and the LRU bound"""
+        events = [{"event": "summary", "passed": 0, "total": 0}]
+        with patch('result_cache.RESULT_CACHE_MAX_ENTRIES', 2):
+            result_cache.put("a", events)
+            result_cache.put("b", events)
+            time.sleep(0.01)
+            assert result_cache.get("a") == events
+            result_cache.put("c", events)
+
+            # "b" was used least recently
+            assert result_cache.get("b") is None
+            assert result_cache.get("a") == events
+
+        with patch('result_cache.RESULT_CACHE_TTL_SECONDS', 0):
+            assert result_cache.get("c") is None
+
+    def test_abandoned_check_is_not_cached(self):
+        """Test that a client that stops listening leaves nothing half-finished in the cache"""
+        with patch('check.run_check_events', side_effect=fake_run_check_events) as mock_run:
+            events = check_events("print(1)", ["a", "b"], ["1", "1"], "python")
+            next(events)
+            events.close()
+            list(check_events("print(1)", ["a", "b"], ["1", "1"], "python"))
+
+        assert mock_run.call_count == 2
+
+    def test_busy_compile_is_not_cached(self):
+        """Test that a compile the host was too busy to run is an Internal Error, run again next time"""
+        busy = host_limits.HostBusyError("Server is busy running other submissions, please try again")
+        with patch('executor.prepare', side_effect=busy) as mock_prepare:
+            first = collect_results(check_events("int main() {}", ["a"], ["1"], "cpp"))
+            second = collect_results(check_events("int main() {}", ["a"], ["1"], "cpp"))
+
+        assert mock_prepare.call_count == 2
+        assert first["results"][0]["verdict"] == "Internal Error"
+        assert not second.get("cached")
@@ -0,0 +1,66 @@
+"""
+Unit tests for Python style checking in style_check.py
+"""
+
+import subprocess
+import flask
+import pytest
+from unittest.mock import patch
+
+import style_check
+
+class TestPythonStyleCheck:
+    """Test that Python is linted in-process with flake8's checkers"""
+
+    @pytest.fixture
+    def app_context(self):
+        """Provide a Flask application context for jsonify"""
+        app = flask.Flask(__name__)
+        with app.app_context():
+            yield
+
+    @pytest.mark.skipif(not style_check.PYTHON_LINT_IN_PROCESS, reason="pycodestyle and pyflakes are not installed")
+    def test_lints_like_flake8(self):
+        """Test that pycodestyle and pyflakes findings come back with flake8's codes and positions"""
+        code = "import os\ndef f( x ):\n    return undefined_name+x\n"
+
+        errors = style_check.lint_python(code)
+
+        assert [(e["line"], e["column"], e["code"]) for e in errors] == [
+            (1, 1, "F401"),
+            (2, 1, "E302"),
+            (2, 7, "E201"),
+            (2, 9, "E202"),
+            (3, 12, "F821"),
+        ]
+        assert errors[0]["message"] == "'os' imported but unused"
+
+    @pytest.mark.skipif(not style_check.PYTHON_LINT_IN_PROCESS, reason="pycodestyle and pyflakes are not installed")
+    def test_syntax_error_is_the_only_finding(self):
+        """Test that code that doesn't parse gets a single E999, as flake8 reports it"""
+        errors = style_check.lint_python("def f(:\n  pass")
+
+        assert errors == [{"line": 1, "column": 8, "message": "SyntaxError: invalid syntax", "code": "E999"}]
+
+    @pytest.mark.skipif(not style_check.PYTHON_LINT_IN_PROCESS, reason="pycodestyle and pyflakes are not installed")
+    def test_style_check_spawns_nothing(self, app_context):
+        """Test that a Python style check runs no process and writes no file"""
+        with patch('subprocess.run') as mock_run, \
+             patch('tempfile.NamedTemporaryFile') as mock_temp:
+            response = style_check.check_style("x = 1\n", "python")
+
+        mock_run.assert_not_called()
+        mock_temp.assert_not_called()
+        assert response.get_json()["errors"] == []
+        assert response.get_json()["linter"] == "flake8"
+
+    def test_flake8_command_reads_stdin(self):
+        """Test that without the checkers installed, flake8 runs once on the code fed through stdin"""
+        output = subprocess.CompletedProcess(["flake8"], 1, "stdin:1:6: E231 missing whitespace after ','\n", "")
+        with patch('subprocess.run', return_value=output) as mock_run:
+            errors = style_check.run_flake8("x = [1,2]\n")
+
+        assert mock_run.call_count == 1
+        assert mock_run.call_args[0][0] == ['flake8', '-']
+        assert mock_run.call_args.kwargs["input"] == "x = [1,2]\n"
+        assert errors == [{"line": 1, "column": 6, "message": "missing whitespace after ','", "code": "E231"}]
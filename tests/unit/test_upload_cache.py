@@ -0,0 +1,45 @@
+"""
+Unit tests for the uploaded file ID cache
+"""
+
+import time
+import pytest
+from unittest.mock import patch
+
+import db
+import upload_cache
+
+class TestUploadCache:
+    """Test that upload IDs are reused by content until they expire or are rejected"""
+
+    @pytest.fixture(autouse=True)
+    def cache_db(self, tmp_path):
+        """Cache upload IDs in a throwaway database"""
+        with patch('db.DB_PATH', str(tmp_path / "uploads.db")), \
+             patch('upload_cache.UPLOAD_CACHE_ENABLED', True):
+            db.init_db()
+            yield
+
+    def test_key_follows_content_user_and_upstream(self):
+        """Test that the key changes with the content, the user or the upload URL only"""
+        key = upload_cache.cache_key(b"# Syllabus", "testuser", "http://api/files/upload")
+
+        assert upload_cache.cache_key(b"# Syllabus", "testuser", "http://api/files/upload") == key
+        assert upload_cache.cache_key(b"# Syllabus 2", "testuser", "http://api/files/upload") != key
+        assert upload_cache.cache_key(b"# Syllabus", "end_user", "http://api/files/upload") != key
+        assert upload_cache.cache_key(b"# Syllabus", "testuser", "http://other/files/upload") != key
+
+    def test_put_get_invalidate(self):
+        """Test that a stored ID is returned until it is invalidated"""
+        upload_cache.put("key", "file-1")
+        assert upload_cache.get("key") == "file-1"
+
+        upload_cache.invalidate("key")
+        assert upload_cache.get("key") is None
+
+    def test_expired_upload_misses(self):
+        """Test that IDs older than the TTL are not reused"""
+        upload_cache.put("key", "file-1")
+
+        with patch('time.time', return_value=time.time() + upload_cache.UPLOAD_CACHE_TTL_SECONDS + 1):
+            assert upload_cache.get("key") is None
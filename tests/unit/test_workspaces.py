@@ -0,0 +1,78 @@
+"""
+Unit tests for the pool of scratch directories user programs run in
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+
+import workspaces
+
+class TestWorkspaces:
+    """Test that workspaces are reused, wiped and reaped"""
+    
+    @pytest.fixture
+    def pool(self, tmp_path):
+        pool = workspaces.WorkspacePool(root=str(tmp_path), size=2)
+        yield pool
+        pool.shutdown()
+    
+    def test_workspaces_are_wiped_and_reused(self, pool):
+        """Test that a returned workspace comes back empty and is handed out again"""
+        path = pool.acquire()
+        os.makedirs(os.path.join(path, "nested"))
+        with open(os.path.join(path, "nested", "out.txt"), "w") as f:
+            f.write("data")
+        os.chmod(os.path.join(path, "nested"), 0o500)
+        pool.release(path)
+        
+        assert pool.acquire() == path
+        assert os.listdir(path) == []
+        assert pool.get_stats()["in_use"] == 1
+    
+    def test_extra_workspaces_when_pool_is_exhausted(self, pool):
+        """Test that callers never wait and the pool doesn't grow past its size"""
+        paths = [pool.acquire() for _ in range(3)]
+        
+        assert len(set(paths)) == 3
+        for path in paths:
+            pool.release(path)
+        assert pool.get_stats()["idle"] == 2
+        assert sum(os.path.isdir(path) for path in paths) == 2
+    
+    def test_reaper_reports_leaks_and_cleans_up(self, pool, tmp_path):
+        """Test that the reaper flags held workspaces, rewipes dirty idle ones and removes dead workers' dirs"""
+        held = pool.acquire()
+        idle = pool.acquire()
+        pool.release(idle)
+        with open(os.path.join(idle, "late.txt"), "w") as f:
+            f.write("written after release")
+        
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        os.makedirs(tmp_path / str(dead.pid) / "ws-1")
+        
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(workspaces, "WORKSPACE_MAX_HOLD_SECONDS", -1)
+            report = pool.reap()
+        
+        assert report["held_too_long"] == [held]
+        assert report["rewiped"] == [idle]
+        assert os.listdir(idle) == []
+        assert report["dead_workers"] == [dead.pid]
+        assert not os.path.exists(tmp_path / str(dead.pid))
+    
+    def test_workspace_context_releases_on_error(self, tmp_path):
+        """Test that a run that raises still gives its workspace back"""
+        pool = workspaces.WorkspacePool(root=str(tmp_path), size=1)
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(workspaces, "get_pool", lambda: pool)
+            with pytest.raises(RuntimeError):
+                with workspaces.workspace() as path:
+                    open(os.path.join(path, "x"), "w").close()
+                    raise RuntimeError("run failed")
+        
+        assert pool.get_stats()["in_use"] == 0
+        assert os.listdir(path) == []
+        pool.shutdown()
@@ -0,0 +1,73 @@
+"""
+Cache of the IDs of files already uploaded to the workflow API.
+
+The syllabus of a lesson only changes when the upstream tutorials do, yet every
+generation uploaded it again before running the workflow. The ID of each upload
+is kept in the uploaded_files table under a hash of the file's content, so every
+gunicorn worker can reuse it. Entries expire after UPLOAD_CACHE_TTL_SECONDS, which
+should stay below how long the upstream keeps uploaded files; an ID the workflow
+rejects anyway is forgotten with invalidate() and the file uploaded again.
+"""
+
+import os
+import time
+import hashlib
+import db
+
+# Cache configuration
+UPLOAD_CACHE_ENABLED = os.getenv('UPLOAD_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+UPLOAD_CACHE_TTL_SECONDS = int(os.getenv('UPLOAD_CACHE_TTL_SECONDS', '86400'))
+
+def cache_key(content, user, upload_url):
+    """
+    Build the cache key of an upload.
+
+    Args:
+        content (bytes): The file's content
+        user (str): User the upload belongs to; the workflow only accepts a user's own files
+        upload_url (str): Where the file was uploaded
+
+    Returns:
+        str: Hex digest identifying the content, user and upstream
+    """
+    digest = hashlib.sha256()
+    for part in (upload_url.encode('utf-8'), user.encode('utf-8'), content):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+def get(key):
+    """
+    Return the ID of an earlier upload, or None on a miss.
+
+    Lookup errors count as misses, so a broken cache only costs an upload.
+    """
+    if not UPLOAD_CACHE_ENABLED:
+        return None
+    try:
+        return db.get_uploaded_file(key, time.time() - UPLOAD_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"[UPLOAD CACHE] Lookup failed: {str(e)}")
+        return None
+
+def put(key, file_id):
+    """
+    Remember the ID of an upload.
+
+    Args:
+        key (str): Key from cache_key()
+        file_id (str): ID the workflow API gave the upload
+    """
+    if not UPLOAD_CACHE_ENABLED:
+        return
+    try:
+        db.put_uploaded_file(key, file_id, time.time() - UPLOAD_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"[UPLOAD CACHE] Store failed: {str(e)}")
+
+def invalidate(key):
+    """Forget the ID of an upload the workflow API no longer accepts."""
+    try:
+        db.delete_uploaded_file(key)
+    except Exception as e:
+        print(f"[UPLOAD CACHE] Invalidate failed: {str(e)}")
@@ -0,0 +1,205 @@
+"""
+Pool of scratch directories that user programs run in.
+
+Every run gets a private working directory, so files a submission writes land
+somewhere that is wiped before the next run instead of in the app's own directory.
+The directories live on a tmpfs mount (/dev/shm) when there is one, are created once
+per worker and reused: handing one out costs no filesystem calls at all, and giving
+it back only touches the disk when the program left files behind.
+
+A reaper thread checks the pool periodically. It reports workspaces held for much
+longer than any run could take, wipes idle ones that something wrote to after
+they were returned, and removes the directories of workers that died.
+"""
+
+import os
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+def _default_root():
+    """Prefer tmpfs, so scratch files never reach the disk."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return os.path.join('/dev/shm', 'problem_generator_workspaces')
+    return os.path.join(tempfile.gettempdir(), 'problem_generator_workspaces')
+
+# Pool configuration
+WORKSPACE_ROOT = os.getenv('EXECUTION_WORKSPACE_DIR') or _default_root()
+WORKSPACE_POOL_SIZE = int(os.getenv('EXECUTION_WORKSPACE_POOL_SIZE', '8'))
+WORKSPACE_REAP_SECONDS = int(os.getenv('EXECUTION_WORKSPACE_REAP_SECONDS', '60'))
+
+# A workspace held longer than this was leaked by its caller
+WORKSPACE_MAX_HOLD_SECONDS = 300
+
+def _wipe(path):
+    """Remove everything inside a directory. Returns False if something couldn't be removed."""
+    clean = True
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    # The program may have made its own directories unwritable
+                    os.chmod(entry.path, 0o700)
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                clean = False
+    return clean
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class WorkspacePool:
+    """Reusable scratch directories owned by one worker process."""
+
+    def __init__(self, root=WORKSPACE_ROOT, size=WORKSPACE_POOL_SIZE):
+        self.root = root
+        self.size = size
+        self.pid = os.getpid()
+        self.base = os.path.join(root, str(self.pid))
+        self._idle = []
+        self._held = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "wiped": 0, "leaked": 0, "reaped_workers": 0}
+
+        # A previous worker with the same pid can't still be using these
+        shutil.rmtree(self.base, ignore_errors=True)
+        os.makedirs(self.base, exist_ok=True)
+        for _ in range(size):
+            self._idle.append(self._create())
+
+    def _create(self):
+        self._created += 1
+        path = os.path.join(self.base, f"ws-{self._created}")
+        os.makedirs(path, mode=0o700)
+        return path
+
+    def acquire(self):
+        """
+        Take an empty workspace, creating an extra one if every pooled one is in use.
+
+        Returns:
+            str: Path of the workspace
+        """
+        with self._lock:
+            path = self._idle.pop() if self._idle else self._create()
+            self._held[path] = time.monotonic()
+            self.stats["acquired"] += 1
+            return path
+
+    def release(self, path):
+        """Wipe a workspace and return it to the pool, or drop it if the pool is full or it won't wipe."""
+        clean = _wipe(path)
+        with self._lock:
+            self._held.pop(path, None)
+            if not clean:
+                self.stats["leaked"] += 1
+            elif len(self._idle) < self.size:
+                self._idle.append(path)
+                return
+        if not clean:
+            print(f"[WORKSPACES] Could not wipe {path}; replacing it")
+        shutil.rmtree(path, ignore_errors=True)
+
+    def reap(self):
+        """
+        Check the pool for leaks and clean up after them.
+
+        Returns:
+            dict: held_too_long (paths), rewiped (idle paths that weren't empty) and
+            dead_workers (pids whose directories were removed)
+        """
+        now = time.monotonic()
+        with self._lock:
+            held_too_long = [path for path, since in self._held.items() if now - since > WORKSPACE_MAX_HOLD_SECONDS]
+            idle = list(self._idle)
+
+        # Idle workspaces should be empty; anything there was written after release
+        rewiped = []
+        for path in idle:
+            try:
+                with os.scandir(path) as entries:
+                    dirty = any(True for _ in entries)
+            except FileNotFoundError:
+                os.makedirs(path, mode=0o700, exist_ok=True)
+                dirty = False
+            if dirty:
+                _wipe(path)
+                rewiped.append(path)
+
+        dead_workers = []
+        try:
+            owners = os.listdir(self.root)
+        except FileNotFoundError:
+            owners = []
+        for owner in owners:
+            if owner.isdigit() and int(owner) != self.pid and not _pid_alive(int(owner)):
+                shutil.rmtree(os.path.join(self.root, owner), ignore_errors=True)
+                dead_workers.append(int(owner))
+
+        with self._lock:
+            self.stats["wiped"] += len(rewiped)
+            self.stats["reaped_workers"] += len(dead_workers)
+        for path in held_too_long:
+            print(f"[WORKSPACES] Workspace {path} has been held for over {WORKSPACE_MAX_HOLD_SECONDS} seconds")
+        for path in rewiped:
+            print(f"[WORKSPACES] Wiped idle workspace {path}, which was written to after release")
+        for pid in dead_workers:
+            print(f"[WORKSPACES] Removed the workspaces of exited worker {pid}")
+        return {"held_too_long": held_too_long, "rewiped": rewiped, "dead_workers": dead_workers}
+
+    def get_stats(self):
+        """Report pool usage and the leaks found so far."""
+        with self._lock:
+            return {"idle": len(self._idle), "in_use": len(self._held), **self.stats}
+
+    def shutdown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _reaper(pool):
+    while True:
+        time.sleep(WORKSPACE_REAP_SECONDS)
+        try:
+            pool.reap()
+        except Exception as e:
+            print(f"[WORKSPACES] Reaper failed: {str(e)}")
+
+def get_pool():
+    """Return this process's workspace pool, creating it and its reaper on first use."""
+    global _pool
+    with _pool_lock:
+        # A pool inherited across fork belongs to the parent
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = WorkspacePool()
+            atexit.register(_pool.shutdown)
+            threading.Thread(target=_reaper, args=(_pool,), name="workspace-reaper", daemon=True).start()
+        return _pool
+
+@contextmanager
+def workspace():
+    """
+    Hold a private, empty working directory for one run.
+
+    Yields:
+        str: Path of the workspace; it is wiped when the block exits
+    """
+    pool = get_pool()
+    path = pool.acquire()
+    try:
+        yield path
+    finally:
+        pool.release(path)